@@ -1,25 +1,157 @@
 """
 Get or create from the storage container.
 """
+import logging
+import threading
+from collections import OrderedDict
+
 from sleekxmpp.plugins.base import base_plugin
 from rhobot.components.storage import StoragePayload
+from rhobot.components.storage.enums import FindFlags, FindResults
+from rhobot.components.storage.events import STORAGE_FOUND
 from rdflib.namespace import DCTERMS
 
+logger = logging.getLogger(__name__)
+
+
+class _AboutIndex:
+    """
+    Index of the uri of the nodes that match a payload, bounded in size by evicting the least recently used entries.
+    """
+
+    def __init__(self, size):
+        """
+        Constructor.
+        :param size: maximum number of entries in the index, the index is disabled when not positive.
+        """
+        self._size = size
+        self._entries = OrderedDict()
+        self._keys = dict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(payload):
+        """
+        Generate the index key of a payload.  The key is the fingerprint of the contents that describe the node, so the
+        about, the flags, and the creator that is added to the created nodes are not part of it.
+        :param payload: storage payload.
+        :return: hashable key.
+        """
+        _, types, properties, references, _ = payload.fingerprint()
+        creator = str(DCTERMS.creator)
+
+        return types, properties, tuple(reference for reference in references if reference[0] != creator)
+
+    def get(self, key):
+        """
+        Retrieve the uri of the node that matches the key.
+        :param key: index key.
+        :return: uri or None.
+        """
+        with self._lock:
+            about = self._entries.pop(key, None)
+
+            if about is not None:
+                self._entries[key] = about
+
+            return about
+
+    def put(self, key, about):
+        """
+        Store the uri of the node that matches the key.
+        :param key: index key.
+        :param about: uri of the node.
+        :return: None
+        """
+        if not self._size or self._size <= 0 or not about:
+            return
+
+        about = str(about)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = about
+            self._keys.setdefault(about, set()).add(key)
+
+            while len(self._entries) > self._size:
+                self._remove(next(iter(self._entries)))
+
+    def contains_about(self, about):
+        """
+        Is the node indexed.
+        :param about: uri of the node.
+        :return: boolean
+        """
+        with self._lock:
+            return str(about) in self._keys
+
+    def remove(self, key):
+        """
+        Remove an entry.
+        :param key: index key.
+        :return: None
+        """
+        with self._lock:
+            self._remove(key)
+
+    def remove_about(self, about):
+        """
+        Remove all of the entries for a node.
+        :param about: uri of the node.
+        :return: None
+        """
+        with self._lock:
+            for key in self._keys.pop(str(about), ()):
+                self._entries.pop(key, None)
+
+    def _remove(self, key):
+        about = self._entries.pop(key, None)
+
+        if about is not None:
+            keys = self._keys[about]
+            keys.discard(key)
+            if not keys:
+                del self._keys[about]
+
 
 class GetOrCreate(base_plugin):
     """
     Callable plugin that will get or create a node in the database based on the storage payload provided.
+
+    The uri of the nodes that have been found or created are indexed by the contents of the payload, along with the
+    nodes that are announced by create messages, so that known nodes are retrieved without searching for them first.
+    Create messages only contain the about and types of the nodes, so the announced nodes are retrieved from the storage
+    bot in order to index them.  Nodes are removed from the index when they are updated.
+
+    When the storage bot supports the create if missing flag, the node is searched for and created by the same command.
+    Storage bots do not advertise the flags that they support, so the support is detected from the responses: a storage
+    bot that ignores the flag responds to a search for a missing node without any results, in which case the node is
+    created with a separate command, and the flag is not sent to the storage bot again.
     """
     name = 'rho_bot_get_or_create'
     description = 'Get or create plugin'
     dependencies = {'rho_bot_storage_client', 'rho_bot_scheduler', 'rho_bot_representation_manager',
                     'rho_bot_rdf_publish'}
 
+    default_config = {
+        # Maximum number of payloads that are indexed, the index is disabled when not positive.
+        'index_size': 4096,
+
+        # Search for the node with the create if missing flag when the storage bot supports it, so that missing nodes
+        # are created by the same command.
+        'find_or_create': True,
+    }
+
     def plugin_init(self):
         """
         Initialize the plugin.
         :return:
         """
+        self._index = _AboutIndex(self.index_size)
+        self._create_if_missing = self.find_or_create
 
     def post_init(self):
         """
@@ -32,29 +164,110 @@ class GetOrCreate(base_plugin):
         self._representation_manager = self.xmpp['rho_bot_representation_manager']
         self._rdf_publish = self.xmpp['rho_bot_rdf_publish']
 
+        self._rdf_publish.add_create_handler(self._nodes_created, batched=True)
+        self._rdf_publish.add_update_handler(self._node_updated)
+
+        self.xmpp.add_event_handler(STORAGE_FOUND, self._store_found)
+
+    def _store_found(self, event):
+        """
+        Detect the support of the create if missing flag again, since the storage bot might have changed.
+        :param event: ignored.
+        :return:
+        """
+        self._create_if_missing = self.find_or_create
+
     def __call__(self, storage_payload):
         """
         Call the get or create.
         :param storage_payload:
         :return:
         """
-        promise = self._storage_client.find_nodes(storage_payload).then(self._handle_result)
-        promise = promise.then(None,
-                               self._scheduler.generate_promise_handler(self._create, storage_payload))
+        key = self._index.key(storage_payload)
+
+        about = self._index.get(key)
+        if about is not None:
+            return self._get_node(about).then(
+                self._scheduler.generate_promise_handler(self._handle_indexed, key, storage_payload))
+
+        return self._find(key, storage_payload)
+
+    def _find(self, key, storage_payload):
+        """
+        Search for the node, and create it when it doesn't exist.
+        :param key: index key of the payload.
+        :param storage_payload:
+        :return:
+        """
+        if self._create_if_missing:
+            # The flag is added to a copy, so that it does not leak back to the caller's payload.
+            find_payload = storage_payload.copy()
+            find_payload.add_flag(FindFlags.CREATE_IF_MISSING, True)
+            promise = self._storage_client.find_nodes(find_payload).then(
+                self._scheduler.generate_promise_handler(self._handle_find_or_create, storage_payload))
+        else:
+            promise = self._storage_client.find_nodes(storage_payload).then(self._handle_result)
+            promise = promise.then(None,
+                                   self._scheduler.generate_promise_handler(self._create, storage_payload))
+
+        promise = promise.then(self._scheduler.generate_promise_handler(self._index_node, key))
         promise = promise.then(self._get_node)
 
         return promise
 
+    def _handle_indexed(self, result, key, storage_payload):
+        """
+        Process the node that was retrieved for an indexed payload.  When the node no longer exists, the entry is
+        removed and the node is searched for.
+        :param result:
+        :param key: index key of the payload.
+        :param storage_payload:
+        :return:
+        """
+        if result.about:
+            return result
+
+        self._index.remove(key)
+
+        return self._find(key, storage_payload)
+
     def _handle_result(self, result):
         """
         Process the result from the find_nodes.
         :param result:
         :return:
         """
-        if not result.results:
+        first_result = result.first()
+        if not first_result:
             raise Exception('Result not found')
 
-        return result.results[0].about
+        return first_result.about
+
+    def _handle_find_or_create(self, result, storage_payload):
+        """
+        Process the result from the find_nodes when the node is created if it is missing.  Created nodes are published,
+        and the creator is added to them before the uri is provided.  When there isn't a result, the storage bot does not
+        support the flag, and the node is created instead.
+        :param result:
+        :param storage_payload:
+        :return:
+        """
+        first_result = result.first()
+        if not first_result:
+            self._create_if_missing = False
+            return self._create('Result not found', storage_payload)
+
+        if FindResults.CREATED.fetch_from(first_result.flags):
+            self._rdf_publish.publish_all_results(result, created=True)
+
+            # The creator is not part of the search, otherwise nodes created by other bots would not be found.
+            creator_payload = StoragePayload()
+            creator_payload.about = first_result.about
+            creator_payload.add_reference(DCTERMS.creator, self._representation_manager.representation_uri)
+
+            return self._storage_client.update_node(creator_payload).then(lambda _result: first_result.about)
+
+        return first_result.about
 
     def _create(self, error_message, storage_payload):
         """
@@ -67,12 +280,23 @@ class GetOrCreate(base_plugin):
             # Publish the create event
             self._rdf_publish.publish_all_results(_result, created=True)
 
-            return _result.results[0].about
+            return _result.first().about
 
         storage_payload.add_reference(DCTERMS.creator, self._representation_manager.representation_uri)
 
         return self._storage_client.create_node(storage_payload).then(_handle_result)
 
+    def _index_node(self, uri, key):
+        """
+        Index the node that was found or created for a payload.
+        :param uri:
+        :param key: index key of the payload.
+        :return: the uri.
+        """
+        self._index.put(key, uri)
+
+        return uri
+
     def _get_node(self, uri):
         """
         Retrieve the actual node.
@@ -84,5 +308,47 @@ class GetOrCreate(base_plugin):
 
         return self._storage_client.get_node(get_payload)
 
+    def _nodes_created(self, records):
+        """
+        Index the nodes that are announced by create messages.  The messages only contain the about and types of the
+        nodes, so the nodes that are not indexed yet are retrieved from the storage bot.
+        :param records: result collection payload of the announced nodes.
+        :return:
+        """
+        if not self.index_size or self.index_size <= 0 or not self._storage_client.has_store():
+            return
+
+        payloads = []
+        for record in records.results:
+            if record.about and not self._index.contains_about(record.about):
+                payload = StoragePayload()
+                payload.about = record.about
+                payloads.append(payload)
+
+        if not payloads:
+            return
+
+        def index_nodes(nodes):
+            for node in nodes:
+                if node.about:
+                    self._index.put(self._index.key(node), node.about)
+
+        def failed(error):
+            logger.warning('Error retrieving the created nodes: %s' % error)
+
+        self._storage_client.get_nodes(payloads).then(index_nodes, failed)
+
+    def _node_updated(self, rdf_payload):
+        """
+        Remove the nodes that are announced by update messages from the index, since they might no longer match the
+        payloads that they were indexed by.
+        :param rdf_payload:
+        :return:
+        """
+        payload = StoragePayload(rdf_payload['form'])
+
+        if payload.about:
+            self._index.remove_about(payload.about)
+
 
 rho_bot_get_or_create = GetOrCreate
@@ -61,8 +61,9 @@ class GetOrLookup(base_plugin):
         :param results_container: the container that was returned by the lookup request.
         :return:
         """
-        if results_container.results:
-            return results_container.results[0].about
+        first_result = results_container.first()
+        if first_result:
+            return first_result.about
 
         raise RuntimeError('No results returned from look up')
 
@@ -13,21 +13,158 @@ promise will be resolved immediately after the first response is received.
 Promises selecting all responses will have to wait for the timeout to occur before resolving the promise.
 """
 
+import itertools
 import logging
+import threading
+import time
 import uuid
+from collections import OrderedDict
 
 from sleekxmpp.plugins.base import base_plugin
 from sleekxmpp.xmlstream import register_stanza_plugin
 from sleekxmpp.plugins.xep_0004 import Form
 from sleekxmpp import Message
+from rdflib.namespace import RDF
 from rhobot.components.roster import RosterComponent
 from rhobot.components.scheduler import Promise
-from rhobot.components.storage import ResultCollectionPayload, StoragePayload
+from rhobot.components.storage import ResultCollectionPayload, ResultPayload, StoragePayload
+from rhobot.components.storage.events import NODE_MODIFIED
+from rhobot.components.storage.payload import get_decoder, get_encoder, DECODER_STANZA, ENCODER_STANZA
 from rhobot.components.stanzas.rdf_stanza import RDFStanza, RDFSourceStanza, RDFStanzaType
 
 logger = logging.getLogger(__name__)
 
 
+class _ResultCache:
+    """
+    Cache of the results of requests, bounded in size by evicting the least recently used entries.  Entries expire after
+    the time to live, and are invalidated when nodes that they could contain are created or updated.
+    """
+
+    def __init__(self, ttl, size):
+        """
+        Constructor.
+        :param ttl: time in seconds that results are cached for, caching is disabled when not positive.
+        :param size: maximum number of entries in the cache.
+        """
+        self._ttl = ttl
+        self._size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Retrieve the results cached for the key.
+        :param key: cache key.
+        :return: copy of the cached results or None.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            if entry is None:
+                return None
+            elif entry[0] < time.time():
+                return None
+
+            self._entries[key] = entry
+
+        return entry[3].copy()
+
+    def put(self, key, types, results):
+        """
+        Store the results of a request.
+        :param key: cache key.
+        :param types: types of the nodes that were requested.
+        :param results: result collection payload.
+        :return: None
+        """
+        if not self._ttl or self._ttl <= 0 or not self._size:
+            return
+
+        results = results.copy()
+        abouts = set(str(result.about) for result in results.results)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + self._ttl, set(types), abouts, results)
+
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, about, types):
+        """
+        Remove the entries that could be affected by a modification to a node.  This is the case when the request was
+        for one of the types of the node, the request was not limited to types, or the node is in the results.
+        :param about: uri of the node.
+        :param types: types of the node.
+        :return: None
+        """
+        about = str(about) if about else None
+        types = set(str(value) for value in types)
+
+        with self._lock:
+            for key, (expires, request_types, abouts, results) in list(self._entries.items()):
+                if not request_types or request_types & types or about in abouts:
+                    del self._entries[key]
+
+    def clear(self):
+        """
+        Remove all of the entries.
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+class _HandlerIndex:
+    """
+    Registry of message handlers, indexed by the rdf types that they are interested in, so that the handlers for a
+    message can be looked up without visiting the handlers that are not interested in it.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+        self._unfiltered = []
+        self._by_type = dict()
+
+    def add(self, handler, types=None):
+        """
+        Add a handler.
+        :param handler: handler to add.
+        :param types: rdf types that the handler is interested in, all messages are provided to it when not defined.
+        :return: None
+        """
+        entry = (next(self._counter), handler)
+
+        if not types:
+            self._unfiltered.append(entry)
+        else:
+            if isinstance(types, basestring):
+                types = [types]
+
+            for rdf_type in set(str(value) for value in types):
+                self._by_type.setdefault(rdf_type, []).append(entry)
+
+    def match(self, types):
+        """
+        Retrieve the handlers that are interested in a message about the provided types, in the order that they were
+        added.
+        :param types: rdf types of the message.
+        :return: list of handlers.
+        """
+        if not self._by_type:
+            return [handler for _, handler in self._unfiltered]
+
+        entries = set(self._unfiltered)
+        for rdf_type in types:
+            entries.update(self._by_type.get(str(rdf_type), ()))
+
+        return [handler for _, handler in sorted(entries)]
+
+
 class RDFPublish(base_plugin):
     """
     Service that will send out requests and farm out the incoming messages to the appropriate handlers.
@@ -37,6 +174,28 @@ class RDFPublish(base_plugin):
     dependencies = {'xep_0122', 'rho_bot_roster', 'rho_bot_scheduler', }
     description = 'RHO: Configuration Plugin'
 
+    default_config = {
+        # Time in seconds that the results of requests and searches are cached, caching is disabled when not positive.
+        # Cached results can be out of date for up to this long, so caching is disabled by default.
+        'cache_ttl': 0.0,
+
+        # Maximum number of cached results.
+        'cache_size': 256,
+
+        # Decoder used to read the forms of incoming messages, DECODER_STANZA or DECODER_ELEMENT.
+        'decoder': DECODER_STANZA,
+
+        # Encoder used to build the forms of outgoing messages, ENCODER_STANZA or ENCODER_ELEMENT.
+        'encoder': ENCODER_STANZA,
+
+        # Maximum number of records that are published in a single create or update message by publish_all_results.
+        'publish_batch_size': 50,
+
+        # Time in seconds that publish_all_results waits for more records before publishing a partial batch, partial
+        # batches are published immediately when not positive.
+        'publish_batch_window': 0.0,
+    }
+
     def plugin_init(self):
         """
         Initialize instance variables for the service.
@@ -49,10 +208,30 @@ class RDFPublish(base_plugin):
         self.xmpp.add_event_handler(RosterComponent.CHANNEL_JOINED, self._channel_joined)
 
         self._pending_requests = dict()
-        self._request_handlers = []
-        self._create_handlers = []
-        self._update_handlers = []
-        self._search_handlers = []
+        self._request_handlers = _HandlerIndex()
+        self._create_handlers = _HandlerIndex()
+        self._update_handlers = _HandlerIndex()
+        self._search_handlers = _HandlerIndex()
+        self._batch_create_handlers = _HandlerIndex()
+        self._batch_update_handlers = _HandlerIndex()
+
+        self._message_handlers = {
+            RDFStanzaType.REQUEST: self._request,
+            RDFStanzaType.RESPONSE: self._response,
+            RDFStanzaType.CREATE: self._create,
+            RDFStanzaType.UPDATE: self._update,
+            RDFStanzaType.SEARCH_REQUEST: self._search_request,
+            RDFStanzaType.SEARCH_RESPONSE: self._search_response,
+        }
+        self._search_identity_added = False
+
+        self._publish_lock = threading.Lock()
+        self._publish_buffers = {RDFStanzaType.CREATE: [], RDFStanzaType.UPDATE: []}
+        self._publish_flush_scheduled = set()
+        self._cache = _ResultCache(self.cache_ttl, self.cache_size)
+        self._storage_payload, self._result_collection = get_decoder(self.decoder)
+        self._encode = get_encoder(self.encoder)
+        self._in_flight = dict()
 
     def post_init(self):
         """
@@ -72,13 +251,28 @@ class RDFPublish(base_plugin):
         logger.info('Joined the registration channel')
         self._roster.add_message_received_listener(self._receive_message)
 
-    def send_out_request(self, payload, timeout=10.0, allow_multiple=False):
+    def send_out_request(self, payload, timeout=10.0, allow_multiple=False, progress=None):
         """
-        Send out an rdf request for the provided payload.
+        Send out an rdf request for the provided payload.  Identical requests that are made while the request is
+        outstanding with the same timeout share it, unless they provide a progress callback.
         :param payload: the payload to serialize and then
         :param timeout: the timeout that will be used to cancel the request.
+        :param allow_multiple: gather the responses of all of the responders until the timeout.
+        :param progress: when gathering multiple responses, callback that is deferred with the results of each
+        response as it arrives.
         :return: a promise
         """
+        cache_key = (RDFStanzaType.REQUEST.value, allow_multiple, payload.fingerprint())
+        cached_results = self._cache.get(cache_key)
+        if cached_results is not None:
+            return self._resolve_cached(cached_results, progress if allow_multiple else None)
+
+        # Requests with a shorter timeout are not attached to longer running requests.
+        in_flight_key = cache_key + (timeout, )
+        in_flight = self._in_flight.get(in_flight_key, None) if progress is None else None
+        if in_flight is not None:
+            return self._share_in_flight(in_flight)
+
         thread_identifier = str(uuid.uuid4())
 
         promise = Promise(self.xmpp['rho_bot_scheduler'])
@@ -89,43 +283,153 @@ class RDFPublish(base_plugin):
             callback = self._generate_single_fetch(promise, thread_identifier)
 
         self._pending_requests[thread_identifier] = dict(callback=callback,
-                                                         results=ResultCollectionPayload())
+                                                         results=ResultCollectionPayload(),
+                                                         progress=progress,
+                                                         cache_key=cache_key,
+                                                         in_flight_key=in_flight_key,
+                                                         cache_types=payload.types)
 
-        self._send_message(mtype=RDFStanzaType.REQUEST, payload=payload, thread_id=thread_identifier)
+        if progress is None:
+            self._in_flight[in_flight_key] = promise
 
-        self.xmpp['rho_bot_scheduler'].schedule_task(callback=self._generate_cancel_event(promise, thread_identifier),
-                                                     delay=timeout)
+        self._schedule_timeout(promise, thread_identifier, timeout)
 
-        return promise
+        self._send_message(mtype=RDFStanzaType.REQUEST, payload=payload, thread_id=thread_identifier)
+
+        return self._share_in_flight(promise) if progress is None else promise
 
-    def send_out_search(self, payload, timeout=10.0):
+    def send_out_search(self, payload, timeout=10.0, max_responses=None, max_results=None, wait_for_all=False,
+                        progress=None):
         """
-        Send out a search request to all of the users that are currently in the channel.
+        Send out a search request to all of the users that are currently in the channel.  By default the promise is
+        resolved when the timeout expires, the completion arguments allow it to be resolved as soon as enough responses
+        have been received.  Responses are counted per responding bot.  Identical searches that are made while the
+        search is outstanding with the same timeout share it, unless they provide a progress callback.
         :param payload: payload to serialize and then send out.
         :param timeout: length of time in seconds before canceling the request.
+        :param max_responses: resolve once this many bots have responded.
+        :param max_results: resolve once at least this many results have been received.
+        :param wait_for_all: resolve once all of the search capable bots in the channel have responded.  If no search
+        capable bots are known, the timeout is used.
+        :param progress: callback that is deferred with the results of each response as it arrives, so that they can
+        be processed before the search is complete.
         :return: promise containing all of the results.
         """
+        cache_key = (RDFStanzaType.SEARCH_REQUEST.value, max_responses, max_results, wait_for_all,
+                     payload.fingerprint())
+        cached_results = self._cache.get(cache_key)
+        if cached_results is not None:
+            return self._resolve_cached(cached_results, progress)
+
+        # Requests with a shorter timeout are not attached to longer running requests.
+        in_flight_key = cache_key + (timeout, )
+        in_flight = self._in_flight.get(in_flight_key, None) if progress is None else None
+        if in_flight is not None:
+            return self._share_in_flight(in_flight)
+
         thread_identifier = str(uuid.uuid4())
 
         promise = Promise(self.xmpp['rho_bot_scheduler'])
 
+        expected_responders = None
+        if wait_for_all:
+            roster = self.xmpp['rho_bot_roster']
+            expected_responders = roster.get_connections(RosterComponent.SEARCH_IDENTITY) or None
+
         self._pending_requests[thread_identifier] = dict(callback=self._generate_gather_all_data(promise,
                                                                                                  thread_identifier),
-                                                         results=ResultCollectionPayload())
+                                                         results=ResultCollectionPayload(),
+                                                         responders=set(),
+                                                         max_responses=max_responses,
+                                                         max_results=max_results,
+                                                         expected_responders=expected_responders,
+                                                         progress=progress,
+                                                         cache_key=cache_key,
+                                                         in_flight_key=in_flight_key,
+                                                         cache_types=payload.types)
+
+        if progress is None:
+            self._in_flight[in_flight_key] = promise
+
+        self._schedule_timeout(promise, thread_identifier, timeout)
 
         self._send_message(mtype=RDFStanzaType.SEARCH_REQUEST, payload=payload, thread_id=thread_identifier)
 
-        self.xmpp['rho_bot_scheduler'].schedule_task(callback=self._generate_cancel_event(promise, thread_identifier),
-                                                     delay=timeout)
+        return self._share_in_flight(promise) if progress is None else promise
+
+    def _resolve_cached(self, cached_results, progress):
+        """
+        Generate a promise resolved with cached results.
+        :param cached_results: copy of the cached result collection payload.
+        :param progress: optional progress callback, it is notified of all of the results at once with its own copy.
+        :return: promise
+        """
+        if progress:
+            self.xmpp['rho_bot_scheduler'].defer(progress, cached_results.copy())
+
+        promise = Promise(self.xmpp['rho_bot_scheduler'])
+        promise.resolved(cached_results)
 
         return promise
 
+    @staticmethod
+    def _share_in_flight(promise):
+        """
+        Generate the promise that is returned to a caller of a shared request, each of the callers is resolved with its
+        own copy of the results.
+        :param promise: promise of the request.
+        :return: promise
+        """
+        return promise.then(lambda results: results.copy())
+
+    def _request_completed(self, result_container, promise, results):
+        """
+        Cache the results of a request, and stop sharing its promise with identical requests.  Requests that did not
+        find anything are not cached.
+        :param result_container: container of the pending request.
+        :param promise: promise of the request.
+        :param results: result collection payload.
+        :return: None
+        """
+        cache_key = result_container.get('cache_key', None)
+
+        if cache_key is None:
+            return
+
+        in_flight_key = result_container['in_flight_key']
+        if self._in_flight.get(in_flight_key, None) is promise:
+            del self._in_flight[in_flight_key]
+
+        if len(results):
+            self._cache.put(cache_key, result_container['cache_types'], results)
+
+    def clear_cache(self):
+        """
+        Remove all of the cached results.
+        :return: None
+        """
+        self._cache.clear()
+
+    def _invalidate(self, about, types):
+        """
+        Invalidate the cached results that could be affected by a modification to a node, and notify the other plugins
+        that the node has been modified, so that they can invalidate their own caches.
+        :param about: uri of the node.
+        :param types: types of the node.
+        :return: None
+        """
+        self._cache.invalidate(about, types)
+
+        if about:
+            self.xmpp.event(NODE_MODIFIED, str(about), direct=True)
+
     def publish_create(self, payload):
         """
         Publish a create message.
         :param payload:
         :return:
         """
+        self._invalidate(payload.about, payload.types)
         self._send_message(mtype=RDFStanzaType.CREATE, payload=payload)
 
     def publish_update(self, payload):
@@ -134,57 +438,142 @@ class RDFPublish(base_plugin):
         :param payload:
         :return:
         """
+        self._invalidate(payload.about, payload.types)
         self._send_message(mtype=RDFStanzaType.UPDATE, payload=payload)
 
     def publish_all_results(self, result_collection, created=True):
         """
-        Publish all of the results in the collection to the correct type.
+        Publish all of the results in the collection to the correct type.  The results are packed into messages of up
+        to publish_batch_size records, partial batches are held for publish_batch_window seconds so that they can be
+        combined with later results.
         :param result_collection: collection to publish the results of.
+        :param created: publish create messages, otherwise update messages are published.
+        :return:
+        """
+        mtype = RDFStanzaType.CREATE if created else RDFStanzaType.UPDATE
+
+        batches = []
+        schedule_flush = False
+
+        with self._publish_lock:
+            buffer = self._publish_buffers[mtype]
+
+            for res in result_collection.results:
+                self._invalidate(res.about, res.types)
+                buffer.append(ResultPayload(about=res.about, types=res.types))
+
+            while len(buffer) >= self.publish_batch_size:
+                batches.append(buffer[:self.publish_batch_size])
+                del buffer[:self.publish_batch_size]
+
+            if buffer and (not self.publish_batch_window or self.publish_batch_window <= 0):
+                batches.append(buffer[:])
+                del buffer[:]
+            elif buffer and mtype not in self._publish_flush_scheduled:
+                self._publish_flush_scheduled.add(mtype)
+                schedule_flush = True
+
+        for batch in batches:
+            self._publish_batch(mtype, batch)
+
+        if schedule_flush:
+            self.xmpp['rho_bot_scheduler'].schedule_timeout(callback=lambda: self._flush_publish_buffer(mtype),
+                                                            delay=self.publish_batch_window)
+
+    def flush_published_results(self):
+        """
+        Publish the results that publish_all_results is holding for the batch window immediately.
         :return:
         """
-        for res in result_collection.results:
-            publish_payload = StoragePayload()
-            publish_payload.about = res.about
-            publish_payload.add_type(*res.types)
-            if created:
-                self.publish_create(publish_payload)
-            else:
-                self.publish_update(publish_payload)
+        for mtype in self._publish_buffers.keys():
+            self._flush_publish_buffer(mtype)
 
-    def add_request_handler(self, callback):
+    def _flush_publish_buffer(self, mtype):
+        """
+        Publish the results that are held for the message type.
+        :param mtype: message type.
+        :return:
+        """
+        with self._publish_lock:
+            self._publish_flush_scheduled.discard(mtype)
+
+            batch = self._publish_buffers[mtype][:]
+            del self._publish_buffers[mtype][:]
+
+        if batch:
+            self._publish_batch(mtype, batch)
+
+    def _publish_batch(self, mtype, batch):
+        """
+        Publish a single message containing a batch of records.  A batch of a single record is published in the form of
+        a single storage payload, which can be read by the bots that do not support batched messages.
+        :param mtype: message type.
+        :param batch: list of result payloads.
+        :return:
+        """
+        if len(batch) == 1:
+            payload = StoragePayload()
+            payload.about = batch[0].about
+            payload.add_type(*batch[0].types)
+        else:
+            payload = ResultCollectionPayload()
+            payload.append(*batch)
+
+        self._send_message(mtype=mtype, payload=payload)
+
+    def add_request_handler(self, callback, types=None):
         """
         Add a message handler for all of the rdf requests.
         :param callback:
+        :param types: only notify the handler of requests for one of these rdf types.
         :return:
         """
-        self._request_handlers.append(callback)
+        self._request_handlers.add(callback, types)
 
-    def add_create_handler(self, callback):
+    def add_create_handler(self, callback, batched=False, types=None):
         """
         Add a message handler for all of the create notifications.
         :param callback:
+        :param batched: the handler is called with a result collection payload of all of the records in a message,
+        otherwise it is called with an rdf payload for each of the records.
+        :param types: only notify the handler of records with one of these rdf types.
         :return:
         """
-        self._create_handlers.append(callback)
+        if batched:
+            self._batch_create_handlers.add(callback, types)
+        else:
+            self._create_handlers.add(callback, types)
 
-    def add_update_handler(self, callback):
+    def add_update_handler(self, callback, batched=False, types=None):
         """
         Add a message handler for all of the delete notifications.
         :param callback:
+        :param batched: the handler is called with a result collection payload of all of the records in a message,
+        otherwise it is called with an rdf payload for each of the records.
+        :param types: only notify the handler of records with one of these rdf types.
         :return:
         """
-        self._update_handlers.append(callback)
+        if batched:
+            self._batch_update_handlers.add(callback, types)
+        else:
+            self._update_handlers.add(callback, types)
 
-    def add_search_handler(self, callback):
+    def add_search_handler(self, callback, types=None):
         """
         Add a message handler for all of the search notifications.
         :param callback:
+        :param types: only notify the handler of searches for one of these rdf types.
         :return:
         """
-        self._search_handlers.append(callback)
+        self._search_handlers.add(callback, types)
+
+        # Advertise that this bot responds to searches, so that searches can wait for all of the responders.
+        if not self._search_identity_added:
+            self._search_identity_added = True
+            self.xmpp['xep_0030'].add_identity(category=RosterComponent.SEARCH_IDENTITY, itype='rdf')
 
     @staticmethod
-    def create_rdf(mtype='ignore', payload=None, source_name=None, source_command=None):
+    def create_rdf(mtype='ignore', payload=None, source_name=None, source_command=None, encode=None):
 
         result = RDFStanza()
 
@@ -193,8 +582,8 @@ class RDFPublish(base_plugin):
         else:
             result['type'] = mtype
 
-        if payload:
-            result.append(payload.populate_payload())
+        if payload is not None:
+            result.append(encode(payload) if encode else payload.populate_payload())
 
         if source_name and source_command:
             source_stanza = RDFSourceStanza()
@@ -212,7 +601,7 @@ class RDFPublish(base_plugin):
         :param thread_id:
         :return:
         """
-        rdf_stanza = self.create_rdf(mtype=mtype, payload=payload)
+        rdf_stanza = self.create_rdf(mtype=mtype, payload=payload, encode=self._encode)
 
         self.xmpp['rho_bot_roster'].send_message(payload=rdf_stanza, thread_id=thread_id)
 
@@ -230,21 +619,13 @@ class RDFPublish(base_plugin):
 
         try:
             message_type = RDFStanzaType(message_type)
-
-            if message_type == RDFStanzaType.REQUEST:
-                self._request(message, rdf_payload)
-            elif message_type == RDFStanzaType.RESPONSE:
-                self._response(message, rdf_payload)
-            elif message_type == RDFStanzaType.CREATE:
-                self._create(message, rdf_payload)
-            elif message_type == RDFStanzaType.UPDATE:
-                self._update(message, rdf_payload)
-            elif message_type == RDFStanzaType.SEARCH_REQUEST:
-                self._search_request(message, rdf_payload)
-            elif message_type == RDFStanzaType.SEARCH_RESPONSE:
-                self._search_response(message, rdf_payload)
         except ValueError:
             logger.error('Unknown message type: %s' % message_type)
+            return
+
+        message_handler = self._message_handlers.get(message_type, None)
+        if message_handler:
+            message_handler(message, rdf_payload)
 
     def _request(self, message, rdf_payload):
         """
@@ -260,7 +641,7 @@ class RDFPublish(base_plugin):
             if payload:
                 self._roster.send_message(payload=payload, thread_id=message.get('thread', None))
 
-        for handler in self._request_handlers:
+        for handler in self._request_handlers.match(self._payload_types(rdf_payload)):
             response_promise = self._scheduler.defer(handler, rdf_payload)
             response_promise.then(send_response)
 
@@ -277,7 +658,7 @@ class RDFPublish(base_plugin):
 
             if result:
                 callback = self._pending_requests.get(thread_identifier, None)['callback']
-                callback(rdf_payload)
+                callback(rdf_payload, message['from'])
 
     def _create(self, message, rdf_payload):
         """
@@ -286,8 +667,7 @@ class RDFPublish(base_plugin):
         :param rdf_payload:
         :return:
         """
-        for handler in self._create_handlers:
-            self._scheduler.defer(handler, rdf_payload)
+        self._notify(RDFStanzaType.CREATE, rdf_payload, self._create_handlers, self._batch_create_handlers)
 
     def _update(self, message, rdf_payload):
         """
@@ -296,8 +676,68 @@ class RDFPublish(base_plugin):
         :param rdf_payload:
         :return:
         """
-        for handler in self._update_handlers:
-            self._scheduler.defer(handler, rdf_payload)
+        self._notify(RDFStanzaType.UPDATE, rdf_payload, self._update_handlers, self._batch_update_handlers)
+
+    def _notify(self, mtype, rdf_payload, handlers, batch_handlers):
+        """
+        Invalidate the cached results that could be affected by a create or update message, and notify the handlers of
+        the records that it contains.  Messages containing a single record are provided to the record handlers as is,
+        batched messages are split into an rdf payload for each record.  Handlers that filter on rdf types are only
+        notified of the records with one of their types.
+        :param mtype: message type.
+        :param rdf_payload:
+        :param handlers: record handlers.
+        :param batch_handlers: batch handlers.
+        :return:
+        """
+        form = rdf_payload['form']
+        # Only look for the first item, get_items would parse all of them.
+        batched = form.xml.find('{%s}item' % form.namespace) is not None
+
+        if batched:
+            records = self._result_collection(form)
+        else:
+            payload = self._storage_payload(form)
+            records = ResultCollectionPayload()
+            records.append(ResultPayload(about=payload.about, types=payload.types))
+
+        batch_records = OrderedDict()
+
+        for record in records.results:
+            self._invalidate(record.about, record.types)
+
+            record_handlers = handlers.match(record.types)
+            if record_handlers:
+                if batched:
+                    record_payload = StoragePayload()
+                    record_payload.about = record.about
+                    record_payload.add_type(*record.types)
+                    record_rdf = self.create_rdf(mtype=mtype, payload=record_payload, encode=self._encode)
+                else:
+                    record_rdf = rdf_payload
+
+                for handler in record_handlers:
+                    self._scheduler.defer(handler, record_rdf)
+
+            for handler in batch_handlers.match(record.types):
+                batch_records.setdefault(handler, ResultCollectionPayload()).append(record)
+
+        for handler, handler_records in batch_records.items():
+            self._scheduler.defer(handler, handler_records)
+
+    @staticmethod
+    def _payload_types(rdf_payload):
+        """
+        Retrieve the rdf types of the form in the payload.
+        :param rdf_payload:
+        :return: list of types.
+        """
+        field = rdf_payload['form'].get_fields().get(str(RDF.type), None)
+        if field is None:
+            return []
+
+        value = field.get_value()
+        return value if isinstance(value, list) else [value]
 
     def _search_request(self, message, rdf_payload):
         """
@@ -306,16 +746,38 @@ class RDFPublish(base_plugin):
         :param rdf_payload:
         :return:
         """
+        # Bots that do not respond to searches do not answer them, otherwise they would count as responders.
+        if not self._search_identity_added:
+            return
+
+        thread_id = message.get('thread', None)
+        responded = []
+
         def send_response(payload):
             """
             Send out the response for the promise.
             """
             if payload:
-                self._roster.send_message(payload=payload, thread_id=message.get('thread', None))
+                responded.append(True)
+                self._roster.send_message(payload=payload, thread_id=thread_id)
 
-        for handler in self._search_handlers:
+        def send_empty_response(outcomes):
+            """
+            Send out an empty response when none of the handlers responded, so that searches waiting for all of the
+            responders do not have to wait for their timeout.
+            """
+            if not responded:
+                self._roster.send_message(payload=self.create_rdf(mtype=RDFStanzaType.SEARCH_RESPONSE,
+                                                                  payload=ResultCollectionPayload(),
+                                                                  encode=self._encode),
+                                          thread_id=thread_id)
+
+        response_promises = []
+        for handler in self._search_handlers.match(self._payload_types(rdf_payload)):
             response_promise = self._scheduler.defer(handler, rdf_payload)
-            response_promise.then(send_response)
+            response_promises.append(response_promise.then(send_response))
+
+        self._scheduler.all_settled(*response_promises).then(send_empty_response)
 
     def _search_response(self, message, rdf_payload):
         """
@@ -330,7 +792,23 @@ class RDFPublish(base_plugin):
 
             if result:
                 callback = self._pending_requests.get(thread_identifier, None)['callback']
-                callback(rdf_payload)
+                callback(rdf_payload, message['from'])
+
+    def _schedule_timeout(self, promise, request_identifier, timeout):
+        """
+        Schedule the timeout of a pending request, the cancel method of the timeout is stored with the request so that
+        it can be cancelled when the request is finished early.
+        :param promise: promise of the request.
+        :param request_identifier: identifier of the request.
+        :param timeout: length of time in seconds before canceling the request.
+        :return: None
+        """
+        cancel = self.xmpp['rho_bot_scheduler'].schedule_timeout(
+            callback=self._generate_cancel_event(promise, request_identifier), delay=timeout)
+
+        result_container = self._pending_requests.get(request_identifier, None)
+        if result_container is not None:
+            result_container['cancel_timeout'] = cancel
 
     def _generate_cancel_event(self, promise, request_identifier):
         """
@@ -339,14 +817,52 @@ class RDFPublish(base_plugin):
         :return:
         """
         def call_back_method():
-            result_container = self._pending_requests.get(request_identifier, None)
-
-            if result_container:
-                del self._pending_requests[request_identifier]
-                promise.resolved(result_container['results'])
+            self._finish_request(promise, request_identifier)
 
         return call_back_method
 
+    def _finish_request(self, promise, request_identifier):
+        """
+        Resolve the promise of a pending request with the results that have been gathered so far, and cancel its
+        timeout.
+        :param promise: promise of the request.
+        :param request_identifier: identifier of the request.
+        :return: None
+        """
+        result_container = self._pending_requests.pop(request_identifier, None)
+
+        if result_container:
+            cancel_timeout = result_container.get('cancel_timeout', None)
+            if cancel_timeout:
+                cancel_timeout()
+
+            self._request_completed(result_container, promise, result_container['results'])
+
+            promise.resolved(result_container['results'])
+
+    @staticmethod
+    def _is_complete(result_container):
+        """
+        Determine if a request gathering multiple responses has satisfied its completion arguments.
+        :param result_container: container of the pending request.
+        :return: True if the request can be resolved before the timeout.
+        """
+        responders = result_container.get('responders', ())
+
+        max_responses = result_container.get('max_responses', None)
+        if max_responses is not None and len(responders) >= max_responses:
+            return True
+
+        max_results = result_container.get('max_results', None)
+        if max_results is not None and len(result_container['results']) >= max_results:
+            return True
+
+        expected_responders = result_container.get('expected_responders', None)
+        if expected_responders and expected_responders.issubset(responders):
+            return True
+
+        return False
+
     def _generate_single_fetch(self, promise, thread_identifier):
         """
         Generates a single fetch handler.  This will take the first responder and use it to provide content back to the
@@ -355,12 +871,18 @@ class RDFPublish(base_plugin):
         :param thread_identifier:
         :return:
         """
-        def single_fetch(rdf):
+        def single_fetch(rdf, sender=None):
             form = rdf['form']
-            results_collection = ResultCollectionPayload(form)
+            results_collection = self._result_collection(form)
 
             promise.resolved(results_collection)
-            del self._pending_requests[thread_identifier]
+            result_container = self._pending_requests.pop(thread_identifier)
+
+            cancel_timeout = result_container.get('cancel_timeout', None)
+            if cancel_timeout:
+                cancel_timeout()
+
+            self._request_completed(result_container, promise, results_collection)
 
         return single_fetch
 
@@ -371,14 +893,14 @@ class RDFPublish(base_plugin):
         :param thread_identifier: thread_identifier that will be used to store the contents.
         :return: generated method that can be called when data is received.
         """
-        def multiple_fetch(rdf):
+        def multiple_fetch(rdf, sender=None):
 
             result_container = self._pending_requests.get(thread_identifier, None)
             if result_container:
                 form = rdf['form']
-                results_collection = ResultCollectionPayload(form)
+                results_collection = self._result_collection(form)
                 results = result_container['results']
-                results.append(*results_collection.results)
+                results.merge(*results_collection.results)
 
                 # Store off the sources if necessary
                 if rdf['source']:
@@ -390,6 +912,17 @@ class RDFPublish(base_plugin):
                     if rdf['source']['command']:
                         sources.add((rdf['source']['name'], rdf['source']['command']))
                         results.sources = sources
+                        results_collection.sources = {(rdf['source']['name'], rdf['source']['command'])}
+
+                progress = result_container.get('progress', None)
+                if progress:
+                    self.xmpp['rho_bot_scheduler'].defer(progress, results_collection)
+
+                if 'responders' in result_container:
+                    result_container['responders'].add(str(sender))
+
+                    if self._is_complete(result_container):
+                        self._finish_request(promise, thread_identifier)
 
         return multiple_fetch
 
@@ -54,8 +54,9 @@ class RepresentationManager(base_plugin):
         :param result: result from find nodes command.
         :return:
         """
-        if result.results:
-            node_id = result.results[0].about
+        first_result = result.first()
+        if first_result:
+            node_id = first_result.about
             return node_id
 
         raise RuntimeError('Not Found')
@@ -93,9 +94,11 @@ class RepresentationManager(base_plugin):
 
     def _publish_update(self, storage_result):
 
+        first_result = storage_result.first()
+
         publish_payload = StoragePayload()
-        publish_payload.about = storage_result.results[0].about
-        publish_payload.add_type(*storage_result.results[0].types)
+        publish_payload.about = first_result.about
+        publish_payload.add_type(*first_result.types)
 
         self._node_id = publish_payload.about
 
@@ -103,9 +106,11 @@ class RepresentationManager(base_plugin):
 
     def _publish_create(self, storage_result):
 
+        first_result = storage_result.first()
+
         publish_payload = StoragePayload()
-        publish_payload.about = storage_result.results[0].about
-        publish_payload.add_type(*storage_result.results[0].types)
+        publish_payload.about = first_result.about
+        publish_payload.add_type(*first_result.types)
 
         self._node_id = publish_payload.about
 
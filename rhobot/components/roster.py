@@ -17,6 +17,9 @@ class RosterComponent(base_plugin):
     PRESENCE_ONLINE = 'online:%s'
     PRESENCE_OFFLINE = 'offline:%s'
 
+    # Identity category advertised by the bots that respond to search requests.
+    SEARCH_IDENTITY = 'search'
+
     name = 'rho_bot_roster'
     dependencies = {'xep_0045', 'rho_bot_configuration'}
     description = 'RHO: Roster Plugin'
@@ -24,7 +27,7 @@ class RosterComponent(base_plugin):
     def plugin_init(self):
         self._channel_name = None
         self._nick = None
-        self._presence_objects = dict(bot=set(), web=set(), store=set())
+        self._presence_objects = dict(bot=set(), web=set(), store=set(), search=set())
 
     def post_init(self):
         """
@@ -55,6 +58,14 @@ class RosterComponent(base_plugin):
     def get_jid(self):
         return self.xmpp['xep_0045'].getOurJidInRoom(self._channel_name)
 
+    def get_connections(self, key):
+        """
+        Retrieve the jids of the members of the channel that have advertised the provided identity.
+        :param key: identity key (bot, web, store, search).
+        :return: set of jid strings.
+        """
+        return set(self._presence_objects.get(key, set()))
+
     def add_message_received_listener(self, callback, ignore_self=True):
         """
         Adds a message received listener to the messages that are published to the channel.
@@ -2,8 +2,15 @@
 Wraps scheduling functionality.
 """
 from sleekxmpp.plugins.base import base_plugin
-import uuid
+from concurrent import futures
+from collections import deque
+import functools
+import itertools
+import threading
 import logging
+import math
+import time
+from enum import Enum
 
 logger = logging.getLogger(__name__)
 
@@ -23,20 +30,44 @@ def _generate_cancel_method(scheduler_name, scheduler):
     return cancel
 
 
-class Deferred:
+class _State(Enum):
+    """
+    States of a promise.
+    """
+    PENDING = 0
+    FULFILLED = 1
+    REJECTED = 2
+
+
+# Marker for a deferred that calls the method without an argument.
+_NO_ARGUMENT = object()
+
+
+def _identity(value):
+    """
+    Pass the value through to the next promise.
+    """
+    return value
+
+
+class Deferred(object):
     """
     A deferred is a method wrapper that will execute a method later and provides a promise that the results will be
     delivered to.
     """
 
-    def __init__(self, method_call, scheduler, promise=None):
+    __slots__ = ('_method_call', '_promise', '_argument')
+
+    def __init__(self, method_call, scheduler, promise=None, argument=_NO_ARGUMENT):
         """
         Constructor.
         :param method_call: the method to call.
         :param scheduler: the scheduler that will be used to generate promises if necessary
         :param promise: a specified promise that will be used to notify requesters.
+        :param argument: optional argument that the method will be called with.
         """
         self._method_call = method_call
+        self._argument = argument
         if promise:
             self._promise = promise
         else:
@@ -50,18 +81,20 @@ class Deferred:
         return self._promise
 
     def __call__(self):
-        logger.debug('Executing call method: %s' % self._method_call)
+        logger.debug('Executing call method: %s', self._method_call)
 
         try:
-            result = self._method_call()
+            if self._argument is _NO_ARGUMENT:
+                result = self._method_call()
+            else:
+                result = self._method_call(self._argument)
 
             # 2.3.1
-            if result == self._promise:
+            if result is self._promise:
                 raise TypeError
 
             try:
-                result.then(_generate_promise_fulfilled_ripple(self._promise),
-                            _generate_promise_rejected_ripple(self._promise))
+                result.then(self._promise.resolved, self._promise.rejected)
             except AttributeError:
                 self._promise.resolved(result)
         except Exception as e:
@@ -70,116 +103,96 @@ class Deferred:
             self._promise.rejected(e)
 
 
-def _generate_promise_fulfilled_ripple(child_promise):
-    """
-    Generates a method that will resolve the child promise with the result value.  This is used when a promise returns
-    a promise.
-    :param child_promise: promise to notify.
-    :return: generated method.
-    """
-    def fulfilled(result):
-        child_promise.resolved(result)
-
-    return fulfilled
-
-
-def _generate_promise_rejected_ripple(child_promise):
-    """
-    Generates a method that will reject the child promise with the rejected value.  This is used when a promise returns
-    a promise.
-    :param child_promise: promise to reject.
-    :return: generated method.
-    """
-    def rejected(error):
-        child_promise.rejected(error)
-
-    return rejected
-
-
-class Promise:
+class Promise(object):
     """
     Promise Object.  A promise is a means of getting the results of a method that will be executed at some time.
     """
 
+    __slots__ = ('_state', '_value', '_queue', '_listeners', '_scheduler')
+
     def __init__(self, scheduler):
         """
         Constructor.
         :param scheduler: the scheduler that will be used to schedule the notification of the results.
         """
-        self._queue = []
+        self._state = _State.PENDING
+        self._value = None
 
-        self._resolved = False
-        self._rejected = False
+        # Callbacks and listeners are only allocated when they are waiting on a pending promise.
+        self._queue = None
+        self._listeners = None
 
-        self._result = None
-        self._error = None
         self._scheduler = scheduler
-        self._child_promise = None
 
     def then(self, fulfilled=None, rejected=None):
 
         new_promise = Promise(self._scheduler)
 
         # If the promise hasn't been resolved, add it to the queue, otherwise fire off the new deferred.
-
-        if self._resolved:
-            if fulfilled:
-                deferred = Deferred(self._generate_wrapper(fulfilled, self._result), self._scheduler, new_promise)
-            else:
-                deferred = Deferred(lambda: self._result, self._scheduler, new_promise)
-            self._scheduler.schedule_task(deferred, delay=0.0)
-        elif self._rejected:
-            if rejected:
-                deferred = Deferred(self._generate_wrapper(rejected, self._error), self._scheduler, new_promise)
-                self._scheduler.schedule_task(deferred, delay=0.0)
-            else:
-                self._scheduler.schedule_task(lambda: new_promise.rejected(self._error), delay=0.0)
-        else:
+        if self._state is _State.PENDING:
+            if self._queue is None:
+                self._queue = []
             self._queue.append((fulfilled, rejected, new_promise))
+        else:
+            self._schedule_callback(fulfilled, rejected, new_promise)
 
         return new_promise
 
-    def resolved(self, result):
-
-        if not(self._resolved or self._rejected):
-            self._resolved = True
-            self._result = result
+    def _schedule_callback(self, fulfilled, rejected, promise):
+        """
+        Schedule the callback that matches the state of this promise, the results of the callback will be delivered to
+        the provided promise.
+        """
+        if self._state is _State.FULFILLED:
+            self._scheduler.queue_microtask(Deferred(fulfilled or _identity, self._scheduler, promise, self._value))
+        elif rejected:
+            self._scheduler.queue_microtask(Deferred(rejected, self._scheduler, promise, self._value))
+        else:
+            self._scheduler.queue_microtask(promise.rejected, self._value)
 
-            # schedule the fulfilled method call.
-            for fulfilled, rejected, promise in self._queue:
-                if fulfilled:
-                    deferred = Deferred(self._generate_wrapper(fulfilled, self._result), self._scheduler, promise)
-                else:
-                    deferred = Deferred(lambda: self._result, self._scheduler, promise)
+    def _add_listener(self, listener, index):
+        """
+        Notify the listener of the completion of this promise by calling listener(index, fulfilled, value) on the
+        scheduling thread.  Unlike then, this doesn't create a new promise or any wrappers, which keeps joining large
+        numbers of promises cheap.
+        :param listener: callable to notify.
+        :param index: index that will be provided to the listener.
+        """
+        if self._state is _State.PENDING:
+            if self._listeners is None:
+                self._listeners = []
+            self._listeners.append((listener, index))
+        else:
+            self._scheduler.queue_microtask(listener, index, self._state is _State.FULFILLED, self._value)
 
-                self._scheduler.schedule_task(deferred, delay=0.0)
+    def resolved(self, result):
+        self._settle(_State.FULFILLED, result)
 
-        self._queue = None
+    def rejected(self, error):
+        self._settle(_State.REJECTED, error)
 
-    def _generate_wrapper(self, function, arg):
+    def _settle(self, state, value):
         """
-        Generate a wrapper.
-        :param function: function to call
-        :param arg: arg to use
+        Store the result of the promise and schedule all of the callbacks that are waiting on it.
+        :param state: the state to move to.
+        :param value: result or error of the promise.
         """
-        def method():
-            return function(arg)
-        return method
+        if self._state is not _State.PENDING:
+            return
 
-    def rejected(self, error):
+        self._state = state
+        self._value = value
 
-        if not (self._resolved or self._rejected):
-            self._rejected = True
-            self._error = error
-            # schedule the rejected method call
-            for fulfilled, rejected, promise in self._queue:
-                if rejected:
-                    deferred = Deferred(self._generate_wrapper(rejected, self._error), self._scheduler, promise)
-                    self._scheduler.schedule_task(deferred, delay=0.0)
-                else:
-                    self._scheduler.schedule_task(lambda: promise.rejected(self._error), delay=0.0)
+        if self._listeners:
+            fulfilled = state is _State.FULFILLED
+            for listener, index in self._listeners:
+                self._scheduler.queue_microtask(listener, index, fulfilled, value)
+            self._listeners = None
 
-        self._queue = None
+        if self._queue:
+            for fulfilled, rejected, promise in self._queue:
+                self._schedule_callback(fulfilled, rejected, promise)
+            self._queue = None
 
 
 class _PromiseList:
@@ -187,48 +200,565 @@ class _PromiseList:
     Create a single promise that will be resolved or rejected when all of the defined promises are completed.
     """
 
-    def __init__(self, promises, scheduler):
+    def __init__(self, promises, scheduler, settled=False):
         """
         Constructor that will create all of the book keeping.
+        :param promises: promises to wait for.
+        :param scheduler: scheduler used to generate the promise.
+        :param settled: should the promise always be resolved with (fulfilled, value) tuples for each of the promises
+        instead of being rejected when one of the promises is rejected.
         """
-        self._promises = promises
-        self._results = []
-        self._resolved = []
+        self._results = [None] * len(promises)
+        self._remaining = len(promises)
         self._errors = False
-        self._scheduler = scheduler
+        self._settled = settled
         self._promise = scheduler.promise()
 
-        for index, promise in enumerate(self._promises):
-            self._results.append(None)
-            self._resolved.append(False)
-            promise.then(scheduler.generate_promise_handler(self._resolve_promise, index),
-                         scheduler.generate_promise_handler(self._reject_promise, index))
+        listener = self._promise_completed
+        for index, promise in enumerate(promises):
+            promise._add_listener(listener, index)
 
-    def _resolve_promise(self, result, index):
+        if not self._remaining:
+            self._promise.resolved(self._results)
+
+    def _promise_completed(self, index, fulfilled, result):
         """
         One of the sub promises was resolved/rejected so store the result and determine if all of the work is finished.
         """
+        if self._settled:
+            result = (fulfilled, result)
+        elif not fulfilled:
+            self._errors = True
+
         self._results[index] = result
-        self._resolved[index] = True
+        self._remaining -= 1
 
-        if False not in self._resolved:
+        if not self._remaining:
             if self._errors:
                 self._promise.rejected(self._results)
             else:
                 self._promise.resolved(self._results)
 
-    def _reject_promise(self, result, index):
+    @property
+    def promise(self):
+        return self._promise
+
+
+class _PromiseAny:
+    """
+    Create a single promise that will be resolved with the first of the promises that is resolved, or rejected with
+    all of the errors if all of the promises are rejected.
+    """
+
+    def __init__(self, promises, scheduler):
+        """
+        Constructor that will create all of the book keeping.
+        """
+        self._errors = [None] * len(promises)
+        self._remaining = len(promises)
+        self._promise = scheduler.promise()
+
+        listener = self._promise_completed
+        for index, promise in enumerate(promises):
+            promise._add_listener(listener, index)
+
+        if not self._remaining:
+            self._promise.rejected(self._errors)
+
+    def _promise_completed(self, index, fulfilled, result):
+        """
+        Resolve the promise with the first result, otherwise store the error, and reject the promise if all of the
+        promises have been rejected.
+        """
+        if fulfilled:
+            self._promise.resolved(result)
+            return
+
+        self._errors[index] = result
+        self._remaining -= 1
+
+        if not self._remaining:
+            self._promise.rejected(self._errors)
+
+    @property
+    def promise(self):
+        return self._promise
+
+
+class _LimitedMap:
+    """
+    Call a method for each of the values in an iterable, while keeping at most a fixed number of the returned promises
+    in flight.  The promise is resolved or rejected with the results in the same order as the values, in the same
+    manner as _PromiseList.
+    """
+
+    def __init__(self, iterable, method, concurrency, scheduler):
+        """
+        Constructor that will create all of the book keeping.  The work is started on the scheduling thread, which is
+        the thread that all of the book keeping is updated on.
+        """
+        if concurrency < 1:
+            raise ValueError('Concurrency must be at least 1: %s' % concurrency)
+
+        self._values = enumerate(iterable)
+        self._method = method
+        self._concurrency = concurrency
+        self._scheduler = scheduler
+
+        self._results = []
+        self._in_flight = 0
+        self._exhausted = False
+        self._errors = False
+        self._promise = scheduler.promise()
+
+        scheduler.queue_microtask(self._start)
+
+    def _start(self):
+        """
+        Start the first batch of work.
+        """
+        while self._in_flight < self._concurrency and self._start_next():
+            pass
+
+        self._check_finished()
+
+    def _start_next(self):
+        """
+        Start the work for the next value.
+        :return: False if there are no values left.
+        """
+        try:
+            index, value = next(self._values)
+        except StopIteration:
+            self._exhausted = True
+            return False
+        except Exception as e:
+            self._exhausted = True
+            self._errors = True
+            self._results.append(e)
+            return False
+
+        self._results.append(None)
+        self._in_flight += 1
+
+        self._scheduler.defer(self._method, value)._add_listener(self._promise_completed, index)
+
+        return True
+
+    def _promise_completed(self, index, fulfilled, result):
         """
-        Mark that this promise should be rejected once all of the values are returned.
+        Store the result and start the next piece of work.
         """
-        self._errors = True
-        self._resolve_promise(result, index)
+        if not fulfilled:
+            self._errors = True
+
+        self._results[index] = result
+        self._in_flight -= 1
+
+        if not self._exhausted:
+            self._start_next()
+
+        self._check_finished()
+
+    def _check_finished(self):
+        """
+        Notify the promise if all of the work is finished.
+        """
+        if self._exhausted and not self._in_flight:
+            if self._errors:
+                self._promise.rejected(self._results)
+            else:
+                self._promise.resolved(self._results)
 
     @property
     def promise(self):
         return self._promise
 
 
+def _callback_name(callback):
+    """
+    Determine the name of the function that originated a task, deferreds and partials are named after the method that
+    they wrap.
+    :param callback: callback of the task.
+    :return: name of the callback.
+    """
+    if isinstance(callback, Deferred):
+        callback = callback._method_call
+
+    if isinstance(callback, functools.partial):
+        callback = callback.func
+
+    name = getattr(callback, '__qualname__', None)
+    if name is None:
+        name = getattr(callback, '__name__', None)
+        owner = getattr(callback, '__self__', None)
+        if name is None:
+            name = type(callback).__name__
+        elif owner is not None:
+            name = '%s.%s' % (type(owner).__name__, name)
+
+    module = getattr(callback, '__module__', None)
+    if module:
+        name = '%s.%s' % (module, name)
+
+    return name
+
+
+class _ProfiledTask(object):
+    """
+    Wrapper around a task that records how long it waited in the run queue and how long it took to execute.
+    """
+
+    __slots__ = ('_callback', '_profiler', '_queued')
+
+    def __init__(self, callback, profiler):
+        self._callback = callback
+        self._profiler = profiler
+        self._queued = time.time()
+
+    def __call__(self, *args):
+        started = time.time()
+        try:
+            return self._callback(*args)
+        finally:
+            self._profiler.record(self._callback, started - self._queued, time.time() - started)
+
+
+class _Profiler:
+    """
+    Collects the queue wait and execution times of the tasks executed by the run queue, grouped by the name of the
+    function that originated them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statistics = dict()
+
+    def record(self, callback, wait_time, execution_time):
+        """
+        Record the execution of a task.
+        :param callback: callback of the task.
+        :param wait_time: time in seconds that the task waited in the queue.
+        :param execution_time: time in seconds that the task took to execute.
+        """
+        name = _callback_name(callback)
+
+        with self._lock:
+            statistics = self._statistics.get(name)
+            if statistics is None:
+                statistics = self._statistics[name] = dict(count=0, wait_total=0.0, wait_max=0.0,
+                                                           execution_total=0.0, execution_max=0.0)
+
+            statistics['count'] += 1
+            statistics['wait_total'] += wait_time
+            statistics['execution_total'] += execution_time
+            if wait_time > statistics['wait_max']:
+                statistics['wait_max'] = wait_time
+            if execution_time > statistics['execution_max']:
+                statistics['execution_max'] = execution_time
+
+    def statistics(self):
+        """
+        Retrieve a copy of the statistics.
+        :return: dictionary of function name to the statistics of the function.
+        """
+        with self._lock:
+            return dict((name, dict(values)) for name, values in self._statistics.items())
+
+    def reset(self):
+        """
+        Clear the statistics.
+        """
+        with self._lock:
+            self._statistics = dict()
+
+    def log_statistics(self, limit=20):
+        """
+        Log the functions that have used the most execution time.
+        :param limit: the maximum number of functions to log.
+        """
+        statistics = sorted(self.statistics().items(), key=lambda item: item[1]['execution_total'], reverse=True)
+
+        logger.info('Scheduler profile, %d functions' % len(statistics))
+        for name, values in statistics[:limit]:
+            logger.info('  %s: count=%d wait_total=%.6f wait_max=%.6f execution_total=%.6f execution_max=%.6f' %
+                        (name, values['count'], values['wait_total'], values['wait_max'], values['execution_total'],
+                         values['execution_max']))
+
+
+class _RunQueue:
+    """
+    Queue of tasks that are to be executed as soon as possible.  Instead of creating a scheduler entry for each of the
+    tasks, a single drain task is scheduled whenever the queue has work to do, and it executes all of the queued tasks.
+    """
+
+    def __init__(self, schedule_drain, batch_size):
+        """
+        Constructor.
+        :param schedule_drain: method that will schedule the provided drain method for execution.
+        :param batch_size: maximum number of tasks executed by a drain before yielding to the rest of the bot.
+        """
+        self._schedule_drain = schedule_drain
+        self._batch_size = batch_size
+
+        self._tasks = deque()
+        self._lock = threading.Lock()
+        self._drain_scheduled = False
+
+        self._counter = itertools.count(1)
+        self._last_executed = 0
+        self._cancelled = set()
+
+        # Profiler that is notified of the execution of the tasks, if profiling is enabled.
+        self.profiler = None
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def add(self, callback, *args):
+        """
+        Add a task to the queue.
+        :param callback: callback that is to be executed.
+        :param args: arguments that will be provided to the callback.
+        :return: the identifier of the task.
+        """
+        if self.profiler is not None:
+            callback = _ProfiledTask(callback, self.profiler)
+
+        with self._lock:
+            task_id = next(self._counter)
+            self._tasks.append((task_id, callback, args))
+
+            if self._drain_scheduled:
+                return task_id
+            self._drain_scheduled = True
+
+        self._schedule_drain(self.drain)
+
+        return task_id
+
+    def remove(self, task_id):
+        """
+        Cancel a task that has not been executed yet.  Since identifiers are handed out in execution order, tasks that
+        have already been executed are not tracked.
+        :param task_id: identifier of the task to cancel.
+        :return: None
+        """
+        with self._lock:
+            if task_id > self._last_executed:
+                self._cancelled.add(task_id)
+
+    def drain(self):
+        """
+        Execute the queued tasks, including the ones that are queued while draining, up to the batch size.  If there is
+        still work to be done, another drain will be scheduled.
+        :return: None
+        """
+        remaining = self._batch_size
+
+        while True:
+            while remaining and self._tasks:
+                task_id, callback, args = self._tasks.popleft()
+                self._last_executed = task_id
+
+                if self._cancelled and task_id in self._cancelled:
+                    self._cancelled.discard(task_id)
+                    continue
+
+                remaining -= 1
+
+                try:
+                    callback(*args)
+                except Exception:
+                    logger.exception('Error executing task: %s' % callback)
+
+            with self._lock:
+                if not self._tasks:
+                    self._drain_scheduled = False
+                    return
+                elif not remaining:
+                    break
+
+        self._schedule_drain(self.drain)
+
+
+class _TimerWheel:
+    """
+    Hashed timer wheel for timeouts.  Timers are stored in the slot of the tick that they expire on, along with the
+    number of revolutions of the wheel that are required before they expire, so adding and cancelling a timer are
+    constant time operations, and a cancelled timer is removed from the wheel immediately.  A single tick task is
+    scheduled while there are timers in the wheel.
+    """
+
+    def __init__(self, schedule_tick, execute, resolution, size):
+        """
+        Constructor.
+        :param schedule_tick: method that will schedule the provided tick method after the provided delay.
+        :param execute: method that will execute the callback of an expired timer.
+        :param resolution: length of a tick in seconds.
+        :param size: number of slots in the wheel.
+        """
+        self._schedule_tick = schedule_tick
+        self._execute = execute
+        self._resolution = resolution
+        self._size = size
+
+        self._slots = [dict() for _ in range(size)]
+        self._timers = dict()
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+
+        self._position = 0
+        self._next_tick = None
+
+    def __len__(self):
+        return len(self._timers)
+
+    def add(self, callback, delay):
+        """
+        Add a timer to the wheel.
+        :param callback: callback to execute when the timer expires.
+        :param delay: delay in seconds before the timer expires.
+        :return: the identifier of the timer.
+        """
+        with self._lock:
+            now = time.time()
+
+            start_ticking = self._next_tick is None
+            if start_ticking:
+                self._next_tick = now + self._resolution
+
+            ticks = max(0, int(math.ceil((now + delay - self._next_tick) / self._resolution)))
+            slot = (self._position + 1 + ticks) % self._size
+
+            timer_id = next(self._counter)
+            self._slots[slot][timer_id] = [ticks // self._size, callback]
+            self._timers[timer_id] = slot
+
+        if start_ticking:
+            self._schedule_tick(self.tick, self._resolution)
+
+        return timer_id
+
+    def remove(self, timer_id):
+        """
+        Cancel a timer that has not expired yet.
+        :param timer_id: identifier of the timer.
+        :return: None
+        """
+        with self._lock:
+            slot = self._timers.pop(timer_id, None)
+            if slot is not None:
+                del self._slots[slot][timer_id]
+
+    def tick(self):
+        """
+        Advance the wheel to the current time, and execute the timers that have expired.
+        :return: None
+        """
+        expired = []
+
+        with self._lock:
+            now = time.time()
+
+            while self._next_tick <= now:
+                self._position = (self._position + 1) % self._size
+                self._next_tick += self._resolution
+
+                slot = self._slots[self._position]
+                for timer_id, timer in list(slot.items()):
+                    if timer[0]:
+                        timer[0] -= 1
+                    else:
+                        del slot[timer_id]
+                        del self._timers[timer_id]
+                        expired.append(timer[1])
+
+            if self._timers:
+                delay = self._next_tick - now
+            else:
+                self._next_tick = None
+                delay = None
+
+        for callback in expired:
+            self._execute(callback)
+
+        if delay is not None:
+            self._schedule_tick(self.tick, delay)
+
+
+class _ThreadPool:
+    """
+    Bounded pool of threads that will execute methods off of the scheduling thread.  The pool keeps track of how much
+    work is waiting for a worker and how many of the workers are busy.
+    """
+
+    def __init__(self, max_workers):
+        """
+        Constructor.
+        :param max_workers: maximum number of threads in the pool.
+        """
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self._submitted = 0
+        self._started = 0
+        self._completed = 0
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Submit a method for execution in the pool.  The pool is created the first time that it is needed.
+        :param method: method to execute.
+        :param args: args associated with the method to execute.
+        :param kwargs: kwargs associated with the method to execute.
+        :return: future containing the results of the method.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = futures.ThreadPoolExecutor(max_workers=self._max_workers)
+            self._submitted += 1
+
+        return self._executor.submit(self._execute, method, args, kwargs)
+
+    def _execute(self, method, args, kwargs):
+        """
+        Execute the method inside of a worker thread and update the book keeping.
+        """
+        with self._lock:
+            self._started += 1
+
+        try:
+            return method(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._completed += 1
+
+    def statistics(self):
+        """
+        Retrieve the current usage of the pool.
+        :return: dictionary containing the statistics.
+        """
+        with self._lock:
+            active = self._started - self._completed
+
+            return dict(max_workers=self._max_workers,
+                        queue_depth=self._submitted - self._started,
+                        active=active,
+                        saturation=float(active) / self._max_workers,
+                        completed=self._completed)
+
+    def shutdown(self):
+        """
+        Shutdown the pool if it was started.  Work that has already been submitted is still executed.
+        :return: None
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
 class Scheduler(base_plugin):
     """
     Scheduler plugin that will wrap the scheduling functionality for the bots that are being defined.
@@ -237,12 +767,71 @@ class Scheduler(base_plugin):
     name = 'rho_bot_scheduler'
     dependencies = {}
     description = 'RHO: Scheduling Plugin'
+    default_config = {
+        # Maximum number of microtasks that will be executed in a single drain before yielding back to the rest of
+        # the bot's event processing.
+        'microtask_batch_size': 1000,
+
+        # Executor that will be used by defer, either EXECUTOR_SCHEDULER or EXECUTOR_POOL.
+        'executor': 'scheduler',
+
+        # Maximum number of threads that will be used to execute methods deferred to the pool.
+        'pool_size': 4,
+
+        # Maximum number of processes that will be used to execute methods deferred to the process pool, defaults to
+        # the number of processors on the machine.
+        'process_pool_size': None,
+
+        # Length of a tick of the timeout wheel in seconds, timeouts expire up to one tick late.
+        'timer_resolution': 0.1,
+
+        # Number of slots in the timeout wheel.
+        'timer_wheel_size': 512,
+
+        # Should the queue wait and execution time of the tasks be profiled from the start.
+        'profile': False,
+
+        # Interval in seconds between logging the profile statistics while profiling, disabled when not positive.
+        'profile_log_interval': 60.0,
+    }
+
+    EXECUTOR_SCHEDULER = 'scheduler'
+    EXECUTOR_POOL = 'pool'
 
     def plugin_init(self):
         """
         Initialize the scheduler.
         :return:
         """
+        self._task_counter = itertools.count()
+        self._run_queue = _RunQueue(self._schedule_run_queue_drain, self.microtask_batch_size)
+        self._thread_pool = _ThreadPool(self.pool_size)
+        self._process_pool = None
+        self._process_pool_lock = threading.Lock()
+
+        self._timer_wheel = _TimerWheel(self._schedule_timer_tick, self._run_queue.add, self.timer_resolution,
+                                        self.timer_wheel_size)
+
+        if self.executor not in (self.EXECUTOR_SCHEDULER, self.EXECUTOR_POOL):
+            raise ValueError('Unknown executor: %s' % self.executor)
+
+        self._profiler = None
+        self._cancel_profile_log = None
+
+        if self.profile:
+            self.enable_profiling()
+
+    def plugin_end(self):
+        """
+        Shutdown the thread and process pools.
+        :return:
+        """
+        self._thread_pool.shutdown()
+
+        with self._process_pool_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False)
+                self._process_pool = None
 
     def post_init(self):
         """
@@ -261,30 +850,190 @@ class Scheduler(base_plugin):
         :param execute_now: execute the task immediately
         :return: cancel method
         """
-        task_name = str(uuid.uuid4())
+        if delay <= 0.0 and not repeat:
+            task_id = self._run_queue.add(callback)
+            return _generate_cancel_method(task_id, self._run_queue)
+
+        task_name = self._generate_task_name()
 
         self.xmpp.schedule(task_name, delay, callback, repeat=repeat)
 
         return _generate_cancel_method(task_name, self.xmpp.scheduler)
 
+    def schedule_timeout(self, callback, delay):
+        """
+        Schedule a timeout that is to be executed after the delay, unless it is cancelled first.  Unlike schedule_task,
+        timeouts share a timer wheel, so they are cheap to create and cancel, and cancelled timeouts do not linger in
+        the scheduler.
+        :param callback: callback that is to be executed when the timeout expires.
+        :param delay: delay time in seconds before the timeout expires.
+        :return: cancel method
+        """
+        timer_id = self._timer_wheel.add(callback, delay)
+        return _generate_cancel_method(timer_id, self._timer_wheel)
+
+    def _schedule_timer_tick(self, tick, delay):
+        """
+        Schedule the next tick of the timer wheel with the sleekxmpp scheduler.
+        :param tick: tick method to execute.
+        :param delay: delay before the tick.
+        :return: None
+        """
+        self.xmpp.schedule(self._generate_task_name(), delay, tick)
+
+    def _generate_task_name(self):
+        """
+        Generate a unique name for a task that is scheduled with the sleekxmpp scheduler.
+        :return: task name.
+        """
+        return 'rho_bot_scheduler::%d' % next(self._task_counter)
+
+    def _schedule_run_queue_drain(self, drain):
+        """
+        Schedule the drain of the run queue with the sleekxmpp scheduler.
+        :param drain: drain method to execute.
+        :return: None
+        """
+        self.xmpp.schedule(self._generate_task_name(), 0.0, drain)
+
     def defer(self, method, *args, **kwargs):
         """
         Defer the method execution till a later time, but return a promise that will be used to notify listeners of the
-        results.
+        results.  The method is executed by the executor that is configured for the plugin.
         :param method: method to execute.
         :param args: args associated with the method to execute.
         :param kwargs: kwargs associated with the method to execute.
         :return: promise associated with the deferred.
         """
-        def execution_method():
-            return method(*args, **kwargs)
+        if self.executor == self.EXECUTOR_POOL:
+            return self.defer_to_pool(method, *args, **kwargs)
 
-        deferred = Deferred(execution_method, self)
+        deferred = Deferred(functools.partial(method, *args, **kwargs), self)
 
-        self.schedule_task(deferred, delay=0.0)
+        self.queue_microtask(deferred)
 
         return deferred.promise()
 
+    def defer_to_pool(self, method, *args, **kwargs):
+        """
+        Defer the method execution to the thread pool so that it doesn't block the scheduling thread.  The results of
+        the method are delivered to the promise on the scheduling thread.
+        :param method: method to execute.
+        :param args: args associated with the method to execute.
+        :param kwargs: kwargs associated with the method to execute.
+        :return: promise associated with the deferred.
+        """
+        promise = self.promise()
+
+        future = self._thread_pool.submit(method, *args, **kwargs)
+        future.add_done_callback(self.generate_promise_handler(self._future_completed, promise))
+
+        return promise
+
+    def defer_process(self, method, *args):
+        """
+        Defer the method execution to a pool of worker processes, so that CPU bound work (parsing and reasoning over
+        graphs) is not serialized by the interpreter lock.  The method and the arguments are pickled and shipped to the
+        worker, so the method must be defined at module level.  StoragePayload and ResultCollectionPayload objects can
+        be provided as arguments and returned as results, they will be rebuilt on the other side.
+        :param method: module level method to execute.
+        :param args: picklable args associated with the method to execute.
+        :return: promise that will be resolved with the rebuilt result of the method.
+        """
+        promise = self.promise()
+
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                self._process_pool = futures.ProcessPoolExecutor(max_workers=self.process_pool_size)
+
+            future = self._process_pool.submit(method, *args)
+
+        future.add_done_callback(self.generate_promise_handler(self._future_completed, promise))
+
+        return promise
+
+    def _future_completed(self, future, promise):
+        """
+        Notify the promise of the results of the future on the scheduling thread.
+        :param future: the completed future.
+        :param promise: promise to notify.
+        :return: None
+        """
+        self.queue_microtask(Deferred(future.result, self, promise))
+
+    def get_pool_statistics(self):
+        """
+        Retrieve the statistics of the thread pool: the number of methods waiting for a worker (queue_depth), the number
+        of busy workers (active) and the fraction of the pool that is busy (saturation).  The number of tasks waiting in
+        the run queue is provided as run_queue_depth, and the number of pending timeouts as pending_timeouts.
+        :return: dictionary of statistics.
+        """
+        statistics = self._thread_pool.statistics()
+        statistics['run_queue_depth'] = len(self._run_queue)
+        statistics['pending_timeouts'] = len(self._timer_wheel)
+
+        return statistics
+
+    def enable_profiling(self):
+        """
+        Start recording the queue wait and execution times of the tasks executed by the run queue.  The statistics are
+        logged periodically based on the profile_log_interval configuration.
+        :return: None
+        """
+        if self._profiler is not None:
+            return
+
+        self._profiler = _Profiler()
+        self._run_queue.profiler = self._profiler
+
+        if self.profile_log_interval and self.profile_log_interval > 0:
+            self._cancel_profile_log = self.schedule_task(self._profiler.log_statistics,
+                                                          delay=self.profile_log_interval, repeat=True)
+
+    def disable_profiling(self):
+        """
+        Stop recording the times of the tasks, and discard the statistics.
+        :return: None
+        """
+        self._run_queue.profiler = None
+        self._profiler = None
+
+        if self._cancel_profile_log:
+            self._cancel_profile_log()
+            self._cancel_profile_log = None
+
+    def get_profile_statistics(self):
+        """
+        Retrieve the statistics that were recorded while profiling.  The statistics are grouped by the name of the
+        function that was executed (the method wrapped by a deferred), and contain the number of executions (count), the
+        total and maximum time in seconds spent waiting in the queue (wait_total, wait_max) and executing
+        (execution_total, execution_max).
+        :return: dictionary of function name to statistics, empty when not profiling.
+        """
+        if self._profiler is None:
+            return dict()
+
+        return self._profiler.statistics()
+
+    def reset_profile_statistics(self):
+        """
+        Clear the statistics that have been recorded so far.
+        :return: None
+        """
+        if self._profiler is not None:
+            self._profiler.reset()
+
+    def queue_microtask(self, callback, *args):
+        """
+        Queue up a callback that should be executed as soon as possible by the scheduling thread of the bot.  All of the
+        queued callbacks are executed in batches by a single scheduled task instead of each callback being scheduled on
+        its own.  The callback is never executed on the stack of the caller.
+        :param callback: callback that is to be executed.
+        :param args: arguments that will be provided to the callback.
+        :return: identifier of the task in the run queue.
+        """
+        return self._run_queue.add(callback, *args)
+
     def promise(self):
         """
         Generate a promise for this scheduler without providing a deferred.
@@ -322,6 +1071,43 @@ class Scheduler(base_plugin):
         """
         return _PromiseList(promises, self).promise
 
+    def all_settled(self, *promises):
+        """
+        Create a promise that will be resolved when all of the promises provided are completed.  The result is a list
+        containing a (True, result) tuple for each resolved promise and a (False, error) tuple for each rejected promise.
+        """
+        return _PromiseList(promises, self, settled=True).promise
+
+    def race(self, *promises):
+        """
+        Create a promise that will be resolved or rejected with the first of the promises provided that is completed.
+        """
+        promise = self.promise()
+
+        for _promise in promises:
+            _promise.then(promise.resolved, promise.rejected)
+
+        return promise
+
+    def any(self, *promises):
+        """
+        Create a promise that will be resolved with the first of the promises provided that is resolved.  If all of the
+        promises are rejected, it will be rejected with the list of errors.
+        """
+        return _PromiseAny(promises, self).promise
+
+    def map_limit(self, iterable, method, concurrency=10):
+        """
+        Call the method with each of the values in the iterable, keeping at most concurrency of them in flight at any
+        time.  The method can return a value or a promise.
+        :param iterable: values to provide to the method.
+        :param method: method to call with each value.
+        :param concurrency: maximum number of method results that are waited on at the same time.
+        :return: promise that will be resolved with the list of results in the order of the values, or rejected with
+        the list of results and errors if any of the calls fail.
+        """
+        return _LimitedMap(iterable, method, concurrency, self).promise
+
 
 # Define the plugin that will be used to access this plugin.
 rho_bot_scheduler = Scheduler
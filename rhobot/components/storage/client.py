@@ -2,11 +2,16 @@
 Module that will be used to help storage clients connect to a data store.
 """
 import logging
+import threading
 
 from sleekxmpp.plugins.base import base_plugin
-from rhobot.components.storage.enums import Commands
-from rhobot.components.storage.events import STORAGE_FOUND, STORAGE_LOST
-from rhobot.components.storage.payload import StoragePayload, ResultCollectionPayload
+from sleekxmpp.plugins.xep_0050 import Command
+from rhobot.components.storage.command_queue import CommandQueue
+from rhobot.components.storage.enums import Commands, BatchResults
+from rhobot.components.storage.events import STORAGE_FOUND, STORAGE_LOST, NODE_MODIFIED
+from rhobot.components.storage.journal import Journal, payload_to_record, record_to_payload
+from rhobot.components.storage.node_cache import NodeCache
+from rhobot.components.storage.payload import BatchPayload, get_decoder, get_encoder, DECODER_STANZA, ENCODER_STANZA
 from rhobot.components.storage.namespace import NEO4J
 
 logger = logging.getLogger(__name__)
@@ -16,23 +21,93 @@ class StorageClient(base_plugin):
     """
     Storage client that will dump data to a storage object when one is found.
 
-    This client should also store a journal of commands in case a data store is not present for receiving data.  Then
-    when a new data storage object is present, the data will be uploaded to the storage bot.  Same thing will happen
-    when there are errors during storage.  The offending command will need to be saved off.
+    When a journal is configured, this client stores a journal of the write commands that are made while a data store
+    is not present for receiving data.  Then when a new data storage object is present, the commands are replayed to
+    the storage bot in the order that they were made.  Commands that fail during storage will also need to be saved
+    off.
 
-    In addition the storage should be queued up so that the storage bot is not flooded.
+    In addition the commands are queued up so that the storage bot is not flooded, only command_window commands are
+    sent without a response, and reads are sent before the writes that are waiting in the backlog.
+
+    The nodes that are retrieved with get_node and get_nodes are cached, the cached nodes are invalidated by the updates
+    made through this client and by the create and update messages that are received by the rdf publisher.
     """
 
     name = 'rho_bot_storage_client'
-    dependencies = {'xep_0050', 'xep_0122', 'rho_bot_scheduler', }
+    dependencies = {'xep_0030', 'xep_0050', 'xep_0122', 'rho_bot_scheduler', }
     description = 'RHO: Storage Client Plugin'
 
+    default_config = {
+        # Decoder used to read the forms returned by the storage bot, DECODER_STANZA or DECODER_ELEMENT.
+        'decoder': DECODER_STANZA,
+        # Encoder used to build the forms sent to the storage bot, ENCODER_STANZA or ENCODER_ELEMENT.
+        'encoder': ENCODER_STANZA,
+        # Path of the journal of write commands that are made while there is no storage bot, create_node and
+        # update_node are rejected while there is no storage bot when this is not defined.
+        'journal': None,
+        # Number of journal records that are written before the journal is synced to the disk.
+        'journal_sync_count': 100,
+        # Maximum time in seconds that a journal record is left unsynced.
+        'journal_sync_interval': 1.0,
+        # Maximum number of commands that are sent to the storage bot without a response, the other commands wait in a
+        # backlog.  The number of commands is not limited when this is not positive.
+        'command_window': 10,
+        # Time in seconds to wait for the response of a command before it is rejected.
+        'command_timeout': 30.0,
+        # Priority of the commands in the backlog by command name, commands with lower values are sent first.
+        'command_priorities': {
+            Commands.FIND_NODE.value: 0,
+            Commands.GET_NODE.value: 0,
+            Commands.CYPHER.value: 0,
+            Commands.GET_NODES.value: 0,
+            Commands.CREATE_NODE.value: 1,
+            Commands.UPDATE_NODE.value: 1,
+            Commands.DELETE_NODE.value: 1,
+            Commands.CREATE_NODES.value: 1,
+            Commands.UPDATE_NODES.value: 1,
+        },
+        # Maximum number of payloads that are sent in a single batch command.
+        'batch_size': 100,
+        # Time in seconds that the nodes retrieved from the storage bot are cached, caching is disabled when not
+        # positive.  Only the modifications that are published to the channel remove nodes from the cache, so caching
+        # is disabled by default.
+        'node_cache_ttl': 0.0,
+        # Maximum number of cached nodes.
+        'node_cache_size': 1024,
+    }
+
     def plugin_init(self):
         self._storage_jid = None
+        self._storage_payload, self._result_collection = get_decoder(self.decoder)
+        self._encode = get_encoder(self.encoder)
+        self._in_flight = dict()
+        self._in_flight_lock = threading.Lock()
+        self._command_queue = CommandQueue(self.command_window)
+        self._supported_commands_lock = threading.Lock()
+        self._supported_commands_jid = None
+        self._supported_commands_promise = None
+        self._node_cache = NodeCache(self.node_cache_ttl, self.node_cache_size)
+
+        self._journal = None
+        self._journal_lock = threading.Lock()
+        self._journal_promises = dict()
+        self._replay_token = None
+        if self.journal:
+            self._journal = Journal(self.journal, self._schedule_journal_sync, self.journal_sync_count,
+                                    self.journal_sync_interval)
+
+    def plugin_end(self):
+        """
+        Close the journal.
+        :return:
+        """
+        if self._journal is not None:
+            self._journal.close()
 
     def post_init(self):
         self.xmpp.add_event_handler('online:store', self._store_found)
         self.xmpp.add_event_handler('offline:store', self._store_left)
+        self.xmpp.add_event_handler(NODE_MODIFIED, self._node_modified)
 
         self._scheduler = self.xmpp['rho_bot_scheduler']
         self._commands = self.xmpp['xep_0050']
@@ -48,6 +123,9 @@ class StorageClient(base_plugin):
         logger.debug('Found a store: %s' % data)
         self.xmpp.event(STORAGE_FOUND)
         self._storage_jid = data
+        self._node_cache.clear()
+        self._clear_supported_commands()
+        self._replay_journal()
 
     def _store_left(self, data):
         """
@@ -58,8 +136,22 @@ class StorageClient(base_plugin):
         """
         if self._storage_jid == data:
             self._storage_jid = None
+            self._clear_supported_commands()
+            with self._journal_lock:
+                self._replay_token = None
+
+            # The responses of the commands that were sent to the storage bot will not be received.
+            self._command_queue.fail(RuntimeError('Storage node has left'))
             self.xmpp.event(STORAGE_LOST)
 
+    def _node_modified(self, about):
+        """
+        When a node has been modified, remove it from the cache.
+        :param about: uri of the node.
+        :return:
+        """
+        self._node_cache.invalidate(about)
+
     def has_store(self):
         """
         Is there a storage bot associated with this client.
@@ -67,41 +159,236 @@ class StorageClient(base_plugin):
         """
         return self._storage_jid is not None
 
+    def get_queue_statistics(self):
+        """
+        Retrieve the statistics of the command queue: the number of commands that are waiting for a response from the
+        storage bot (in_flight), and the number of commands waiting in the backlog (pending, and pending_by_priority).
+        :return: dictionary of statistics.
+        """
+        return self._command_queue.statistics()
+
+    def get_cache_statistics(self):
+        """
+        Retrieve the statistics of the node cache: the number of cached nodes (size), and the number of get requests that
+        were answered from the cache (hits) or had to be sent to the storage bot (misses).
+        :return: dictionary of statistics.
+        """
+        return self._node_cache.statistics()
+
+    def _invalidate_nodes(self, promise, abouts):
+        """
+        Remove the nodes that are modified by a command from the cache, they are removed again when the command has
+        completed, so that nodes retrieved while the command was outstanding are not cached either.
+        :param promise: promise of the command.
+        :param abouts: uris of the modified nodes.
+        :return: the promise.
+        """
+        def invalidate(result=None):
+            for about in abouts:
+                self._node_cache.invalidate(about)
+
+        invalidate()
+        promise.then(invalidate, invalidate)
+
+        return promise
+
+    def _cache_node(self, payload, version):
+        """
+        Store a node that was retrieved from the storage bot in the cache.
+        :param payload: storage payload of the node.
+        :param version: version of the cache when the node was requested.
+        :return: the storage payload.
+        """
+        self._node_cache.put(payload, version)
+        return payload
+
+    def _send_command(self, command, payload):
+        """
+        Queue a command for the storage bot, it is sent once there is room in the command window.
+        :param command: command to send.
+        :param payload: payload of the command.
+        :return: promise of the response of the command.
+        """
+        promise = self._scheduler.promise()
+        storage = self._encode(payload)
+
+        def send():
+            if not self.has_store():
+                promise.rejected(RuntimeError('Storage node is not defined'))
+                return
+
+            self._commands.send_command(jid=self._storage_jid, node=command.value,
+                                        payload=storage, flow=False, timeout=self.command_timeout,
+                                        callback=self._scheduler.generate_callback_promise(promise),
+                                        timeout_callback=lambda iq: promise.rejected(
+                                            RuntimeError('Storage command %s timed out' % command.value)))
+
+        return self._command_queue.submit(self.command_priorities.get(command.value, 0), promise, send)
+
     def create_node(self, payload):
         """
         Create a new node with the provided payload
         :param payload: payload to store in the data store.
         :return: ResultCollectionPayload
         """
-        promise = self._scheduler.promise()
+        return self._write(Commands.CREATE_NODE, payload)
 
-        if self.has_store():
-            storage = payload.populate_payload()
-            self._commands.send_command(jid=self._storage_jid, node=Commands.CREATE_NODE.value,
-                                        payload=storage, flow=False,
-                                        callback=self._scheduler.generate_callback_promise(promise))
+    def _write(self, command, payload):
+        """
+        Send a write command to the storage bot.  The command is recorded in the journal instead when there is no
+        storage bot, or when journaled commands have not been replayed yet, so that the commands are stored in order.
+        :param command: command to send.
+        :param payload: payload of the command.
+        :return: ResultCollectionPayload
+        """
+        promise = None
 
-            promise = promise.then(lambda s: ResultCollectionPayload(s['command']['form']))
-        else:
+        if self._journal is not None:
+            with self._journal_lock:
+                if not self.has_store() or len(self._journal):
+                    promise = self._scheduler.promise()
+                    identifier = self._journal.append(command.value, payload_to_record(payload))
+                    self._journal_promises[identifier] = promise
+
+        if promise is not None:
+            self._replay_journal()
+            return promise
+
+        if not self.has_store():
+            promise = self._scheduler.promise()
             promise.rejected(RuntimeError('Storage node is not defined'))
+            return promise
 
-        return promise
+        return self._send_write(command, payload)
+
+    def _send_write(self, command, payload):
+        """
+        Send a write command to the storage bot.
+        :param command: command to send.
+        :param payload: payload of the command.
+        :return: ResultCollectionPayload
+        """
+        return self._send_command(command, payload).then(lambda s: self._result_collection(s['command']['form']))
+
+    def _schedule_journal_sync(self, sync, delay):
+        """
+        Schedule the sync of the journal.
+        :param sync: sync method to execute.
+        :param delay: delay before the sync.
+        :return: None
+        """
+        self._scheduler.schedule_task(sync, delay=delay)
+
+    def _replay_journal(self):
+        """
+        Start replaying the journaled commands to the storage bot, unless they are already being replayed.
+        :return: None
+        """
+        with self._journal_lock:
+            if self._journal is None or self._replay_token is not None or not self.has_store():
+                return
+
+            entry = self._journal.first()
+            if entry is None:
+                return
+
+            token = self._replay_token = object()
+
+        self._replay_entry(token, entry)
+
+    def _replay_entry(self, token, entry):
+        """
+        Replay a journaled command, the next command is replayed once it has been completed.  Commands are left in the
+        journal when the storage bot leaves before they are completed.
+        :param token: token of the replay, the replay is stopped when it is no longer the current token.
+        :param entry: tuple of the identifier, command and payload record.
+        :return: None
+        """
+        identifier, command, record = entry
+
+        def completed(result, error=None):
+            with self._journal_lock:
+                if self._replay_token is not token:
+                    return
+
+                self._journal.complete(identifier)
+                promise = self._journal_promises.pop(identifier, None)
+
+                next_entry = self._journal.first()
+                if next_entry is None:
+                    self._replay_token = None
+
+            if promise is not None:
+                if error is None:
+                    promise.resolved(result)
+                else:
+                    promise.rejected(error)
+
+            if next_entry is not None:
+                self._replay_entry(token, next_entry)
+
+        def failed(error):
+            logger.error('Error replaying journaled %s command: %s' % (command, error))
+            completed(None, error)
+
+        self._send_write(Commands(command), record_to_payload(record)).then(completed, failed)
+
+    def _single_flight(self, command, payload, request):
+        """
+        Share an outstanding request with identical requests, so that only one command is sent to the storage bot.
+        Each of the callers is resolved with its own copy of the result.
+        :param command: command that is being executed.
+        :param payload: payload of the request.
+        :param request: method that will send the request and return its promise.
+        :return: promise of the request.
+        """
+        key = (command.value, payload.fingerprint())
+
+        with self._in_flight_lock:
+            promise = self._in_flight.get(key, None)
+            if promise is not None:
+                return promise.then(self._copy_result)
+
+            promise = request(payload)
+            self._in_flight[key] = promise
+
+        def completed(result):
+            with self._in_flight_lock:
+                if self._in_flight.get(key, None) is promise:
+                    del self._in_flight[key]
+
+        promise.then(completed, completed)
+
+        return promise.then(self._copy_result)
+
+    @staticmethod
+    def _copy_result(result):
+        """
+        Copy the result of a shared request, so that the callers do not modify each other's results.
+        :param result: storage payload or result collection payload.
+        :return: copy of the result.
+        """
+        return result.copy()
 
     def find_nodes(self, payload):
         """
-        Basic search for a node.
+        Basic search for a node.  Identical searches that are made while the search is outstanding share its command.
+        :param payload: StoragePayload containing a description of a node that is being searched for.
+        :return: ResultCollectionPayload
+        """
+        return self._single_flight(Commands.FIND_NODE, payload, self._find_nodes)
+
+    def _find_nodes(self, payload):
+        """
+        Send the find node command.
         :param payload: StoragePayload containing a description of a node that is being searched for.
         :return: ResultCollectionPayload
         """
         promise = self._scheduler.promise()
 
         if self.has_store():
-            storage = payload.populate_payload()
-            self._commands.send_command(jid=self._storage_jid, node=Commands.FIND_NODE.value,
-                                        payload=storage, flow=False,
-                                        callback=self._scheduler.generate_callback_promise(promise))
-
-            promise = promise.then(lambda s: ResultCollectionPayload(s['command']['form']))
+            promise = self._send_command(Commands.FIND_NODE, payload)
+            promise = promise.then(lambda s: self._result_collection(s['command']['form']))
         else:
             promise.rejected(RuntimeError('Storage node is not defined'))
 
@@ -113,24 +400,31 @@ class StorageClient(base_plugin):
         :param payload: payload that describes the node and the updated field values
         :return: ResultCollectionPayload.
         """
-        promise = self._scheduler.promise()
-
         if not payload.about:
+            promise = self._scheduler.promise()
             promise.rejected(AttributeError('Missing about field in the storage payload'))
-        elif self.has_store():
-            storage = payload.populate_payload()
-            self._commands.send_command(jid=self._storage_jid, node=Commands.UPDATE_NODE.value,
-                                        payload=storage, flow=False,
-                                        callback=self._scheduler.generate_callback_promise(promise))
-            promise = promise.then(lambda s: ResultCollectionPayload(s['command']['form']))
-        else:
-            promise.rejected(RuntimeError('Storage node is not defined'))
+            return promise
 
-        return promise
+        return self._invalidate_nodes(self._write(Commands.UPDATE_NODE, payload), [payload.about])
 
     def get_node(self, payload):
         """
-        Retrieve all of the details about a node from the storage provider.
+        Retrieve all of the details about a node from the storage provider.  Nodes are returned from the cache when
+        possible, and identical requests that are made while the request is outstanding share its command.
+        :param payload: payload containing an about for the object.
+        :return: a storage payload with all of the properties.
+        """
+        cached = self._node_cache.get(payload.about) if payload.about else None
+        if cached is not None:
+            promise = self._scheduler.promise()
+            promise.resolved(cached)
+            return promise
+
+        return self._single_flight(Commands.GET_NODE, payload, self._get_node)
+
+    def _get_node(self, payload):
+        """
+        Send the get node command.
         :param payload: payload containing an about for the object.
         :return: a storage payload with all of the properties.
         """
@@ -139,11 +433,9 @@ class StorageClient(base_plugin):
         if not payload.about:
             promise.rejected(AttributeError('Missing about field in the storage payload'))
         elif self.has_store():
-            storage = payload.populate_payload()
-            self._commands.send_command(jid=self._storage_jid, node=Commands.GET_NODE.value,
-                                        payload=storage, flow=False,
-                                        callback=self._scheduler.generate_callback_promise(promise))
-            promise = promise.then(lambda s: StoragePayload(s['command']['form']))
+            version = self._node_cache.version
+            promise = self._send_command(Commands.GET_NODE, payload)
+            promise = promise.then(lambda s: self._cache_node(self._storage_payload(s['command']['form']), version))
         else:
             promise.rejected(RuntimeError('Storage node is not defined'))
 
@@ -160,15 +452,210 @@ class StorageClient(base_plugin):
         if NEO4J.cypher not in payload.properties and str(NEO4J.cypher) not in payload.properties:
             promise.rejected(RuntimeError('Cypher query is not defined in the payload'))
         elif self.has_store():
-            storage = payload.populate_payload()
-            self._commands.send_command(jid=self._storage_jid, node=Commands.CYPHER.value,
-                                        payload=storage, flow=False,
-                                        callback=self._scheduler.generate_callback_promise(promise))
-            promise = promise.then(lambda s: ResultCollectionPayload(s['command']['form']))
+            promise = self._send_command(Commands.CYPHER, payload)
+            promise = promise.then(lambda s: self._result_collection(s['command']['form']))
         else:
             promise.rejected(RuntimeError('Storage node is not defined'))
 
         return promise
 
+    def create_nodes(self, payloads):
+        """
+        Create new nodes for all of the payloads.  The payloads are sent in batch commands when the storage bot supports
+        them, otherwise a create node command is sent for each of the payloads.
+        :param payloads: list of payloads to store in the data store.
+        :return: list containing a ResultCollectionPayload for each of the payloads.
+        """
+        return self._batch(Commands.CREATE_NODES, payloads, self.create_node, self._split_results)
+
+    def update_nodes(self, payloads):
+        """
+        Update the nodes described by the payloads.  The payloads are sent in batch commands when the storage bot
+        supports them, otherwise an update node command is sent for each of the payloads.
+        :param payloads: list of payloads that describe the nodes and the updated field values.
+        :return: list containing a ResultCollectionPayload for each of the payloads.
+        """
+        if not all(payload.about for payload in payloads):
+            promise = self._scheduler.promise()
+            promise.rejected(AttributeError('Missing about field in the storage payload'))
+            return promise
+
+        return self._invalidate_nodes(
+            self._batch(Commands.UPDATE_NODES, payloads, self.update_node, self._split_results),
+            [payload.about for payload in payloads])
+
+    def get_nodes(self, payloads):
+        """
+        Retrieve all of the details about the nodes from the storage provider.  Nodes are returned from the cache when
+        possible, the other payloads are sent in batch commands when the storage bot supports them, otherwise a get node
+        command is sent for each of them.
+        :param payloads: list of payloads containing an about for the objects.
+        :return: list containing a storage payload with all of the properties for each of the payloads.
+        """
+        if not all(payload.about for payload in payloads):
+            promise = self._scheduler.promise()
+            promise.rejected(AttributeError('Missing about field in the storage payload'))
+            return promise
+
+        cached = [self._node_cache.get(payload.about) for payload in payloads]
+        missing = [payload for payload, node in zip(payloads, cached) if node is None]
+
+        if not missing:
+            promise = self._scheduler.promise()
+            promise.resolved(cached)
+            return promise
+
+        version = self._node_cache.version
+
+        def merge(nodes):
+            nodes = iter(nodes)
+            return [node if node is not None else self._cache_node(next(nodes), version) for node in cached]
+
+        return self._batch(Commands.GET_NODES, missing,
+                           lambda payload: self._single_flight(Commands.GET_NODE, payload, self._get_node),
+                           self._split_nodes).then(merge)
+
+    def _batch(self, command, payloads, single, decode):
+        """
+        Send the payloads in batch commands of up to batch_size payloads.  When the storage bot doesn't support the
+        batch command, or there isn't a storage bot, the payloads are sent with the single payload method instead, which
+        are pipelined by the command queue.
+        :param command: batch command.
+        :param payloads: list of payloads.
+        :param single: method that sends a single payload.
+        :param decode: method that translates the response form and the payloads of a batch into a list of results.
+        :return: list of results for each of the payloads.
+        """
+        payloads = list(payloads)
+
+        def pipeline():
+            return self._scheduler.create_promise_list(*[single(payload) for payload in payloads])
+
+        if not payloads or not self.has_store() or (self._journal is not None and len(self._journal)):
+            return pipeline()
+
+        def send(supported_commands):
+            if command.value not in supported_commands:
+                return pipeline()
+
+            def send_batch(batch):
+                batch_payload = BatchPayload()
+                batch_payload.append(*batch)
+                return self._send_command(command, batch_payload).then(
+                    lambda s: decode(s['command']['form'], batch))
+
+            batch_size = max(self.batch_size, 1)
+            batches = [send_batch(payloads[index:index + batch_size])
+                       for index in range(0, len(payloads), batch_size)]
+
+            return self._scheduler.create_promise_list(*batches).then(
+                lambda results: [result for batch_results in results for result in batch_results])
+
+        return self._supported_commands().then(send)
+
+    @staticmethod
+    def _batch_index(flags, count):
+        """
+        Retrieve the index of the payload of a batch command that a result belongs to.
+        :param flags: flags of the result.
+        :param count: number of payloads in the command.
+        :return: the index, or None when the index is missing or invalid.
+        """
+        try:
+            index = int(BatchResults.INDEX.fetch_from(flags))
+        except (TypeError, ValueError):
+            return None
+
+        return index if 0 <= index < count else None
+
+    def _split_results(self, form, batch):
+        """
+        Split the results of a batch command into a result collection for each of the payloads of the command.
+        :param form: response form of the command.
+        :param batch: payloads of the command.
+        :return: list of ResultCollectionPayload.
+        """
+        collections = [self._result_collection() for _ in batch]
+
+        for result in self._result_collection(form).results:
+            index = self._batch_index(result.flags, len(batch))
+            if index is None:
+                logger.warning('Ignoring batch result with an invalid index: %s' % result.about)
+            else:
+                collections[index].append(result)
+
+        return collections
+
+    def _split_nodes(self, form, batch):
+        """
+        Match the nodes returned by a batch get nodes command to the payloads of the command.
+        :param form: response form of the command.
+        :param batch: payloads of the command.
+        :return: list of storage payloads.
+        """
+        nodes = [None] * len(batch)
+
+        for node in BatchPayload(form).payloads:
+            index = self._batch_index(node.flags, len(batch))
+            if index is None:
+                logger.warning('Ignoring batch node with an invalid index: %s' % node.about)
+                continue
+
+            for flag in [flag for flag in node.flags if flag.var == BatchResults.INDEX.var]:
+                del node.flags[flag]
+
+            nodes[index] = node
+
+        missing = [str(payload.about) for payload, node in zip(batch, nodes) if node is None]
+        if missing:
+            raise RuntimeError('Storage node did not return the nodes: %s' % ', '.join(missing))
+
+        return nodes
+
+    def _supported_commands(self):
+        """
+        Retrieve the commands that are advertised by the storage bot.  They are requested again when the storage bot
+        is found again, and when the request failed, in which case none of the commands are considered to be supported
+        until the next request.
+        :return: promise of the set of command names.
+        """
+        storage_jid = self._storage_jid
+
+        with self._supported_commands_lock:
+            if self._supported_commands_jid == storage_jid:
+                return self._supported_commands_promise
+
+            promise = self._scheduler.promise()
+            self._supported_commands_jid = storage_jid
+            self._supported_commands_promise = promise
+
+        def failed(iq):
+            with self._supported_commands_lock:
+                if self._supported_commands_promise is promise:
+                    self._supported_commands_jid = None
+                    self._supported_commands_promise = None
+
+            promise.resolved(set())
+
+        def handle_items(iq):
+            if iq['type'] == 'error':
+                failed(iq)
+            else:
+                promise.resolved(set(node for _, node, _ in iq['disco_items']['items']))
+
+        self.xmpp['xep_0030'].get_items(jid=storage_jid, node=Command.namespace, block=False, callback=handle_items,
+                                        timeout_callback=failed)
+
+        return promise
+
+    def _clear_supported_commands(self):
+        """
+        Forget the commands that are advertised by the storage bot, since it might have been restarted or upgraded.
+        :return: None
+        """
+        with self._supported_commands_lock:
+            self._supported_commands_jid = None
+            self._supported_commands_promise = None
+
 
 rho_bot_storage_client = StorageClient
@@ -0,0 +1,129 @@
+"""
+Flow control for the commands that are sent to a storage bot.
+"""
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CommandQueue:
+    """
+    Queue that limits the number of commands that are waiting for a response from the storage bot.  Commands that are
+    submitted while the window is full wait in a backlog, the commands with the lowest priority value are sent first,
+    and commands with the same priority are sent in the order that they were submitted.
+    """
+
+    def __init__(self, window):
+        """
+        Constructor.
+        :param window: maximum number of commands that are sent without a response, not limited when not positive.
+        """
+        self._window = window
+
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._backlog = dict()
+        self._pending = 0
+
+    def __len__(self):
+        """
+        Retrieve the number of commands that have been submitted, but not completed.
+        """
+        return len(self._in_flight) + self._pending
+
+    def submit(self, priority, promise, send):
+        """
+        Submit a command.
+        :param priority: priority of the command, lower values are sent first.
+        :param promise: promise that will be resolved by the command when it has completed.
+        :param send: method that sends the command.
+        :return: the promise.
+        """
+        with self._lock:
+            if self._window > 0 and len(self._in_flight) >= self._window:
+                self._backlog.setdefault(priority, deque()).append((promise, send))
+                self._pending += 1
+                return promise
+
+            self._in_flight.add(promise)
+
+        self._send(promise, send)
+
+        return promise
+
+    def _send(self, promise, send):
+        """
+        Send a command, the next command from the backlog is sent when it has completed.
+        :param promise: promise of the command.
+        :param send: method that sends the command.
+        """
+        def completed(result):
+            self._completed(promise)
+
+        promise.then(completed, completed)
+
+        try:
+            send()
+        except Exception as e:
+            logger.exception('Error sending command')
+            promise.rejected(e)
+
+    def _completed(self, promise):
+        """
+        Release the slot of a completed command, and send the next command from the backlog.
+        :param promise: promise of the command.
+        """
+        with self._lock:
+            if promise not in self._in_flight:
+                return
+
+            self._in_flight.remove(promise)
+
+            if not self._pending:
+                return
+
+            priority = min(self._backlog)
+            queue = self._backlog[priority]
+            next_promise, next_send = queue.popleft()
+            if not queue:
+                del self._backlog[priority]
+
+            self._pending -= 1
+            self._in_flight.add(next_promise)
+
+        self._send(next_promise, next_send)
+
+    def fail(self, error):
+        """
+        Reject all of the commands that are waiting for a response or in the backlog, and release their slots.  Used when
+        the responses of the commands will never be received.
+        :param error: error to reject the commands with.
+        :return: None
+        """
+        with self._lock:
+            promises = list(self._in_flight)
+            for queue in self._backlog.itervalues():
+                promises.extend(promise for promise, _ in queue)
+
+            self._in_flight.clear()
+            self._backlog.clear()
+            self._pending = 0
+
+        for promise in promises:
+            promise.rejected(error)
+
+    def statistics(self):
+        """
+        Retrieve the statistics of the queue: the number of commands that are waiting for a response (in_flight), the
+        number of commands in the backlog (pending), and the number of commands in the backlog by priority.
+        :return: dictionary of statistics.
+        """
+        with self._lock:
+            return {
+                'window': self._window,
+                'in_flight': len(self._in_flight),
+                'pending': self._pending,
+                'pending_by_priority': dict((priority, len(queue)) for priority, queue in self._backlog.iteritems()),
+            }
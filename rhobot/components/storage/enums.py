@@ -21,6 +21,13 @@ class Flag:
         self._field_type = args[1]
         self._default = args[2]
 
+    def __reduce_ex__(self, protocol):
+        """
+        Provide a means of pickling the flag.  This is also required so that the enumerations that mix in this class
+        are picklable.
+        """
+        return Flag, (self._var, self._field_type, self._default)
+
     @property
     def var(self):
         return self._var
@@ -57,6 +64,9 @@ class Commands(Enum):
     FIND_NODE = 'find_node'
     GET_NODE = 'get_node'
     CYPHER = 'cypher'
+    CREATE_NODES = 'create_nodes'
+    UPDATE_NODES = 'update_nodes'
+    GET_NODES = 'get_nodes'
 
 
 @unique
@@ -81,6 +91,12 @@ class FindResults(Flag, Enum):
     CREATED = ('created', 'boolean', False)
 
 
+@unique
+class BatchResults(Flag, Enum):
+    # Index of the payload of a batch command that the result belongs to.
+    INDEX = ('batch_index', 'text-single', None)
+
+
 @unique
 class CypherFlags(Flag, Enum):
     TRANSLATION_KEY = ('translation_key', 'text-single', json.dumps({str(RDF.about): 'node'}))
@@ -1,2 +1,3 @@
 STORAGE_FOUND = 'rhobot::storage::found'
 STORAGE_LOST = 'rhobot::storage::lost'
+NODE_MODIFIED = 'rhobot::storage::node_modified'
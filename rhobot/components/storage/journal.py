@@ -0,0 +1,238 @@
+"""
+Journal of the write commands that could not be sent to a storage bot.  The journal is an append-only file of json
+lines, every command is recorded with an identifier, and a completion record is appended once the command has been
+replayed.  The file is truncated when all of the recorded commands have been completed.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from rhobot.components.storage.enums import Flag
+from rhobot.components.storage.payload import StoragePayload
+
+logger = logging.getLogger(__name__)
+
+
+def _text(value):
+    """
+    Convert the strings that are read from the journal back to byte strings, which are used by the payloads.
+    :param value: value read from the journal.
+    :return: value
+    """
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, list):
+        return [_text(val) for val in value]
+
+    return value
+
+
+def payload_to_record(payload):
+    """
+    Translate a storage payload into a record that can be written to the journal.
+    :param payload: storage payload.
+    :return: dictionary of the contents of the payload.
+    """
+    return {
+        'about': str(payload.about) if payload.about else None,
+        'types': list(payload.types),
+        'properties': dict((str(key), list(value)) for key, value in payload.properties.iteritems()),
+        'references': dict((str(key), list(value)) for key, value in payload.references.iteritems()),
+        'flags': [(key.var, key.field_type, value) for key, value in payload.flags.iteritems()],
+    }
+
+
+def record_to_payload(record):
+    """
+    Translate a record that was read from the journal back into a storage payload.
+    :param record: dictionary of the contents of the payload.
+    :return: storage payload.
+    """
+    payload = StoragePayload()
+    payload.about = _text(record['about'])
+    payload.add_type(*_text(record['types']))
+
+    for key, value in record['properties'].iteritems():
+        payload.add_property(_text(key), _text(value))
+
+    for key, value in record['references'].iteritems():
+        payload.add_reference(_text(key), _text(value))
+
+    for var, field_type, value in record['flags']:
+        payload.flags[Flag(_text(var), _text(field_type), None)] = _text(value)
+
+    return payload
+
+
+class Journal:
+    """
+    Append-only journal of commands.  The records are flushed to the file when they are written, but the file is only
+    synced to the disk once sync_count records have been written or sync_interval seconds after the first unsynced
+    record, so that bursts of commands share a single fsync.
+    """
+
+    def __init__(self, path, schedule_sync, sync_count=100, sync_interval=1.0):
+        """
+        Constructor.  Commands that were recorded, but never completed, are read from an existing journal.
+        :param path: path of the journal file.
+        :param schedule_sync: method that schedules a callback to be executed after a delay, in seconds.
+        :param sync_count: number of records that are written before the file is synced.
+        :param sync_interval: maximum time in seconds that a record is left unsynced.
+        """
+        self._path = path
+        self._schedule_sync = schedule_sync
+        self._sync_count = sync_count
+        self._sync_interval = sync_interval
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._unsynced = 0
+        self._sync_scheduled = False
+
+        self._load()
+        self._file = open(self._path, 'a')
+
+        if not self._entries:
+            self._truncate()
+
+    def __len__(self):
+        """
+        Retrieve the number of commands that have not been completed.
+        """
+        return len(self._entries)
+
+    def _load(self):
+        """
+        Read the commands that have not been completed from the journal file.  A record that was torn when the bot
+        stopped while it was being written is removed from the end of the file, so that the next record is not appended
+        to it.
+        """
+        if not os.path.exists(self._path):
+            return
+
+        valid_end = 0
+        terminated = True
+
+        with open(self._path, 'r+') as journal_file:
+            for line in iter(journal_file.readline, ''):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning('Skipping unreadable journal record: %s' % line.strip())
+                    continue
+
+                valid_end = journal_file.tell()
+                terminated = line.endswith('\n')
+
+                if 'complete' in record:
+                    self._entries.pop(record['complete'], None)
+                else:
+                    self._entries[record['id']] = (_text(record['command']), record['payload'])
+
+            if valid_end < journal_file.tell() or not terminated:
+                journal_file.seek(valid_end)
+                journal_file.truncate()
+                if not terminated:
+                    journal_file.write('\n')
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+        if self._entries:
+            logger.info('Loaded %d journaled commands from %s' % (len(self._entries), self._path))
+
+    def _write(self, record):
+        """
+        Write a record to the journal, the file is synced when enough records have been written, otherwise a sync is
+        scheduled.
+        :param record: record to write.
+        """
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+
+        if self._unsynced >= self._sync_count:
+            self._sync()
+        elif not self._sync_scheduled:
+            self._sync_scheduled = True
+            self._schedule_sync(self.sync, self._sync_interval)
+
+    def _sync(self):
+        """
+        Sync the contents of the journal file to the disk.
+        """
+        if self._unsynced and not self._file.closed:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def _truncate(self):
+        """
+        Remove all of the records from the journal file.
+        """
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def sync(self):
+        """
+        Sync the records that have been written to the disk.
+        :return: None
+        """
+        with self._lock:
+            self._sync_scheduled = False
+            self._sync()
+
+    def append(self, command, payload):
+        """
+        Record a command.
+        :param command: name of the command.
+        :param payload: record of the payload of the command, see payload_to_record.
+        :return: identifier of the command.
+        """
+        identifier = uuid.uuid4().hex
+
+        with self._lock:
+            self._write({'id': identifier, 'command': command, 'payload': payload})
+            self._entries[identifier] = (command, payload)
+
+        return identifier
+
+    def first(self):
+        """
+        Retrieve the oldest command that has not been completed.
+        :return: tuple of the identifier, command and payload record, or None.
+        """
+        with self._lock:
+            for identifier, (command, payload) in self._entries.iteritems():
+                return identifier, command, payload
+
+        return None
+
+    def complete(self, identifier):
+        """
+        Record that a command has been completed, the journal file is truncated once all of the commands have been
+        completed.
+        :param identifier: identifier of the command.
+        :return: None
+        """
+        with self._lock:
+            if self._entries.pop(identifier, None) is None:
+                return
+
+            if self._entries:
+                self._write({'complete': identifier})
+            else:
+                self._truncate()
+
+    def close(self):
+        """
+        Sync and close the journal file.
+        :return: None
+        """
+        with self._lock:
+            self._sync()
+            self._file.close()
@@ -0,0 +1,142 @@
+"""
+Cache of the nodes that have been retrieved from a storage bot.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class NodeCache:
+    """
+    Cache of storage payloads keyed by the about of the node, bounded in size by evicting the least recently used
+    entries.  Entries expire after the time to live, and are removed when the node is modified.
+
+    Every invalidation increments the version of the cache, and the version is recorded for the invalidated node.  A
+    payload is not stored when its node was invalidated after it was requested, so that a request that was sent before
+    a modification cannot cache the node as it was before it.  The invalidations of as many nodes as the cache can hold
+    are recorded, the payloads that were requested before the oldest forgotten invalidation are not stored either.
+    """
+
+    def __init__(self, ttl, size):
+        """
+        Constructor.
+        :param ttl: time in seconds that nodes are cached for, caching is disabled when not positive.
+        :param size: maximum number of cached nodes.
+        """
+        self._ttl = ttl
+        self._size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._invalidations = OrderedDict()
+        self._invalidated = 0
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        """
+        Is the cache storing nodes.
+        """
+        return bool(self._ttl and self._ttl > 0 and self._size)
+
+    @property
+    def version(self):
+        """
+        Version of the cache, provided to put.
+        """
+        return self._version
+
+    def get(self, about):
+        """
+        Retrieve the node cached for the about.
+        :param about: uri of the node.
+        :return: copy of the cached storage payload or None.
+        """
+        if not self.enabled:
+            return None
+
+        about = str(about)
+
+        with self._lock:
+            entry = self._entries.pop(about, None)
+
+            if entry is None or entry[0] < time.time():
+                self._misses += 1
+                return None
+
+            self._entries[about] = entry
+            self._hits += 1
+
+        return entry[1].copy()
+
+    def put(self, payload, version):
+        """
+        Store a node, nodes without an about are not stored.
+        :param payload: storage payload of the node.
+        :param version: version of the cache when the node was requested.
+        :return: None
+        """
+        if not self.enabled or not payload.about:
+            return
+
+        about = str(payload.about)
+        payload = payload.copy()
+
+        with self._lock:
+            if self._invalidations.get(about, self._invalidated) > version:
+                return
+
+            self._entries.pop(about, None)
+            self._entries[about] = (time.time() + self._ttl, payload)
+
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, about):
+        """
+        Remove a node from the cache.
+        :param about: uri of the node.
+        :return: None
+        """
+        if not about:
+            return
+
+        about = str(about)
+
+        with self._lock:
+            self._version += 1
+            self._entries.pop(about, None)
+
+            self._invalidations.pop(about, None)
+            self._invalidations[about] = self._version
+
+            while len(self._invalidations) > self._size:
+                _, invalidated = self._invalidations.popitem(last=False)
+                self._invalidated = max(self._invalidated, invalidated)
+
+    def clear(self):
+        """
+        Remove all of the nodes.
+        :return: None
+        """
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._invalidations.clear()
+            self._invalidated = self._version
+
+    def statistics(self):
+        """
+        Retrieve the statistics of the cache: the number of cached nodes (size), and the number of hits and misses.
+        :return: dictionary of statistics.
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+            }
@@ -1,2 +1,7 @@
 from rhobot.components.storage.payload.storage import StoragePayload
 from rhobot.components.storage.payload.result import ResultPayload, ResultCollectionPayload
+from rhobot.components.storage.payload.batch import BatchPayload
+from rhobot.components.storage.payload.decoder import ElementStoragePayload, ElementResultCollectionPayload, \
+    get_decoder, DECODER_STANZA, DECODER_ELEMENT
+from rhobot.components.storage.payload.encoder import encode_storage_payload, encode_result_collection, get_encoder, \
+    ENCODER_STANZA, ENCODER_ELEMENT
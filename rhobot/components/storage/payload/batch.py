@@ -0,0 +1,134 @@
+"""
+Payload for sending multiple storage payloads in a single command.
+"""
+from rdflib.namespace import RDF
+from sleekxmpp.plugins.xep_0004 import Form, FormField
+from sleekxmpp.plugins.xep_0122 import FormValidation
+from sleekxmpp.xmlstream import ET
+from rhobot.components.storage.enums import Flag
+from rhobot.components.storage.payload.storage import StoragePayload
+
+
+class BatchPayload:
+    """
+    Collection of storage payloads that is transmitted as a multi-item form.  The reported fields of the form contain
+    the type and data type of all of the fields of the payloads, and each of the items contains the fields of a single
+    payload.
+    """
+
+    def __init__(self, container=None):
+        """
+        Constructor.
+        :param container: optional container to populate the payloads from.
+        """
+        self._payloads = []
+
+        if container:
+            self._unpack_container(container)
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def append(self, *args):
+        """
+        Append payloads to the batch.
+        :param args: storage payloads.
+        :return: None
+        """
+        self._payloads += args
+
+    def populate_payload(self):
+        """
+        Translate the payloads into a multi-item form.
+        :return: the populated form
+        """
+        container = Form()
+
+        reported = dict()
+        items = []
+
+        for payload in self._payloads:
+            fields = []
+
+            if payload.about:
+                fields.append((str(RDF.about), 'text-single', None, str(payload.about)))
+
+            if len(payload.types):
+                fields.append((str(RDF.type), 'list-multi', None, payload.types))
+
+            for key, value in payload.properties.iteritems():
+                fields.append((str(key), 'list-multi', 'xs:string', value))
+
+            for key, value in payload.references.iteritems():
+                fields.append((str(key), 'list-multi', 'xs:anyURI', value))
+
+            for key, value in payload.flags.iteritems():
+                fields.append((key.var, key.field_type, None, value))
+
+            for var, field_type, data_type, _ in fields:
+                if var not in reported:
+                    reported[var] = field_type
+                    reported_field = container.add_reported(var=var, ftype=field_type)
+                    if data_type:
+                        validation = FormValidation()
+                        validation['datatype'] = data_type
+                        reported_field.append(validation)
+
+            items.append(fields)
+
+        # The items only contain the fields that are defined by their payload, so they are built directly instead of
+        # through Form.add_item.
+        for fields in items:
+            item_xml = ET.Element('{%s}item' % container.namespace)
+            container.xml.append(item_xml)
+
+            for var, _, _, value in fields:
+                field = FormField()
+                field['type'] = reported[var]
+                field['var'] = var
+                field['value'] = value
+                item_xml.append(field.xml)
+
+        return container
+
+    def _unpack_container(self, container):
+        """
+        Unpack the items of the container to storage payloads.
+        """
+        reported = dict()
+        for var, reported_field in container.get_reported().iteritems():
+            reported[var] = (reported_field['type'], reported_field['validate']['datatype'])
+
+        for item_xml in container.xml.findall('{%s}item' % container.namespace):
+            payload = StoragePayload()
+
+            for field_xml in item_xml.findall('{%s}field' % FormField.namespace):
+                field = FormField(xml=field_xml)
+                key = field['var']
+                field_type, data_type = reported.get(key, ('', ''))
+                if not field['type']:
+                    field['type'] = field_type
+                value = field.get_value()
+
+                if key == str(RDF.about):
+                    payload.about = value
+                elif key == str(RDF.type):
+                    if isinstance(value, basestring):
+                        value = [value]
+                    payload.add_type(*value)
+                elif data_type == 'xs:string':
+                    payload.add_property(key, value)
+                elif data_type == 'xs:anyURI':
+                    payload.add_reference(key, value)
+                else:
+                    payload.flags[Flag(*(key, field_type, None))] = value
+
+            self._payloads.append(payload)
+
+    @property
+    def payloads(self):
+        """
+        Retrieve the storage payloads of the batch.
+        :return: list of storage payloads.
+        """
+        return self._payloads
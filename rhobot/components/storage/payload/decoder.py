@@ -0,0 +1,132 @@
+"""
+Decoders for the payloads.  The default decoder reads the data forms through the sleekxmpp stanza accessors, the element
+decoder walks the xml of the form directly, which is considerably faster for forms with a lot of fields or items.
+"""
+from rdflib.namespace import RDF
+from sleekxmpp.plugins.xep_0004 import FormField
+from sleekxmpp.plugins.xep_0122 import FormValidation
+from rhobot.components.storage.enums import Flag
+from rhobot.components.storage.payload.storage import StoragePayload
+from rhobot.components.storage.payload.result import ResultCollectionPayload
+
+DECODER_STANZA = 'stanza'
+DECODER_ELEMENT = 'element'
+
+_FIELD_TAG = '{%s}field' % FormField.namespace
+_VALUE_TAG = '{%s}value' % FormField.namespace
+_REPORTED_FIELD_TAG = '{%s}reported/{%s}field' % (FormField.namespace, FormField.namespace)
+_VALIDATE_TAG = '{%s}validate' % FormValidation.namespace
+
+
+def _field_value(field_xml, field_type):
+    """
+    Read the value of a field, this provides the same values as FormField.get_value.
+    :param field_xml: xml of the field.
+    :param field_type: type of the field.
+    :return: value of the field.
+    """
+    values_xml = field_xml.findall(_VALUE_TAG)
+
+    if not values_xml:
+        return None
+    elif field_type == 'boolean':
+        return values_xml[0].text in FormField.true_values
+    elif field_type in FormField.multi_value_types or len(values_xml) > 1:
+        values = [value_xml.text or '' for value_xml in values_xml]
+        if field_type == 'text-multi':
+            values = '\n'.join(values)
+        return values
+    else:
+        return values_xml[0].text or ''
+
+
+def _field_datatype(field_xml):
+    """
+    Read the data type of the validation of a field.
+    :param field_xml: xml of the field.
+    :return: data type or an empty string.
+    """
+    validate_xml = field_xml.find(_VALIDATE_TAG)
+
+    if validate_xml is None:
+        return ''
+
+    return validate_xml.get('datatype', '')
+
+
+class ElementStoragePayload(StoragePayload):
+    """
+    Storage payload that is unpacked from the xml of the form.
+    """
+
+    def _unpack_payload(self, container):
+        """
+        Unpack the current container to class variables.
+        """
+        self.about = None
+        self._types = []
+        self._properties = {}
+        self._references = {}
+
+        for field_xml in container.xml.findall(_FIELD_TAG):
+            key = field_xml.get('var', '')
+            field_type = field_xml.get('type', '')
+            rdf_type = _field_datatype(field_xml)
+            value = _field_value(field_xml, field_type)
+
+            if key == str(RDF.about):
+                self.about = value
+            elif key == str(RDF.type):
+                self._types = value
+            elif rdf_type == 'xs:string':
+                self._properties[key] = value
+            elif rdf_type == 'xs:anyURI':
+                self._references[key] = value
+            else:
+                key = Flag(*(key, field_type, None))
+                self._flags[key] = value
+
+
+class ElementResultCollectionPayload(ResultCollectionPayload):
+    """
+    Result collection payload that parses the items from the xml of the form.
+    """
+
+    def _read_reported(self):
+        """
+        Read the reported fields of the container.
+        :return: dictionary of field var to the field type and data type of the field.
+        """
+        reported_values = dict()
+
+        for field_xml in self._container.xml.findall(_REPORTED_FIELD_TAG):
+            reported_values[field_xml.get('var', '')] = (field_xml.get('type', ''), _field_datatype(field_xml))
+
+        return reported_values
+
+    def _item_values(self, item_xml):
+        """
+        Read the values of the fields of an item.
+        :param item_xml: xml of the item.
+        :return: list of field var and value tuples.
+        """
+        return [(field_xml.get('var', ''), _field_value(field_xml, field_xml.get('type', '')))
+                for field_xml in item_xml.findall(_FIELD_TAG)]
+
+
+_DECODERS = {
+    DECODER_STANZA: (StoragePayload, ResultCollectionPayload),
+    DECODER_ELEMENT: (ElementStoragePayload, ElementResultCollectionPayload),
+}
+
+
+def get_decoder(name):
+    """
+    Retrieve the payload classes that are used to decode forms with the named decoder.
+    :param name: name of the decoder, DECODER_STANZA or DECODER_ELEMENT.
+    :return: tuple of the storage payload class and result collection payload class.
+    """
+    try:
+        return _DECODERS[name]
+    except KeyError:
+        raise ValueError('Unknown decoder: %s' % name)
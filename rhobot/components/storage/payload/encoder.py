@@ -0,0 +1,246 @@
+"""
+Encoders for the payloads.  The default encoder populates the data forms through the sleekxmpp stanza accessors, the
+element encoder builds the xml of the form directly, which is considerably faster for payloads with a lot of fields or
+items.  Both of the encoders generate the same xml.
+"""
+from collections import OrderedDict
+
+from rdflib.namespace import RDF
+from sleekxmpp.plugins.xep_0004 import Form, FormField
+from sleekxmpp.plugins.xep_0122 import FormValidation
+from sleekxmpp.xmlstream import ET
+from rhobot.components.storage.payload.storage import StoragePayload
+from rhobot.components.storage.payload.result import ResultCollectionPayload
+
+ENCODER_STANZA = 'stanza'
+ENCODER_ELEMENT = 'element'
+
+_FIELD_TAG = '{%s}field' % FormField.namespace
+_VALUE_TAG = '{%s}value' % FormField.namespace
+_ITEM_TAG = '{%s}item' % Form.namespace
+_REPORTED_TAG = '{%s}reported' % Form.namespace
+_VALIDATE_TAG = '{%s}validate' % FormValidation.namespace
+
+
+class _Validations:
+    """
+    Validation elements of a form, keyed by data type.  The elements are never modified after they are created, so a
+    single element is shared by all of the fields of the form that have the same data type.
+    """
+
+    def __init__(self):
+        self._elements = dict()
+
+    def __getitem__(self, data_type):
+        validation_xml = self._elements.get(data_type, None)
+
+        if validation_xml is None:
+            validation_xml = ET.Element(_VALIDATE_TAG)
+            validation_xml.attrib['datatype'] = data_type
+            self._elements[data_type] = validation_xml
+
+        return validation_xml
+
+
+def _append_value(field_xml, text):
+    """
+    Append a value element to the field.
+    :param field_xml: xml of the field.
+    :param text: text of the value.
+    """
+    value_xml = ET.Element(_VALUE_TAG)
+    value_xml.text = text
+    field_xml.append(value_xml)
+
+
+def _append_values(field_xml, field_type, value):
+    """
+    Append the values to a field, this provides the same xml as FormField.set_value.
+    :param field_xml: xml of the field.
+    :param field_type: type of the field.
+    :param value: value of the field.
+    """
+    if field_type == 'boolean':
+        _append_value(field_xml, '1' if value in FormField.true_values else '0')
+    elif field_type in FormField.multi_value_types or field_type in ('', None):
+        if isinstance(value, bool):
+            value = [value]
+        if not isinstance(value, list):
+            value = value.replace('\r', '').split('\n')
+        for val in value:
+            if field_type in ('', None) and val in FormField.true_values:
+                val = '1'
+            _append_value(field_xml, val)
+    else:
+        if isinstance(value, list):
+            raise ValueError('Cannot add multiple values to a %s field.' % field_type)
+        _append_value(field_xml, value)
+
+
+def _add_field(container, typed, var, field_type, value, validation_xml=None):
+    """
+    Add a field to the container, this provides the same xml as Form.add_field.
+    :param container: form to add the field to.
+    :param typed: True when the type of the field is defined by the type of the form.
+    :param var: var of the field.
+    :param field_type: type of the field.
+    :param value: value of the field.
+    :param validation_xml: optional validation element of the field.
+    """
+    field = FormField()
+    field_xml = field.xml
+
+    if var:
+        field_xml.attrib['var'] = var
+    if field_type:
+        field._type = field_type
+        if typed:
+            field_xml.attrib['type'] = field_type
+
+    _append_values(field_xml, field._type, value)
+
+    if validation_xml is not None:
+        field_xml.append(validation_xml)
+        field.init_plugin(FormValidation.plugin_attrib, existing_xml=validation_xml, reuse=False)
+
+    container.append(field)
+
+
+def encode_storage_payload(payload, container=None):
+    """
+    Translate the contents of a storage payload into a form, the same form is generated as
+    StoragePayload.populate_payload.
+    :param payload: storage payload to encode.
+    :param container: optional form to add the fields to.
+    :return: the populated form
+    """
+    if container is None:
+        container = Form()
+
+    typed = container['type'] in ('form', 'result')
+    validations = _Validations()
+
+    if payload.about:
+        _add_field(container, typed, str(RDF.about), 'text-single', str(payload.about))
+
+    if len(payload.types):
+        _add_field(container, typed, str(RDF.type), 'list-multi', payload.types)
+
+    for key, value in payload.properties.iteritems():
+        _add_field(container, typed, str(key), 'list-multi', value, validations['xs:string'])
+
+    for key, value in payload.references.iteritems():
+        _add_field(container, typed, str(key), 'list-multi', value, validations['xs:anyURI'])
+
+    for key, value in payload.flags.iteritems():
+        _add_field(container, typed, key.var, key.field_type, value)
+
+    return container
+
+
+def encode_result_collection(collection):
+    """
+    Translate the results of a result collection into its container, the same form is generated as
+    ResultCollectionPayload.populate_payload.
+    :param collection: result collection to encode.
+    :return: the populated form
+    """
+    results = collection.results
+    container = collection._container
+    container.clear()
+
+    validations = _Validations()
+    reported_xml = ET.Element(_REPORTED_TAG)
+    container.xml.append(reported_xml)
+
+    def add_reported(var, field_type, validation_xml=None):
+        field_xml = ET.SubElement(reported_xml, _FIELD_TAG)
+        if var:
+            field_xml.attrib['var'] = var
+        if field_type:
+            field_xml.attrib['type'] = field_type
+        if validation_xml is not None:
+            field_xml.append(validation_xml)
+
+    add_reported(str(RDF.about), 'list-multi')
+    add_reported(str(RDF.type), 'list-multi')
+
+    additional_flags = set()
+    additional_columns = set()
+    for result in results:
+        additional_flags.update(result.flags.keys())
+        additional_columns.update(result.columns.keys())
+
+    for flag_value in additional_flags:
+        add_reported(flag_value.var, flag_value.field_type)
+
+    for column_value in additional_columns:
+        add_reported(column_value.key, 'list-multi', validations[column_value.data_type])
+
+    # The items contain a field for every reported var, a var that is reported more than once uses the type of the
+    # last reported field.
+    reported = OrderedDict()
+    for field_xml in reported_xml:
+        reported[field_xml.get('var', '')] = field_xml.get('type', '')
+
+    for result in results:
+        parameters = {
+            str(RDF.about): str(result.about),
+            str(RDF.type): result.types
+        }
+
+        for key, value in result.flags.iteritems():
+            parameters[key.var] = value
+
+        for key, value in result.columns.iteritems():
+            parameters[key.key] = value
+
+        item_xml = ET.SubElement(container.xml, _ITEM_TAG)
+        for var, field_type in reported.iteritems():
+            field_xml = ET.SubElement(item_xml, _FIELD_TAG)
+            if var:
+                field_xml.attrib['var'] = var
+            _append_values(field_xml, field_type, parameters.get(var, None))
+
+    return container
+
+
+def _encode_stanza(payload):
+    """
+    Encode the payload through the stanza accessors.
+    :param payload: storage payload or result collection payload.
+    :return: the populated form
+    """
+    return payload.populate_payload()
+
+
+def _encode_element(payload):
+    """
+    Encode the payload by building the xml of the form directly.
+    :param payload: storage payload or result collection payload, other payloads are encoded by populate_payload.
+    :return: the populated form
+    """
+    if isinstance(payload, ResultCollectionPayload):
+        return encode_result_collection(payload)
+    elif isinstance(payload, StoragePayload):
+        return encode_storage_payload(payload)
+
+    return payload.populate_payload()
+
+
+_ENCODERS = {
+    ENCODER_STANZA: _encode_stanza,
+    ENCODER_ELEMENT: _encode_element,
+}
+
+
+def get_encoder(name):
+    """
+    Retrieve the method that is used to encode payloads into forms with the named encoder.
+    :param name: name of the encoder, ENCODER_STANZA or ENCODER_ELEMENT.
+    :return: method that accepts a storage payload or result collection payload and returns the populated form.
+    """
+    try:
+        return _ENCODERS[name]
+    except KeyError:
+        raise ValueError('Unknown encoder: %s' % name)
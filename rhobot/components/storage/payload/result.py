@@ -2,8 +2,9 @@
 Payload for passing around results of commands.  In most cases this is a list of the nodes that were interacted with.
 """
 import logging
+from collections import deque
 
-from sleekxmpp.plugins.xep_0004 import Form
+from sleekxmpp.plugins.xep_0004 import Form, FormField
 from sleekxmpp.plugins.xep_0122 import FormValidation
 from rdflib.namespace import RDF
 from rhobot.components.storage.enums import Flag
@@ -105,6 +106,37 @@ class ResultPayload:
 
         column_values += value
 
+    def merge(self, other):
+        """
+        Merge the types, flags and columns of another result payload about the same node into this payload.  Values
+        that are already stored are not duplicated.
+        :param other: result payload to merge.
+        :return: None
+        """
+        for value in other.types:
+            if value not in self._types:
+                self._types.append(value)
+
+        self._flags.update(other.flags)
+
+        for key, values in other.columns.iteritems():
+            column_values = self._columns.setdefault(key, [])
+            for value in values:
+                if value not in column_values:
+                    column_values.append(value)
+
+    def copy(self):
+        """
+        Create a copy of the payload, the values are not shared with the copy.
+        :return: result payload.
+        """
+        result = ResultPayload(about=self.about, types=self._types, flags=self._flags)
+
+        for key, values in self._columns.iteritems():
+            result._columns[key] = list(values)
+
+        return result
+
     def get_column(self, key, data_type='xs:string'):
         column_key = _ColumnKey(key, data_type)
 
@@ -135,7 +167,8 @@ class ResultPayload:
 
 class ResultCollectionPayload:
     """
-    Collection of result payloads.
+    Collection of result payloads.  When the collection is populated from a container, the items of the container are
+    only parsed when they are accessed, so retrieving the length or the first result does not parse all of them.
     """
 
     def __init__(self, container=None):
@@ -144,6 +177,9 @@ class ResultCollectionPayload:
         :param container: optional container to populate values from.
         """
         self._results = []
+        self._index = dict()
+        self._pending_items = None
+        self._reported_values = None
 
         if not container:
             self._container = Form()
@@ -151,55 +187,206 @@ class ResultCollectionPayload:
             self._container = container
             self._unpack_container()
 
+    def __getstate__(self):
+        """
+        Retrieve the state of the collection for pickling.  The container is not picklable, so it is rebuilt when the
+        collection is unpickled, the results are all that is needed to populate it again.
+        """
+        self._parse_items()
+
+        state = self.__dict__.copy()
+        del state['_container']
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore the state of the collection from a pickle.
+        """
+        self.__dict__.update(state)
+        self._container = Form()
+
+    def __len__(self):
+        """
+        Retrieve the number of results, without parsing the items of the container.
+        """
+        return len(self._results) + (len(self._pending_items) if self._pending_items else 0)
+
+    def __getitem__(self, index):
+        """
+        Retrieve a result, only the items of the container up to the result are parsed.
+        :param index: index of the result.
+        :return: result payload.
+        """
+        if index < 0:
+            self._parse_items()
+        else:
+            self._parse_items(index + 1)
+
+        return self._results[index]
+
+    def first(self):
+        """
+        Retrieve the first result.
+        :return: result payload or None.
+        """
+        if not len(self):
+            return None
+
+        return self[0]
+
     def append(self, *args):
         """
         Append a result to the collection.
         :param result:
         :return:
         """
-        self._results += args
+        self._parse_items()
+        self._append(args)
+
+    def _append(self, results):
+        """
+        Append results to the collection, and index them.
+        :param results: results to append.
+        """
+        self._results += results
+
+        for result in results:
+            if result.about is not None:
+                self._index.setdefault(str(result.about), result)
+
+    def merge(self, *args):
+        """
+        Add results to the collection, results about a node that is already in the collection are merged into the
+        existing result instead of being appended.
+        :param args: results to merge.
+        :return: None
+        """
+        self._parse_items()
+
+        for result in args:
+            existing = self._index.get(str(result.about), None) if result.about is not None else None
+
+            if existing is None:
+                self._append((result, ))
+            elif existing is not result:
+                existing.merge(result)
+
+    def copy(self):
+        """
+        Create a copy of the collection and of its results, the results are not shared with the copy.
+        :return: result collection payload.
+        """
+        collection = ResultCollectionPayload()
+        collection.append(*[result.copy() for result in self.results])
+
+        if hasattr(self, 'sources'):
+            collection.sources = set(self.sources)
+
+        return collection
+
+    def get(self, about):
+        """
+        Retrieve the result about the provided node.
+        :param about: uri of the node.
+        :return: result payload or None.
+        """
+        self._parse_items()
+
+        return self._index.get(str(about), None)
 
     def _unpack_container(self):
         """
-        Unpack the container into the internal data structures.
+        Find the items of the container, they are parsed into the internal data structures when they are accessed.
         """
         self._results = []
+        self._index = dict()
+        self._reported_values = None
+        self._pending_items = deque(self._container.xml.findall('{%s}item' % self._container.namespace))
+
+    def _parse_items(self, count=None):
+        """
+        Parse the items of the container that have not been parsed yet.
+        :param count: number of results that are required, all of the items are parsed when not defined.
+        """
+        if not self._pending_items:
+            return
+
+        if self._reported_values is None:
+            self._reported_values = self._read_reported()
+
+        while self._pending_items and (count is None or len(self._results) < count):
+            self._append((self._parse_item(self._pending_items.popleft()), ))
+
+        if not self._pending_items:
+            self._pending_items = None
+            self._reported_values = None
+
+    def _read_reported(self):
+        """
+        Read the reported fields of the container.
+        :return: dictionary of field var to the field type and data type of the field.
+        """
+        reported_values = dict()
+
+        for key, reported_item in self._container.get_reported().iteritems():
+            reported_values[key] = (reported_item['type'], reported_item['validate']['datatype'])
 
-        reported_values = self._container.get_reported()
+        return reported_values
 
-        for item in self._container.get_items():
-            logger.debug('item: %s' % item)
-            about = None
-            types = None
-            flags = dict()
-            columns = dict()
+    def _item_values(self, item_xml):
+        """
+        Read the values of the fields of an item.
+        :param item_xml: xml of the item.
+        :return: list of field var and value tuples.
+        """
+        values = []
+
+        for field_xml in item_xml.findall('{%s}field' % FormField.namespace):
+            field = FormField(xml=field_xml)
+            values.append((field['var'], field['value']))
+
+        return values
 
-            for key, value in item.iteritems():
-                if key == str(RDF.about):
-                    about = value
-                elif key == str(RDF.type):
-                    types = value
+    def _parse_item(self, item_xml):
+        """
+        Parse an item of the container.
+        :param item_xml: xml of the item.
+        :return: result payload.
+        """
+        reported_values = self._reported_values
+
+        about = None
+        types = None
+        flags = dict()
+        columns = dict()
+
+        for key, value in self._item_values(item_xml):
+            if key == str(RDF.about):
+                about = value
+            elif key == str(RDF.type):
+                types = value
+            else:
+                field_type, data_type = reported_values[key]
+                if data_type:
+                    columns[_ColumnKey(key, data_type)] = value
                 else:
-                    reported_item = reported_values[key]
-                    if reported_item['validate']['datatype']:
-                        columns[_ColumnKey(key, reported_item['validate']['datatype'])] = value
-                    else:
-                        flags[Flag(*(key, reported_item['type'], None))] = value
+                    flags[Flag(*(key, field_type, None))] = value
 
-            result_payload = ResultPayload(about=about, types=types)
-            for key, value in flags.iteritems():
-                result_payload.add_flag(key, value)
+        result_payload = ResultPayload(about=about, types=types)
+        for key, value in flags.iteritems():
+            result_payload.add_flag(key, value)
 
-            for key, value in columns.iteritems():
-                result_payload.add_column(key.key, value, key.data_type)
+        for key, value in columns.iteritems():
+            result_payload.add_column(key.key, value, key.data_type)
 
-            self.append(result_payload)
+        return result_payload
 
     def populate_payload(self):
         """
         Populate the data structures into the container for this object, and return it.
         :return: transmittable data structure.
         """
+        self._parse_items()
         self._container.clear()
 
         self._container.add_reported(var=str(RDF.about), ftype='list-multi')
@@ -239,7 +426,8 @@ class ResultCollectionPayload:
     @property
     def results(self):
         """
-        Retrieve the results.
+        Retrieve the results, parsing all of the items of the container.
         :return: list of result payloads
         """
+        self._parse_items()
         return self._results
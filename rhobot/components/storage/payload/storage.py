@@ -113,6 +113,42 @@ class StoragePayload:
 
         return container
 
+    def copy(self):
+        """
+        Create a copy of the payload, the values are not shared with the copy.
+        :return: storage payload.
+        """
+        payload = StoragePayload()
+        payload.about = self.about
+        payload.add_type(*self._types)
+
+        for key, value in self._properties.iteritems():
+            payload.add_property(key, list(value))
+
+        for key, value in self._references.iteritems():
+            payload.add_reference(key, list(value))
+
+        payload._flags = dict(self._flags)
+
+        return payload
+
+    def fingerprint(self):
+        """
+        Generate a canonical representation of the contents of the payload, payloads with the same contents will have
+        equal fingerprints regardless of the order that the contents were added in.
+        :return: hashable fingerprint.
+        """
+        def canonical(values):
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            return tuple(sorted(str(value) for value in values))
+
+        return (str(self.about) if self.about else None,
+                canonical(self._types),
+                tuple(sorted((str(key), canonical(value)) for key, value in self._properties.iteritems())),
+                tuple(sorted((str(key), canonical(value)) for key, value in self._references.iteritems())),
+                tuple(sorted((key.var, canonical(value)) for key, value in self._flags.iteritems())))
+
     def _unpack_payload(self, container):
         """
         Unpack the current container to class variables.
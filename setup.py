@@ -20,6 +20,7 @@ setup(
         'sleekxmpp==1.4.0.dev0',
         'rdflib==4.2.0',
         'enum34==1.0.4',
+        'futures==3.0.5',
         'python-daemon==2.0.6'
     ],
     dependency_links=[
@@ -0,0 +1,217 @@
+"""
+Unit tests for the get or create component.
+"""
+import unittest
+
+import mock
+from rdflib.namespace import DCTERMS, FOAF
+from rhobot.components.get_or_create import rho_bot_get_or_create
+from rhobot.components.scheduler import Promise
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
+from rhobot.components.storage.enums import FindFlags, FindResults
+
+
+class GetOrCreateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = mock.MagicMock()
+        self.scheduler.queue_microtask.side_effect = lambda callback, *args: callback(*args)
+        self.scheduler.generate_promise_handler.side_effect = \
+            lambda method, *args: lambda result: method(result, *args)
+
+        self.storage_client = mock.MagicMock()
+        self.storage_client.get_node.side_effect = self._get_node
+        self.storage_client.get_nodes.side_effect = \
+            lambda payloads: self._resolved([self._get_node(payload)._value for payload in payloads])
+        self.rdf_publish = mock.MagicMock()
+        self.representation_manager = mock.MagicMock(representation_uri='urn:rho:instance:bot')
+
+        self.nodes = dict()
+        self.find_results = []
+
+        def find_nodes(payload):
+            results = ResultCollectionPayload()
+            results.append(*self.find_results)
+            return self._resolved(results)
+
+        self.storage_client.find_nodes.side_effect = find_nodes
+
+        plugins = {'rho_bot_scheduler': self.scheduler,
+                   'rho_bot_storage_client': self.storage_client,
+                   'rho_bot_rdf_publish': self.rdf_publish,
+                   'rho_bot_representation_manager': self.representation_manager}
+
+        self.xmpp = mock.MagicMock()
+        self.xmpp.__getitem__.side_effect = lambda name: plugins.get(name, False)
+
+    def _resolved(self, value):
+        promise = Promise(self.scheduler)
+        promise.resolved(value)
+        return promise
+
+    def _get_node(self, payload):
+        node = StoragePayload()
+        if payload.about in self.nodes:
+            node.about = payload.about
+            node.add_type(*self.nodes[payload.about])
+            node.add_property(FOAF.name, 'Robert')
+        return self._resolved(node)
+
+    def _get_or_create(self, config=None):
+        get_or_create = rho_bot_get_or_create(self.xmpp, config)
+        get_or_create.plugin_init()
+        get_or_create.post_init()
+        return get_or_create
+
+    @staticmethod
+    def _payload():
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person)
+        payload.add_property(FOAF.name, 'Robert')
+        return payload
+
+    def test_indexed(self):
+        get_or_create = self._get_or_create()
+
+        self.nodes['urn:rho:instance:owner'] = [FOAF.Person]
+        self.find_results.append(ResultPayload(about='urn:rho:instance:owner', types=[FOAF.Person]))
+
+        session = {}
+        get_or_create(self._payload()).then(lambda result: session.setdefault('first', result))
+        get_or_create(self._payload()).then(lambda result: session.setdefault('second', result))
+
+        self.assertEqual(1, self.storage_client.find_nodes.call_count)
+        self.assertEqual(2, self.storage_client.get_node.call_count)
+        self.assertEqual('urn:rho:instance:owner', session['first'].about)
+        self.assertEqual('urn:rho:instance:owner', session['second'].about)
+
+        # Updated nodes are removed from the index.
+        update = StoragePayload()
+        update.about = 'urn:rho:instance:owner'
+        get_or_create._node_updated({'form': update.populate_payload()})
+
+        get_or_create(self._payload())
+
+        self.assertEqual(2, self.storage_client.find_nodes.call_count)
+
+    def test_created_message(self):
+        get_or_create = self._get_or_create()
+
+        self.nodes['urn:rho:instance:owner'] = [FOAF.Person]
+
+        records = ResultCollectionPayload()
+        records.append(ResultPayload(about='urn:rho:instance:owner', types=[FOAF.Person]))
+        get_or_create._nodes_created(records)
+
+        # The announced nodes are retrieved in order to index them.
+        self.assertEqual(['urn:rho:instance:owner'],
+                         [payload.about for payload in self.storage_client.get_nodes.call_args[0][0]])
+
+        session = {}
+        get_or_create(self._payload()).then(lambda result: session.setdefault('result', result))
+
+        self.assertEqual(0, self.storage_client.find_nodes.call_count)
+        self.assertEqual('urn:rho:instance:owner', session['result'].about)
+
+        # Nodes that are already indexed are not retrieved again.
+        get_or_create._nodes_created(records)
+        self.assertEqual(1, self.storage_client.get_nodes.call_count)
+
+    def test_stale_index(self):
+        get_or_create = self._get_or_create()
+
+        get_or_create._index_node('urn:rho:instance:deleted', get_or_create._index.key(self._payload()))
+
+        self.nodes['urn:rho:instance:owner'] = [FOAF.Person]
+        self.find_results.append(ResultPayload(about='urn:rho:instance:owner', types=[FOAF.Person]))
+
+        session = {}
+        get_or_create(self._payload()).then(lambda result: session.setdefault('result', result))
+
+        self.assertEqual(1, self.storage_client.find_nodes.call_count)
+        self.assertEqual('urn:rho:instance:owner', session['result'].about)
+
+    def test_find_or_create(self):
+        get_or_create = self._get_or_create({'find_or_create': True})
+
+        self.storage_client.update_node.side_effect = lambda payload: self._resolved(ResultCollectionPayload())
+
+        self.nodes['urn:rho:instance:owner'] = [FOAF.Person]
+        self.find_results.append(ResultPayload(about='urn:rho:instance:owner', types=[FOAF.Person],
+                                               flags={FindResults.CREATED: True}))
+
+        session = {}
+        payload = self._payload()
+        get_or_create(payload).then(lambda result: session.setdefault('result', result))
+
+        find_payload = self.storage_client.find_nodes.call_args[0][0]
+        self.assertTrue(FindFlags.CREATE_IF_MISSING.fetch_from(find_payload.flags))
+        self.assertEqual({}, payload.flags)
+        self.assertNotIn(DCTERMS.creator, find_payload.references)
+
+        self.assertEqual(0, self.storage_client.create_node.call_count)
+        self.assertEqual(1, self.rdf_publish.publish_all_results.call_count)
+
+        creator_payload = self.storage_client.update_node.call_args[0][0]
+        self.assertEqual('urn:rho:instance:owner', creator_payload.about)
+        self.assertEqual(['urn:rho:instance:bot'], creator_payload.references[DCTERMS.creator])
+
+        self.assertEqual('urn:rho:instance:owner', session['result'].about)
+
+    def test_find_or_create_creator_failed(self):
+        get_or_create = self._get_or_create({'find_or_create': True})
+
+        self.nodes['urn:rho:instance:owner'] = [FOAF.Person]
+        self.find_results.append(ResultPayload(about='urn:rho:instance:owner', types=[FOAF.Person],
+                                               flags={FindResults.CREATED: True}))
+
+        update_promise = Promise(self.scheduler)
+        self.storage_client.update_node.return_value = update_promise
+
+        session = {}
+        get_or_create(self._payload()).then(lambda result: session.setdefault('result', result),
+                                            lambda error: session.setdefault('error', error))
+
+        # The node is not provided until the creator has been written.
+        self.assertEqual({}, session)
+        self.assertEqual(0, self.storage_client.get_node.call_count)
+
+        error = RuntimeError('Storage command update_node timed out')
+        update_promise.rejected(error)
+
+        self.assertIs(error, session['error'])
+
+    def test_find_or_create_unsupported(self):
+        get_or_create = self._get_or_create()
+
+        created = ResultCollectionPayload()
+        created.append(ResultPayload(about='urn:rho:instance:owner', types=[FOAF.Person]))
+        self.storage_client.create_node.side_effect = lambda payload: self._resolved(created)
+        self.nodes['urn:rho:instance:owner'] = [FOAF.Person]
+
+        session = {}
+        payload = self._payload()
+        get_or_create(payload).then(lambda result: session.setdefault('result', result))
+
+        # The storage bot ignored the flag, so the node is created by a separate command.
+        find_payload = self.storage_client.find_nodes.call_args[0][0]
+        self.assertTrue(FindFlags.CREATE_IF_MISSING.fetch_from(find_payload.flags))
+        self.assertEqual(1, self.storage_client.create_node.call_count)
+        self.assertEqual({}, self.storage_client.create_node.call_args[0][0].flags)
+        self.assertEqual('urn:rho:instance:owner', session['result'].about)
+
+        # The flag is not sent again to the same storage bot.
+        other_payload = StoragePayload()
+        other_payload.add_type(FOAF.Person)
+        get_or_create(other_payload)
+
+        find_payload = self.storage_client.find_nodes.call_args[0][0]
+        self.assertEqual({}, find_payload.flags)
+
+        # A new storage bot might support it.
+        get_or_create._store_found(None)
+        other_payload.add_property(FOAF.name, 'Robert Paulson')
+        get_or_create(other_payload)
+
+        find_payload = self.storage_client.find_nodes.call_args[0][0]
+        self.assertTrue(FindFlags.CREATE_IF_MISSING.fetch_from(find_payload.flags))
@@ -16,6 +16,7 @@ class MultipleRequestTestCase(unittest.TestCase):
 
     def setUp(self):
         self.scheduler_plugin = mock.MagicMock()
+        self.scheduler_plugin.queue_microtask.side_effect = lambda callback, *args: callback(*args)
         self.roster_plugin = mock.MagicMock(**{'get_jid.return_value': 'rhobot@conference.local/bot'})
 
         plugins = {'rho_bot_scheduler': self.scheduler_plugin,
@@ -65,14 +66,15 @@ class MultipleRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload, allow_multiple=True)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
-        args, kwargs = self.scheduler_plugin.schedule_task.call_args
+        args, kwargs = self.scheduler_plugin.schedule_timeout.call_args
         callback = kwargs['callback']
 
-        with mock.patch.object(target=promise, attribute='resolved') as mocked_method:
-            callback()
-            self.assertEqual(1, mocked_method.call_count)
-            self.assertEqual([], mocked_method.call_args[0][0].results)
+        callback()
+        self.assertEqual(1, resolved.call_count)
+        self.assertEqual([], resolved.call_args[0][0].results)
 
     def test_response_received(self):
 
@@ -82,12 +84,14 @@ class MultipleRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload, allow_multiple=True)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
         args, kwargs = self.roster_plugin.send_message.call_args
         payload = kwargs['payload']
         thread_id = kwargs['thread_id']
 
-        args, kwargs = self.scheduler_plugin.schedule_task.call_args
+        args, kwargs = self.scheduler_plugin.schedule_timeout.call_args
         callback = kwargs['callback']
 
         response_payload = ResultCollectionPayload()
@@ -101,19 +105,18 @@ class MultipleRequestTestCase(unittest.TestCase):
         response_message.append(payload)
         response_message['thread'] = response_kwargs['thread_id']
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            mock_promise_resolve.assert_not_called()
+        resolved.assert_not_called()
 
-            callback()
+        callback()
 
-            self.assertEqual(1, mock_promise_resolve.call_count)
-            args, kwargs = mock_promise_resolve.call_args
+        self.assertEqual(1, resolved.call_count)
+        args, kwargs = resolved.call_args
 
-            result = [rdf.about for rdf in args[0].results]
+        result = [rdf.about for rdf in args[0].results]
 
-            self.assertEqual(result, [publish_urn])
+        self.assertEqual(result, [publish_urn])
 
     def test_multiple_responses(self):
 
@@ -123,12 +126,14 @@ class MultipleRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload, allow_multiple=True)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
         args, kwargs = self.roster_plugin.send_message.call_args
         payload = kwargs['payload']
         thread_id = kwargs['thread_id']
 
-        args, kwargs = self.scheduler_plugin.schedule_task.call_args
+        args, kwargs = self.scheduler_plugin.schedule_timeout.call_args
         callback = kwargs['callback']
 
         response_payload = ResultCollectionPayload()
@@ -142,23 +147,20 @@ class MultipleRequestTestCase(unittest.TestCase):
         response_message.append(payload)
         response_message['thread'] = response_kwargs['thread_id']
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            mock_promise_resolve.assert_not_called()
+        resolved.assert_not_called()
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            mock_promise_resolve.assert_not_called()
+        resolved.assert_not_called()
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
+        callback()
 
-            callback()
+        self.assertEqual(1, resolved.call_count)
+        args, kwargs = resolved.call_args
 
-            self.assertEqual(1, mock_promise_resolve.call_count)
-            args, kwargs = mock_promise_resolve.call_args
+        result = [rdf.about for rdf in args[0].results]
 
-            result = [rdf.about for rdf in args[0].results]
-
-            self.assertEqual(result, [publish_urn, publish_urn])
+        # Responses about the same node are merged.
+        self.assertEqual(result, [publish_urn])
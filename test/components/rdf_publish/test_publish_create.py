@@ -7,7 +7,7 @@ from sleekxmpp.xmlstream import register_stanza_plugin
 from sleekxmpp.plugins.xep_0004 import Form, FormField, FieldOption
 from sleekxmpp import Message
 from rhobot.components.rdf_publish import rho_bot_rdf_publish, RDFStanzaType
-from rhobot.components.storage import StoragePayload
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
 from rdflib.namespace import FOAF, RDF, RDFS
 from rhobot.namespace import RHO
 import time
@@ -95,3 +95,102 @@ class PublishCreateTestCase(unittest.TestCase):
         self.rdf_publisher._receive_message(message)
         self.assertEqual(self.scheduler_plugin.defer.call_args[0][0], create_handler)
         self.assertEqual(str(self.scheduler_plugin.defer.call_args[0][1]), str(message['rdf']))
+
+    def test_publish_all_results(self):
+
+        self.rdf_publisher.config['publish_batch_size'] = 2
+
+        results = ResultCollectionPayload()
+        for index in range(3):
+            results.append(ResultPayload(about='rho:instances.owner%02d' % index, types=[FOAF.Person, RHO.Owner]))
+
+        self.rdf_publisher.publish_all_results(results, created=True)
+
+        self.assertEqual(2, self.roster_plugin.send_message.call_count)
+
+        create_handler = mock.MagicMock()
+        batch_create_handler = mock.MagicMock()
+        self.rdf_publisher.add_create_handler(create_handler)
+        self.rdf_publisher.add_create_handler(batch_create_handler, batched=True)
+
+        message = Message()
+        message.append(self.roster_plugin.send_message.call_args_list[0][1]['payload'])
+
+        # Detecting a batch does not parse all of its items.
+        with mock.patch.object(Form, 'get_items', side_effect=AssertionError):
+            self.rdf_publisher._receive_message(message)
+
+        handler_calls = [args for args, kwargs in self.scheduler_plugin.defer.call_args_list]
+        self.assertEqual(3, len(handler_calls))
+
+        # Record handlers are notified of each record.
+        self.assertEqual(handler_calls[0][0], create_handler)
+        self.assertEqual(handler_calls[1][0], create_handler)
+
+        record_payload = StoragePayload(handler_calls[0][1]['form'])
+        self.assertEqual(record_payload.about, 'rho:instances.owner00')
+        self.assertEqual(record_payload.types, [str(FOAF.Person), str(RHO.Owner)])
+        self.assertEqual(StoragePayload(handler_calls[1][1]['form']).about, 'rho:instances.owner01')
+
+        # Batch handlers are notified of all of the records at once.
+        self.assertEqual(handler_calls[2][0], batch_create_handler)
+        self.assertEqual([result.about for result in handler_calls[2][1].results],
+                         ['rho:instances.owner00', 'rho:instances.owner01'])
+
+        # A batch of a single record is published in the form that is used by publish_create.
+        form = self.roster_plugin.send_message.call_args_list[1][1]['payload']['form']
+        self.assertEqual([], form.get_items())
+        record_payload = StoragePayload(form)
+        self.assertEqual(record_payload.about, 'rho:instances.owner02')
+        self.assertEqual(record_payload.types, [str(FOAF.Person), str(RHO.Owner)])
+
+    def test_publish_batch_window(self):
+
+        self.rdf_publisher.config['publish_batch_window'] = 1.0
+
+        results = ResultCollectionPayload()
+        results.append(ResultPayload(about='rho:instances.owner', types=[FOAF.Person, RHO.Owner]))
+
+        self.rdf_publisher.publish_all_results(results, created=True)
+        self.rdf_publisher.publish_all_results(results, created=True)
+
+        self.roster_plugin.send_message.assert_not_called()
+        self.assertEqual(1, self.scheduler_plugin.schedule_timeout.call_count)
+
+        self.scheduler_plugin.schedule_timeout.call_args[1]['callback']()
+
+        self.assertEqual(1, self.roster_plugin.send_message.call_count)
+
+        form = self.roster_plugin.send_message.call_args[1]['payload']['form']
+        self.assertEqual(len(ResultCollectionPayload(form).results), 2)
+
+    def test_type_filtered_handlers(self):
+
+        results = ResultCollectionPayload()
+        results.append(ResultPayload(about='rho:instances.person', types=[FOAF.Person]))
+        results.append(ResultPayload(about='rho:instances.agent', types=[FOAF.Agent]))
+
+        self.rdf_publisher.publish_all_results(results, created=True)
+
+        person_handler = mock.MagicMock()
+        agent_handler = mock.MagicMock()
+        batch_agent_handler = mock.MagicMock()
+        other_handler = mock.MagicMock()
+        self.rdf_publisher.add_create_handler(person_handler, types=[FOAF.Person])
+        self.rdf_publisher.add_create_handler(agent_handler, types=[FOAF.Agent, FOAF.Person])
+        self.rdf_publisher.add_create_handler(batch_agent_handler, batched=True, types=FOAF.Agent)
+        self.rdf_publisher.add_create_handler(other_handler, types=[RHO.Owner])
+
+        message = Message()
+        message.append(self.roster_plugin.send_message.call_args[1]['payload'])
+
+        self.rdf_publisher._receive_message(message)
+
+        handler_calls = [(args[0], args[1]) for args, kwargs in self.scheduler_plugin.defer.call_args_list]
+
+        self.assertEqual([handler for handler, _ in handler_calls],
+                         [person_handler, agent_handler, agent_handler, batch_agent_handler])
+
+        self.assertEqual(StoragePayload(handler_calls[0][1]['form']).about, 'rho:instances.person')
+        self.assertEqual(StoragePayload(handler_calls[2][1]['form']).about, 'rho:instances.agent')
+        self.assertEqual([result.about for result in handler_calls[3][1].results], ['rho:instances.agent'])
@@ -95,3 +95,23 @@ class PublishUpdateTestCase(unittest.TestCase):
         self.rdf_publisher._receive_message(message)
         self.assertEqual(self.scheduler_plugin.defer.call_args[0][0], create_handler)
         self.assertEqual(str(self.scheduler_plugin.defer.call_args[0][1]), str(message['rdf']))
+
+    def test_update_node_modified(self):
+        from rhobot.components.storage.events import NODE_MODIFIED
+
+        publish_urn = 'rho:instances.owner'
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+        payload.about = publish_urn
+
+        self.rdf_publisher.publish_update(payload)
+        args, kwargs = self.roster_plugin.send_message.call_args
+
+        message = Message()
+        message.append(kwargs['payload'])
+
+        self.rdf_publisher.xmpp.event.reset_mock()
+        self.rdf_publisher._receive_message(message)
+
+        self.rdf_publisher.xmpp.event.assert_called_once_with(NODE_MODIFIED, publish_urn, direct=True)
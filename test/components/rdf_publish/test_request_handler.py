@@ -75,3 +75,26 @@ class ResponseTestCase(unittest.TestCase):
         self.rdf_publisher.add_request_handler(handler_mock)
 
         self.rdf_publisher._receive_message(message)
+
+    def test_type_filtered_request_handler(self):
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        self.rdf_publisher.send_out_request(payload)
+
+        args, kwargs = self.roster_plugin.send_message.call_args
+
+        message = Message()
+        message.append(kwargs['payload'])
+        message['thread'] = kwargs['thread_id']
+
+        owner_handler = mock.Mock(return_value=None)
+        agent_handler = mock.Mock(return_value=None)
+        self.rdf_publisher.add_request_handler(owner_handler, types=[RHO.Owner])
+        self.rdf_publisher.add_request_handler(agent_handler, types=[FOAF.Agent])
+
+        self.rdf_publisher._receive_message(message)
+
+        self.assertEqual(1, self.scheduler_plugin.defer.call_count)
+        self.assertEqual(self.scheduler_plugin.defer.call_args[0][0], owner_handler)
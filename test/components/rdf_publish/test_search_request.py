@@ -7,6 +7,7 @@ from sleekxmpp.xmlstream import register_stanza_plugin
 from sleekxmpp.plugins.xep_0004 import Form, FormField, FieldOption
 from sleekxmpp import Message
 from rhobot.components.rdf_publish import rho_bot_rdf_publish, RDFStanzaType
+from rhobot.components.scheduler import Promise
 from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
 from rdflib.namespace import FOAF, RDF, RDFS
 from rhobot.namespace import RHO
@@ -16,6 +17,7 @@ class SearchRequestTestCase(unittest.TestCase):
 
     def setUp(self):
         self.scheduler_plugin = mock.MagicMock()
+        self.scheduler_plugin.queue_microtask.side_effect = lambda callback, *args: callback(*args)
         self.roster_plugin = mock.MagicMock(**{'get_jid.return_value': 'rhobot@conference.local/bot'})
 
         plugins = {'rho_bot_scheduler': self.scheduler_plugin,
@@ -66,14 +68,15 @@ class SearchRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_search(payload)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
-        args, kwargs = self.scheduler_plugin.schedule_task.call_args
+        args, kwargs = self.scheduler_plugin.schedule_timeout.call_args
         callback = kwargs['callback']
 
-        with mock.patch.object(target=promise, attribute='resolved') as mocked_method:
-            callback()
-            self.assertEqual(1, mocked_method.call_count)
-            self.assertEqual([], mocked_method.call_args[0][0].results)
+        callback()
+        self.assertEqual(1, resolved.call_count)
+        self.assertEqual([], resolved.call_args[0][0].results)
 
     def test_response_received(self):
 
@@ -83,12 +86,14 @@ class SearchRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload, allow_multiple=True)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
         args, kwargs = self.roster_plugin.send_message.call_args
         payload = kwargs['payload']
         thread_id = kwargs['thread_id']
 
-        args, kwargs = self.scheduler_plugin.schedule_task.call_args
+        args, kwargs = self.scheduler_plugin.schedule_timeout.call_args
         callback = kwargs['callback']
 
         response_payload = ResultCollectionPayload()
@@ -102,24 +107,23 @@ class SearchRequestTestCase(unittest.TestCase):
         response_message.append(payload)
         response_message['thread'] = response_kwargs['thread_id']
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            mock_promise_resolve.assert_not_called()
+        resolved.assert_not_called()
 
-            callback()
+        callback()
 
-            self.assertEqual(1, mock_promise_resolve.call_count)
-            args, kwargs = mock_promise_resolve.call_args
+        self.assertEqual(1, resolved.call_count)
+        args, kwargs = resolved.call_args
 
-            result = [rdf.about for rdf in args[0].results]
+        result = [rdf.about for rdf in args[0].results]
 
-            self.assertEqual(result, [publish_urn])
+        self.assertEqual(result, [publish_urn])
 
-            # Should not have any sources defined.
-            callback_results = args[0]
+        # Should not have any sources defined.
+        callback_results = args[0]
 
-            self.assertFalse(hasattr(callback_results, 'sources'))
+        self.assertFalse(hasattr(callback_results, 'sources'))
 
     def test_retrieve_all(self):
 
@@ -129,12 +133,14 @@ class SearchRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload, allow_multiple=True)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
         args, kwargs = self.roster_plugin.send_message.call_args
         payload = kwargs['payload']
         thread_id = kwargs['thread_id']
 
-        args, kwargs = self.scheduler_plugin.schedule_task.call_args
+        args, kwargs = self.scheduler_plugin.schedule_timeout.call_args
         callback = kwargs['callback']
 
         response_payload = ResultCollectionPayload()
@@ -148,31 +154,28 @@ class SearchRequestTestCase(unittest.TestCase):
         response_message.append(payload)
         response_message['thread'] = response_kwargs['thread_id']
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            mock_promise_resolve.assert_not_called()
+        resolved.assert_not_called()
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            mock_promise_resolve.assert_not_called()
+        resolved.assert_not_called()
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
+        callback()
 
-            callback()
+        self.assertEqual(1, resolved.call_count)
+        args, kwargs = resolved.call_args
 
-            self.assertEqual(1, mock_promise_resolve.call_count)
-            args, kwargs = mock_promise_resolve.call_args
+        result = [rdf.about for rdf in args[0].results]
 
-            result = [rdf.about for rdf in args[0].results]
+        # Responses about the same node are merged.
+        self.assertEqual(result, [publish_urn])
 
-            self.assertEqual(result, [publish_urn, publish_urn])
+        # Should not have any sources defined.
+        callback_results = args[0]
 
-            # Should not have any sources defined.
-            callback_results = args[0]
-
-            self.assertFalse(hasattr(callback_results, 'sources'))
+        self.assertFalse(hasattr(callback_results, 'sources'))
 
     def test_sources_retrieved(self):
 
@@ -182,12 +185,14 @@ class SearchRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload, allow_multiple=True)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
         args, kwargs = self.roster_plugin.send_message.call_args
         payload = kwargs['payload']
         thread_id = kwargs['thread_id']
 
-        args, kwargs = self.scheduler_plugin.schedule_task.call_args
+        args, kwargs = self.scheduler_plugin.schedule_timeout.call_args
         callback = kwargs['callback']
 
         response_payload = ResultCollectionPayload()
@@ -203,30 +208,208 @@ class SearchRequestTestCase(unittest.TestCase):
         response_message.append(rdf_payload)
         response_message['thread'] = thread_id
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
+
+        resolved.assert_not_called()
+
+        callback()
+
+        self.assertEqual(1, resolved.call_count)
+        args, kwargs = resolved.call_args
+
+        result_payload = args[0]
+
+        result = [rdf.about for rdf in result_payload.results]
+
+        self.assertEqual(result, [publish_urn, ])
+
+        self.assertTrue(hasattr(result_payload, 'sources'))
+
+        sources = list(result_payload.sources)
+
+        self.assertEqual(1, len(sources))
+
+        self.assertEqual('Search Command', sources[0][0])
+        self.assertEqual('xmpp:rhobot@conference.local/bot?command;node=search_command', sources[0][1])
+
+    def _search_response(self, thread_id, sender, *abouts):
+        response_payload = ResultCollectionPayload()
+        for about in abouts:
+            response_payload.append(ResultPayload(about=about, types=[FOAF.Person, RHO.Owner]))
+
+        response_message = Message()
+        response_message.append(self.rdf_publisher.create_rdf(mtype=RDFStanzaType.SEARCH_RESPONSE,
+                                                              payload=response_payload))
+        response_message['thread'] = thread_id
+        response_message['from'] = sender
+
+        return response_message
+
+    def test_max_responses(self):
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        promise = self.rdf_publisher.send_out_search(payload, max_responses=2)
+        resolved = mock.Mock()
+        promise.then(resolved)
+
+        cancel_timeout = self.scheduler_plugin.schedule_timeout.return_value
+        thread_id = self.roster_plugin.send_message.call_args[1]['thread_id']
+
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store01',
+                                                                  'rho:instances.owner01'))
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store01',
+                                                                  'rho:instances.owner02'))
+
+        resolved.assert_not_called()
+
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store02',
+                                                                  'rho:instances.owner03'))
+
+        self.assertEqual(1, resolved.call_count)
+        result = [rdf.about for rdf in resolved.call_args[0][0].results]
+        self.assertEqual(result, ['rho:instances.owner01', 'rho:instances.owner02', 'rho:instances.owner03'])
+
+        cancel_timeout.assert_called_once_with()
+        self.assertEqual(self.rdf_publisher._pending_requests, dict())
+
+    def test_max_results(self):
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        promise = self.rdf_publisher.send_out_search(payload, max_results=2)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
-            mock_promise_resolve.assert_not_called()
+        thread_id = self.roster_plugin.send_message.call_args[1]['thread_id']
+
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store01',
+                                                                  'rho:instances.owner01'))
+
+        resolved.assert_not_called()
+
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store01',
+                                                                  'rho:instances.owner02',
+                                                                  'rho:instances.owner03'))
+
+        self.assertEqual(1, resolved.call_count)
+
+    def test_wait_for_all(self):
+
+        self.roster_plugin.get_connections.return_value = {'rhobot@conference.local/store01',
+                                                           'rhobot@conference.local/store02'}
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        promise = self.rdf_publisher.send_out_search(payload, wait_for_all=True)
+        resolved = mock.Mock()
+        promise.then(resolved)
+
+        self.roster_plugin.get_connections.assert_called_once_with('search')
+        thread_id = self.roster_plugin.send_message.call_args[1]['thread_id']
+
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store01',
+                                                                  'rho:instances.owner01'))
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/web01'))
+
+        resolved.assert_not_called()
+
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store02'))
+
+        self.assertEqual(1, resolved.call_count)
+        result = [rdf.about for rdf in resolved.call_args[0][0].results]
+        self.assertEqual(result, ['rho:instances.owner01'])
+
+    def test_progress(self):
+
+        progress = mock.MagicMock()
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        promise = self.rdf_publisher.send_out_search(payload, progress=progress)
+        resolved = mock.Mock()
+        promise.then(resolved)
+
+        thread_id = self.roster_plugin.send_message.call_args[1]['thread_id']
+
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store01',
+                                                                  'rho:instances.owner01'))
+        self.rdf_publisher._receive_message(self._search_response(thread_id, 'rhobot@conference.local/store02',
+                                                                  'rho:instances.owner02'))
+
+        resolved.assert_not_called()
+
+        self.assertEqual(2, self.scheduler_plugin.defer.call_count)
+
+        partial_results = []
+        for args, kwargs in self.scheduler_plugin.defer.call_args_list:
+            self.assertEqual(args[0], progress)
+            partial_results.append([rdf.about for rdf in args[1].results])
+
+        self.assertEqual(partial_results, [['rho:instances.owner01'], ['rho:instances.owner02']])
+
+    def _search_responses(self):
+        """
+        Receive a search request, and collect the messages that were sent in response to it.
+        """
+        from rhobot.components.scheduler import _PromiseList
+
+        def defer(method, *args):
+            promise = Promise(self.scheduler_plugin)
+            promise.resolved(method(*args))
+            return promise
+
+        self.scheduler_plugin.promise.side_effect = lambda: Promise(self.scheduler_plugin)
+        self.scheduler_plugin.queue_microtask.side_effect = lambda callback, *args: callback(*args)
+        self.scheduler_plugin.defer.side_effect = defer
+        self.scheduler_plugin.all_settled.side_effect = \
+            lambda *promises: _PromiseList(promises, self.scheduler_plugin, settled=True).promise
+        self.rdf_publisher.post_init()
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
+        search_message = Message()
+        search_message.append(self.rdf_publisher.create_rdf(mtype=RDFStanzaType.SEARCH_REQUEST, payload=payload))
+        search_message['thread'] = 'search_thread'
 
-            callback()
+        self.roster_plugin.send_message.reset_mock()
+        self.rdf_publisher._receive_message(search_message)
 
-            self.assertEqual(1, mock_promise_resolve.call_count)
-            args, kwargs = mock_promise_resolve.call_args
+        return [kwargs for args, kwargs in self.roster_plugin.send_message.call_args_list]
 
-            result_payload = args[0]
+    def test_search_without_handlers(self):
 
-            result = [rdf.about for rdf in result_payload.results]
+        # Bots that did not register search handlers do not respond to searches.
+        self.assertEqual([], self._search_responses())
 
-            self.assertEqual(result, [publish_urn, ])
+    def test_empty_search_response(self):
+        self.rdf_publisher._search_identity_added = True
+        responses = self._search_responses
 
-            self.assertTrue(hasattr(result_payload, 'sources'))
+        def assert_empty_response(sent):
+            self.assertEqual(1, len(sent))
+            self.assertEqual('search_thread', sent[0]['thread_id'])
+            self.assertEqual(RDFStanzaType.SEARCH_RESPONSE.value, sent[0]['payload']['type'])
+            self.assertEqual(0, len(ResultCollectionPayload(sent[0]['payload']['form'])))
 
-            sources = list(result_payload.sources)
+        # Bots without a handler for the types respond with an empty result, so that wait_for_all is not held up.
+        self.rdf_publisher.add_search_handler(mock.Mock(return_value=None), types=[FOAF.Agent])
+        assert_empty_response(responses())
 
-            self.assertEqual(1, len(sources))
+        # The same goes for handlers that found nothing.
+        self.rdf_publisher.add_search_handler(mock.Mock(return_value=None), types=[RHO.Owner])
+        assert_empty_response(responses())
 
-            self.assertEqual('Search Command', sources[0][0])
-            self.assertEqual('xmpp:rhobot@conference.local/bot?command;node=search_command', sources[0][1])
+        results = ResultCollectionPayload()
+        results.append(ResultPayload(about='rho:instances.owner', types=[RHO.Owner]))
+        response = self.rdf_publisher.create_rdf(mtype=RDFStanzaType.SEARCH_RESPONSE, payload=results)
+        self.rdf_publisher.add_search_handler(mock.Mock(return_value=response), types=[RHO.Owner])
 
+        sent = responses()
+        self.assertEqual(1, len(sent))
+        self.assertIs(response, sent[0]['payload'])
@@ -16,6 +16,7 @@ class SingleRequestTestCase(unittest.TestCase):
 
     def setUp(self):
         self.scheduler_plugin = mock.MagicMock()
+        self.scheduler_plugin.queue_microtask.side_effect = lambda callback, *args: callback(*args)
         self.roster_plugin = mock.MagicMock(**{'get_jid.return_value': 'rhobot@conference.local/bot'})
 
         plugins = {'rho_bot_scheduler': self.scheduler_plugin,
@@ -65,14 +66,15 @@ class SingleRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
-        args, kwargs = self.scheduler_plugin.schedule_task.call_args
+        args, kwargs = self.scheduler_plugin.schedule_timeout.call_args
         callback = kwargs['callback']
 
-        with mock.patch.object(target=promise, attribute='resolved') as mocked_method:
-            callback()
-            self.assertEqual(1, mocked_method.call_count)
-            self.assertEqual([], mocked_method.call_args[0][0].results)
+        callback()
+        self.assertEqual(1, resolved.call_count)
+        self.assertEqual([], resolved.call_args[0][0].results)
 
     def test_response_received(self):
 
@@ -82,6 +84,8 @@ class SingleRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
         args, kwargs = self.roster_plugin.send_message.call_args
         payload = kwargs['payload']
@@ -98,15 +102,14 @@ class SingleRequestTestCase(unittest.TestCase):
         response_message.append(payload)
         response_message['thread'] = response_kwargs['thread_id']
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            self.assertEqual(1, mock_promise_resolve.call_count)
-            args, kwargs = mock_promise_resolve.call_args
+        self.assertEqual(1, resolved.call_count)
+        args, kwargs = resolved.call_args
 
-            result = [rdf.about for rdf in args[0].results]
+        result = [rdf.about for rdf in args[0].results]
 
-            self.assertEqual(result, [publish_urn])
+        self.assertEqual(result, [publish_urn])
 
     def test_responed_only_once(self):
 
@@ -116,6 +119,8 @@ class SingleRequestTestCase(unittest.TestCase):
         payload.add_type(FOAF.Person, RHO.Owner)
 
         promise = self.rdf_publisher.send_out_request(payload)
+        resolved = mock.Mock()
+        promise.then(resolved)
 
         args, kwargs = self.roster_plugin.send_message.call_args
         payload = kwargs['payload']
@@ -132,17 +137,208 @@ class SingleRequestTestCase(unittest.TestCase):
         response_message.append(payload)
         response_message['thread'] = response_kwargs['thread_id']
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            self.assertEqual(1, mock_promise_resolve.call_count)
-            args, kwargs = mock_promise_resolve.call_args
+        self.assertEqual(1, resolved.call_count)
+        args, kwargs = resolved.call_args
 
-            result = [rdf.about for rdf in args[0].results]
+        result = [rdf.about for rdf in args[0].results]
 
-            self.assertEqual(result, [publish_urn])
+        self.assertEqual(result, [publish_urn])
 
-        with mock.patch.object(promise, attribute='resolved') as mock_promise_resolve:
-            self.rdf_publisher._receive_message(response_message)
+        self.rdf_publisher._receive_message(response_message)
 
-            mock_promise_resolve.assert_not_called()
+        self.assertEqual(1, resolved.call_count)
+
+    def test_response_cancels_timeout(self):
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        promise = self.rdf_publisher.send_out_request(payload)
+
+        cancel_timeout = self.scheduler_plugin.schedule_timeout.return_value
+
+        args, kwargs = self.roster_plugin.send_message.call_args
+        thread_id = kwargs['thread_id']
+
+        response_payload = ResultCollectionPayload()
+        response_payload.append(ResultPayload(about='rho:instances.owner', types=[FOAF.Person, RHO.Owner]))
+
+        self.rdf_publisher._send_message(RDFStanzaType.RESPONSE, response_payload, thread_id)
+        response_args, response_kwargs = self.roster_plugin.send_message.call_args
+
+        response_message = Message()
+        response_message.append(response_kwargs['payload'])
+        response_message['thread'] = response_kwargs['thread_id']
+
+        cancel_timeout.assert_not_called()
+
+        self.rdf_publisher._receive_message(response_message)
+
+        cancel_timeout.assert_called_once_with()
+        self.assertEqual(self.rdf_publisher._pending_requests, dict())
+
+    def _response_message(self, *abouts):
+        args, kwargs = self.roster_plugin.send_message.call_args
+        thread_id = kwargs['thread_id']
+
+        response_payload = ResultCollectionPayload()
+        for about in abouts:
+            response_payload.append(ResultPayload(about=about, types=[FOAF.Person, RHO.Owner]))
+
+        response_message = Message()
+        response_message.append(self.rdf_publisher.create_rdf(mtype=RDFStanzaType.RESPONSE, payload=response_payload))
+        response_message['thread'] = thread_id
+
+        return response_message
+
+    def _respond(self, *abouts):
+        self.rdf_publisher._receive_message(self._response_message(*abouts))
+
+    def _enable_cache(self):
+        self.rdf_publisher = rho_bot_rdf_publish(self.rdf_publisher.xmpp, {'cache_ttl': 30.0})
+        self.rdf_publisher.plugin_init()
+
+    def test_not_cached_by_default(self):
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        self.rdf_publisher.send_out_request(payload)
+        self._respond('rho:instances.owner')
+
+        self.rdf_publisher.send_out_request(payload)
+
+        self.assertEqual(2, self.roster_plugin.send_message.call_count)
+
+    def test_cached_response(self):
+        self._enable_cache()
+
+        publish_urn = 'rho:instances.owner'
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        self.rdf_publisher.send_out_request(payload)
+        self._respond(publish_urn)
+
+        self.assertEqual(1, self.roster_plugin.send_message.call_count)
+
+        resolved = mock.Mock()
+        self.rdf_publisher.send_out_request(payload).then(resolved)
+
+        self.assertEqual(1, resolved.call_count)
+        self.assertEqual([rdf.about for rdf in resolved.call_args[0][0].results], [publish_urn])
+
+        # The request was not sent out again.
+        self.assertEqual(1, self.roster_plugin.send_message.call_count)
+
+    def test_cached_response_copied(self):
+        self._enable_cache()
+
+        publish_urn = 'rho:instances.owner'
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        self.rdf_publisher.send_out_request(payload)
+        self._respond(publish_urn)
+
+        def cached_results():
+            resolved = mock.Mock()
+            self.rdf_publisher.send_out_request(payload).then(resolved)
+            return resolved.call_args[0][0]
+
+        # Modifying the results of one request does not modify the results of the following requests.
+        results = cached_results()
+        results.first().add_type(FOAF.Agent)
+        results.first().add_flag('modified', True)
+        results.append(ResultPayload(about='rho:instances.other_owner'))
+
+        results = cached_results()
+        self.assertEqual([rdf.about for rdf in results.results], [publish_urn])
+        self.assertEqual(results.first().types, [str(FOAF.Person), str(RHO.Owner)])
+        self.assertEqual(results.first().flags, {})
+
+    def test_cache_invalidated(self):
+        self._enable_cache()
+
+        publish_urn = 'rho:instances.owner'
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        self.rdf_publisher.send_out_request(payload)
+        self._respond(publish_urn)
+
+        created_payload = StoragePayload()
+        created_payload.about = 'rho:instances.other_owner'
+        created_payload.add_type(RHO.Owner)
+
+        create_message = Message()
+        create_message.append(self.rdf_publisher.create_rdf(mtype=RDFStanzaType.CREATE, payload=created_payload))
+        self.rdf_publisher._scheduler = self.scheduler_plugin
+        self.rdf_publisher._receive_message(create_message)
+
+        self.rdf_publisher.send_out_request(payload)
+
+        self.assertEqual(2, self.roster_plugin.send_message.call_count)
+
+    def test_empty_response_not_cached(self):
+        self._enable_cache()
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        self.rdf_publisher.send_out_request(payload)
+        self._respond()
+
+        self.rdf_publisher.send_out_request(payload)
+
+        self.assertEqual(2, self.roster_plugin.send_message.call_count)
+
+    def test_in_flight_shared(self):
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        first_promise = self.rdf_publisher.send_out_request(payload)
+        second_promise = self.rdf_publisher.send_out_request(payload)
+
+        self.assertEqual(1, self.roster_plugin.send_message.call_count)
+
+        # Each of the callers receives its own copy of the results.
+        first_callback = mock.MagicMock()
+        second_callback = mock.MagicMock()
+        first_promise.then(first_callback)
+        second_promise.then(second_callback)
+
+        self.rdf_publisher._scheduler = self.scheduler_plugin
+        self.rdf_publisher._receive_message(self._response_message('rho:instances.owner'))
+
+        first_results = first_callback.call_args[0][0]
+        second_results = second_callback.call_args[0][0]
+        self.assertIsNot(first_results, second_results)
+        self.assertIsNot(first_results.first(), second_results.first())
+        self.assertEqual([rdf.about for rdf in first_results.results], ['rho:instances.owner'])
+        self.assertEqual([rdf.about for rdf in second_results.results], ['rho:instances.owner'])
+
+        # Requests with a progress callback are not shared.
+        self.rdf_publisher.clear_cache()
+        self.rdf_publisher.send_out_request(payload, progress=mock.MagicMock())
+        self.assertEqual(2, self.roster_plugin.send_message.call_count)
+
+    def test_in_flight_timeout(self):
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, RHO.Owner)
+
+        self.rdf_publisher.send_out_request(payload, timeout=30.0)
+        self.rdf_publisher.send_out_request(payload, timeout=1.0)
+
+        # Requests with a shorter timeout are not attached to the longer running request.
+        self.assertEqual(2, self.roster_plugin.send_message.call_count)
+
+        self.rdf_publisher.send_out_request(payload, timeout=1.0)
+        self.assertEqual(2, self.roster_plugin.send_message.call_count)
@@ -0,0 +1,150 @@
+"""
+Benchmarks for the scheduler plugin.  These are not executed as part of the unit tests, run them with:
+
+    python -m test.components.scheduler.benchmark_scheduler
+"""
+from sleekxmpp.test import SleekTest
+import threading
+import unittest
+import uuid
+import time
+import sys
+import mock
+
+CHAIN_LENGTH = 100000
+JOIN_SIZES = (10000, 100000)
+PENDING_PROMISES = 100000
+
+
+class _DictPromise(object):
+    """
+    Attribute layout of the promises before they were converted to __slots__, used to compare the memory usage.
+    """
+
+    def __init__(self, scheduler):
+        self._queue = []
+        self._resolved = False
+        self._rejected = False
+        self._result = None
+        self._error = None
+        self._scheduler = scheduler
+        self._child_promise = None
+
+    def then(self, fulfilled=None, rejected=None):
+        new_promise = _DictPromise(self._scheduler)
+        self._queue.append((fulfilled, rejected, new_promise))
+        return new_promise
+
+
+def _size_of(promise):
+    """
+    Retrieve the size of the promise, including its attribute dictionary, and callback queue.
+    """
+    size = sys.getsizeof(promise)
+
+    if hasattr(promise, '__dict__'):
+        size += sys.getsizeof(promise.__dict__)
+
+    if promise._queue is not None:
+        size += sys.getsizeof(promise._queue)
+        size += sum(sys.getsizeof(entry) for entry in promise._queue)
+
+    return size
+
+
+class SchedulerBenchmark(SleekTest):
+
+    def setUp(self):
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components')
+        self.scheduler = self.xmpp['rho_bot_scheduler']
+
+    def tearDown(self):
+        self.stream_close()
+
+    def _legacy_queue_microtask(self, callback, *args):
+        """
+        Schedule the callback the way the scheduler did before the run queue was introduced, one uuid named sleekxmpp
+        task per callback.
+        """
+        self.xmpp.schedule(str(uuid.uuid4()), 0.0, callback, args=args)
+
+    def _run_chain(self, length):
+        """
+        Resolve a chain of promises of the provided length and return the number of tasks executed per second.
+        """
+        finished = threading.Event()
+
+        promise = self.scheduler.promise()
+        chain = promise
+        for _ in range(length):
+            chain = chain.then(lambda value: value + 1)
+        chain.then(lambda value: finished.set())
+
+        start = time.time()
+        promise.resolved(0)
+        self.assertTrue(finished.wait(600.0))
+        elapsed = time.time() - start
+
+        return length / elapsed
+
+    def test_chained_promises(self):
+
+        with mock.patch.object(self.scheduler, 'queue_microtask', self._legacy_queue_microtask):
+            before = self._run_chain(CHAIN_LENGTH)
+
+        after = self._run_chain(CHAIN_LENGTH)
+
+        print('\n%d chained promises' % CHAIN_LENGTH)
+        print('  per task scheduling: %10.0f tasks/sec' % before)
+        print('  run queue:           %10.0f tasks/sec' % after)
+
+    def _run_join(self, size):
+        """
+        Join the provided number of promises, resolve all of them and return the time taken until the joined promise
+        is resolved.
+        """
+        finished = threading.Event()
+
+        promises = [self.scheduler.promise() for _ in range(size)]
+        self.scheduler.create_promise_list(*promises).then(lambda value: finished.set())
+
+        start = time.time()
+        for index, promise in enumerate(promises):
+            promise.resolved(index)
+        self.assertTrue(finished.wait(600.0))
+
+        return time.time() - start
+
+    def test_promise_list(self):
+
+        print('\njoined promises')
+        for size in JOIN_SIZES:
+            elapsed = self._run_join(size)
+            print('  %6d promises: %8.3f sec %10.0f promises/sec' % (size, elapsed, size / elapsed))
+
+    def _measure_pending(self, factory):
+        """
+        Create pending promises, each with a single callback waiting on it, and return the number of bytes used per
+        promise and the callback promise.
+        """
+        promises = [factory(self.scheduler) for _ in range(PENDING_PROMISES)]
+        children = [promise.then(len) for promise in promises]
+
+        size = sum(_size_of(promise) for promise in promises) + sum(_size_of(child) for child in children)
+
+        return float(size) / PENDING_PROMISES
+
+    def test_pending_memory(self):
+        from rhobot.components.scheduler import Promise
+
+        before = self._measure_pending(_DictPromise)
+        after = self._measure_pending(Promise)
+
+        print('\n%d pending promises with a callback' % PENDING_PROMISES)
+        print('  attribute dictionary: %6.0f bytes/promise' % before)
+        print('  slots:                %6.0f bytes/promise' % after)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+from sleekxmpp.test import SleekTest
+import unittest
+import threading
+import mock
+
+
+class CombinatorTester(SleekTest):
+
+    def setUp(self):
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components')
+        self.scheduler = self.xmpp['rho_bot_scheduler']
+
+    def tearDown(self):
+        self.stream_close()
+
+    def _eventually(self, value, delay, resolve=True):
+        promise = self.scheduler.promise()
+
+        if resolve:
+            self.scheduler.schedule_task(lambda: promise.resolved(value), delay=delay)
+        else:
+            self.scheduler.schedule_task(lambda: promise.rejected(value), delay=delay)
+
+        return promise
+
+    def _wait(self, promise):
+        event = threading.Event()
+        session = {}
+
+        def fulfilled(result):
+            session['result'] = result
+            event.set()
+
+        def rejected(error):
+            session['error'] = error
+            event.set()
+
+        promise.then(fulfilled, rejected)
+
+        self.assertTrue(event.wait(5.0))
+
+        return session
+
+    def test_promise_list_empty(self):
+        session = self._wait(self.scheduler.create_promise_list())
+
+        self.assertEqual(session['result'], [])
+
+    def test_all_settled(self):
+        session = self._wait(self.scheduler.all_settled(self._eventually('error', 0.05, resolve=False),
+                                                        self._eventually('value', 0.1)))
+
+        self.assertEqual(session['result'], [(False, 'error'), (True, 'value')])
+
+    def test_race(self):
+        session = self._wait(self.scheduler.race(self._eventually('slow', 0.3),
+                                                 self._eventually('fast', 0.05)))
+
+        self.assertEqual(session['result'], 'fast')
+
+    def test_race_rejected(self):
+        session = self._wait(self.scheduler.race(self._eventually('slow', 0.3),
+                                                 self._eventually('error', 0.05, resolve=False)))
+
+        self.assertEqual(session['error'], 'error')
+
+    def test_any(self):
+        session = self._wait(self.scheduler.any(self._eventually('error', 0.05, resolve=False),
+                                                self._eventually('value', 0.1)))
+
+        self.assertEqual(session['result'], 'value')
+
+    def test_any_rejected(self):
+        session = self._wait(self.scheduler.any(self._eventually('error01', 0.05, resolve=False),
+                                                self._eventually('error02', 0.1, resolve=False)))
+
+        self.assertEqual(session['error'], ['error01', 'error02'])
+
+    def test_map_limit(self):
+        in_flight = mock.Mock(current=0, maximum=0)
+
+        def method(value):
+            in_flight.current += 1
+            in_flight.maximum = max(in_flight.maximum, in_flight.current)
+
+            promise = self.scheduler.promise()
+
+            def finished():
+                in_flight.current -= 1
+                promise.resolved(value * 2)
+
+            self.scheduler.schedule_task(finished, delay=0.01)
+
+            return promise
+
+        session = self._wait(self.scheduler.map_limit(range(20), method, concurrency=3))
+
+        self.assertEqual(session['result'], [value * 2 for value in range(20)])
+        self.assertEqual(in_flight.maximum, 3)
+
+    def test_map_limit_rejected(self):
+        error = RuntimeError('Failed')
+
+        def method(value):
+            if value == 2:
+                raise error
+            return value
+
+        session = self._wait(self.scheduler.map_limit(range(4), method, concurrency=2))
+
+        self.assertEqual(session['error'], [0, 1, error, 3])
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(CombinatorTester)
@@ -2,6 +2,17 @@ from sleekxmpp.test import SleekTest
 import unittest
 import mock
 import time
+import threading
+import os
+
+
+def process_identifier(payload):
+    """
+    Module level method that can be shipped to the process pool.
+    """
+    payload.about = 'urn:rho:process:%s' % os.getpid()
+    return payload
+
 
 class SchedulerTester(SleekTest):
 
@@ -64,5 +75,204 @@ class SchedulerTester(SleekTest):
         args, kwargs = promise_result.call_args
         self.assertEqual(args[0], return_value)
 
+    def test_queue_microtask(self):
+
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components')
+
+        results = []
+
+        self.xmpp['rho_bot_scheduler'].queue_microtask(results.append, 1)
+        self.xmpp['rho_bot_scheduler'].queue_microtask(results.append, 2)
+
+        # Microtasks must never be executed on the stack of the caller.
+        self.assertEqual(results, [])
+
+        time.sleep(0.2)
+
+        self.assertEqual(results, [1, 2])
+
+    def test_schedule_timeout(self):
+
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components',
+                                  pconfig={'timer_resolution': 0.05, 'timer_wheel_size': 4})
+
+        scheduler = self.xmpp['rho_bot_scheduler']
+
+        results = []
+
+        scheduler.schedule_timeout(lambda: results.append('late'), delay=0.5)
+        scheduler.schedule_timeout(lambda: results.append('early'), delay=0.1)
+        cancel = scheduler.schedule_timeout(lambda: results.append('cancelled'), delay=0.1)
+
+        self.assertEqual(scheduler.get_pool_statistics()['pending_timeouts'], 3)
+
+        cancel()
+
+        self.assertEqual(scheduler.get_pool_statistics()['pending_timeouts'], 2)
+
+        time.sleep(0.3)
+
+        self.assertEqual(results, ['early'])
+
+        time.sleep(0.5)
+
+        self.assertEqual(results, ['early', 'late'])
+        self.assertEqual(scheduler.get_pool_statistics()['pending_timeouts'], 0)
+
+    def test_profiling(self):
+
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components',
+                                  pconfig={'profile': True, 'profile_log_interval': 0})
+
+        scheduler = self.xmpp['rho_bot_scheduler']
+
+        def handler(value):
+            return value
+
+        promise = scheduler.promise()
+        promise.then(handler)
+        promise.resolved(1)
+
+        time.sleep(0.2)
+
+        statistics = scheduler.get_profile_statistics()
+        names = [name for name in statistics.keys() if name.endswith('handler')]
+
+        self.assertEqual(len(names), 1)
+        self.assertEqual(statistics[names[0]]['count'], 1)
+        self.assertGreaterEqual(statistics[names[0]]['wait_max'], 0.0)
+        self.assertGreaterEqual(statistics[names[0]]['execution_total'], 0.0)
+
+        scheduler.reset_profile_statistics()
+        self.assertEqual(scheduler.get_profile_statistics(), dict())
+
+        scheduler.disable_profiling()
+        scheduler.queue_microtask(handler, 2)
+
+        time.sleep(0.2)
+
+        self.assertEqual(scheduler.get_profile_statistics(), dict())
+
+    def test_profiling_deferred(self):
+
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components',
+                                  pconfig={'profile': True, 'profile_log_interval': 0})
+
+        scheduler = self.xmpp['rho_bot_scheduler']
+
+        def deferred_handler(value, offset=0):
+            return value + offset
+
+        result = mock.Mock()
+        scheduler.defer(deferred_handler, 1, offset=2).then(result)
+
+        time.sleep(0.2)
+
+        result.assert_called_once_with(3)
+
+        # Deferred methods are profiled under their own name, not the name of the wrapper that calls them.
+        names = scheduler.get_profile_statistics().keys()
+        self.assertIn('%s.deferred_handler' % __name__, names)
+        self.assertFalse([name for name in names if 'execution_method' in name])
+
+    def test_resolved_chain(self):
+
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components')
+
+        promise_result = mock.Mock()
+
+        # Drains of the run queue are executed here instead of by the sleekxmpp scheduler thread.
+        with mock.patch.object(self.xmpp, 'schedule') as schedule:
+            promise = self.xmpp['rho_bot_scheduler'].promise()
+            promise.resolved(0)
+
+            chain = promise
+            for _ in range(10):
+                chain = chain.then(lambda value: value + 1)
+            chain.then(promise_result)
+
+            drains = 0
+            while schedule.call_count > drains:
+                name, delay, drain = schedule.call_args_list[drains][0]
+                drains += 1
+                drain()
+
+        self.assertEqual(promise_result.call_count, 1)
+
+        args, kwargs = promise_result.call_args
+        self.assertEqual(args[0], 10)
+
+    def test_defer_to_pool(self):
+
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components')
+
+        main_thread = threading.current_thread()
+
+        callback = mock.Mock(side_effect=lambda: threading.current_thread())
+        promise_result = mock.Mock()
+
+        self.xmpp['rho_bot_scheduler'].defer_to_pool(callback).then(promise_result)
+
+        time.sleep(1.0)
+
+        self.assertEqual(callback.call_count, 1)
+        self.assertEqual(promise_result.call_count, 1)
+
+        args, kwargs = promise_result.call_args
+        self.assertNotEqual(args[0], main_thread)
+
+        statistics = self.xmpp['rho_bot_scheduler'].get_pool_statistics()
+        self.assertEqual(statistics['queue_depth'], 0)
+        self.assertEqual(statistics['active'], 0)
+        self.assertEqual(statistics['completed'], 1)
+
+    def test_defer_to_pool_rejected(self):
+
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components')
+
+        error = RuntimeError('Failed')
+        callback = mock.Mock(side_effect=error)
+        promise_error = mock.Mock()
+
+        self.xmpp['rho_bot_scheduler'].defer_to_pool(callback).then(None, promise_error)
+
+        time.sleep(1.0)
+
+        self.assertEqual(promise_error.call_count, 1)
+
+        args, kwargs = promise_error.call_args
+        self.assertEqual(args[0], error)
+
+    def test_defer_process(self):
+        from rhobot.components.storage import StoragePayload
+
+        self.stream_start(plugins=[])
+        self.xmpp.register_plugin('rho_bot_scheduler', module='rhobot.components')
+
+        promise_result = mock.Mock()
+
+        payload = StoragePayload()
+        payload.add_type('urn:rho:type')
+
+        self.xmpp['rho_bot_scheduler'].defer_process(process_identifier, payload).then(promise_result)
+
+        time.sleep(2.0)
+
+        self.assertEqual(promise_result.call_count, 1)
+
+        args, kwargs = promise_result.call_args
+        self.assertIsInstance(args[0], StoragePayload)
+        self.assertEqual(args[0].types, ['urn:rho:type'])
+        self.assertNotEqual(args[0].about, 'urn:rho:process:%s' % os.getpid())
+
+        self.xmpp['rho_bot_scheduler'].plugin_end()
+
 
 suite = unittest.TestLoader().loadTestsFromTestCase(SchedulerTester)
@@ -0,0 +1,69 @@
+"""
+Benchmarks for the payload decoders.  These are not executed as part of the unit tests, run them with:
+
+    python -m test.components.storage_client.benchmark_decoder
+"""
+import unittest
+import time
+from rdflib.namespace import FOAF, RDFS
+from rhobot.namespace import RHO, GRAPH
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
+from rhobot.components.storage.enums import FindResults
+from rhobot.components.storage.payload import get_decoder, DECODER_STANZA, DECODER_ELEMENT
+from sleekxmpp.plugins.xep_0004 import FormField
+from sleekxmpp.plugins.xep_0122 import FormValidation
+from sleekxmpp.xmlstream import register_stanza_plugin
+
+ITEMS = 1000
+PROPERTIES = 1000
+REPEAT = 5
+
+
+def _best_of(method):
+    """
+    Execute the method REPEAT times and return the best time.
+    """
+    timings = []
+    for _ in range(REPEAT):
+        start = time.time()
+        method()
+        timings.append(time.time() - start)
+
+    return min(timings)
+
+
+class DecoderBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        register_stanza_plugin(FormField, FormValidation)
+
+    def test_result_collection(self):
+        payload = ResultCollectionPayload()
+        for index in range(ITEMS):
+            payload.append(ResultPayload(about='urn.instance.owner%04d' % index, types=[FOAF.Person, RHO.Owner],
+                                         flags={FindResults.CREATED: True}, columns={GRAPH.degree: index}))
+        form = payload.populate_payload()
+
+        print('\nresult collection of %d items' % ITEMS)
+        for decoder in (DECODER_STANZA, DECODER_ELEMENT):
+            result_collection = get_decoder(decoder)[1]
+            elapsed = _best_of(lambda: result_collection(form).results)
+            print('  %-8s %8.3f sec %10.0f items/sec' % (decoder, elapsed, ITEMS / elapsed))
+
+    def test_storage_payload(self):
+        payload = StoragePayload()
+        payload.about = 'urn.instance.owner'
+        payload.add_type(FOAF.Person, RHO.Owner)
+        for index in range(PROPERTIES):
+            payload.add_property(RDFS.seeAlso + str(index), 'value%04d' % index)
+        form = payload.populate_payload()
+
+        print('\nstorage payload of %d properties' % PROPERTIES)
+        for decoder in (DECODER_STANZA, DECODER_ELEMENT):
+            storage_payload = get_decoder(decoder)[0]
+            elapsed = _best_of(lambda: storage_payload(form))
+            print('  %-8s %8.3f sec %10.0f fields/sec' % (decoder, elapsed, PROPERTIES / elapsed))
+
+
+if __name__ == '__main__':
+    unittest.main()
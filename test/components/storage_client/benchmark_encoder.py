@@ -0,0 +1,75 @@
+"""
+Benchmarks for the payload encoders.  These are not executed as part of the unit tests, run them with:
+
+    python -m test.components.storage_client.benchmark_encoder
+"""
+import unittest
+import time
+from rdflib.namespace import FOAF, RDFS
+from rhobot.namespace import RHO, GRAPH
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
+from rhobot.components.storage.enums import FindResults
+from rhobot.components.storage.payload import get_encoder, ENCODER_STANZA, ENCODER_ELEMENT
+from sleekxmpp.plugins.xep_0004 import FormField
+from sleekxmpp.plugins.xep_0122 import FormValidation
+from sleekxmpp.xmlstream import register_stanza_plugin, tostring
+
+ITEMS = (1000, 5000)
+PROPERTIES = 1000
+REPEAT = 5
+
+
+def _best_of(method):
+    """
+    Execute the method REPEAT times and return the best time.
+    """
+    timings = []
+    for _ in range(REPEAT):
+        start = time.time()
+        method()
+        timings.append(time.time() - start)
+
+    return min(timings)
+
+
+class EncoderBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        register_stanza_plugin(FormField, FormValidation)
+
+    def test_result_collection(self):
+        for items in ITEMS:
+            payload = ResultCollectionPayload()
+            for index in range(items):
+                payload.append(ResultPayload(about='urn.instance.owner%04d' % index, types=[FOAF.Person, RHO.Owner],
+                                             flags={FindResults.CREATED: True}, columns={str(GRAPH.degree): index}))
+
+            self.assertEqual(tostring(get_encoder(ENCODER_STANZA)(payload).xml),
+                             tostring(get_encoder(ENCODER_ELEMENT)(payload).xml))
+
+            print('\nresult collection of %d items' % items)
+            for encoder in (ENCODER_STANZA, ENCODER_ELEMENT):
+                encode = get_encoder(encoder)
+                elapsed = _best_of(lambda: encode(payload))
+                print('  %-8s %8.3f sec %10.0f items/sec' % (encoder, elapsed, items / elapsed))
+
+    def test_storage_payload(self):
+        payload = StoragePayload()
+        payload.about = 'urn.instance.owner'
+        payload.add_type(FOAF.Person, RHO.Owner)
+        for index in range(PROPERTIES):
+            payload.add_property(RDFS.seeAlso + str(index), 'value%04d' % index)
+            payload.add_reference(FOAF.knows + str(index), 'urn.instance.owner%04d' % index)
+
+        self.assertEqual(tostring(get_encoder(ENCODER_STANZA)(payload).xml),
+                         tostring(get_encoder(ENCODER_ELEMENT)(payload).xml))
+
+        print('\nstorage payload of %d properties and references' % PROPERTIES)
+        for encoder in (ENCODER_STANZA, ENCODER_ELEMENT):
+            encode = get_encoder(encoder)
+            elapsed = _best_of(lambda: encode(payload))
+            print('  %-8s %8.3f sec %10.0f fields/sec' % (encoder, elapsed, 2 * PROPERTIES / elapsed))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Helpers for the tests of the storage client that run without an xmpp stream.
+"""
+import mock
+from rhobot.components.scheduler import Promise, _PromiseList
+from rhobot.components.storage.client import rho_bot_storage_client
+
+
+def create_scheduler():
+    """
+    Create a mock scheduler whose promises are settled synchronously.
+    :return: mock scheduler.
+    """
+    scheduler = mock.MagicMock()
+    scheduler.promise.side_effect = lambda: Promise(scheduler)
+    scheduler.queue_microtask.side_effect = lambda callback, *args: callback(*args)
+    scheduler.generate_callback_promise.side_effect = lambda promise: promise.resolved
+    scheduler.create_promise_list.side_effect = lambda *promises: _PromiseList(promises, scheduler).promise
+
+    return scheduler
+
+
+def create_client(config=None, xmpp=None, scheduler=None):
+    """
+    Create a storage client that sends its commands to a mock adhoc commands plugin.
+    :param config: configuration of the client.
+    :param xmpp: optional mock xmpp object.
+    :param scheduler: optional mock scheduler, see create_scheduler.
+    :return: storage client.
+    """
+    client = rho_bot_storage_client(xmpp=xmpp or mock.MagicMock(), config=config)
+    client._scheduler = scheduler or create_scheduler()
+    client._commands = mock.MagicMock()
+    client.plugin_init()
+
+    return client
+
+
+def respond(client, form, call=None):
+    """
+    Respond to a command that was sent by the client.
+    :param client: storage client.
+    :param form: form of the response.
+    :param call: call of the command, the last command that was sent when not provided.
+    :return: None
+    """
+    call = call or client._commands.send_command.call_args
+    call[1]['callback']({'command': {'form': form}})
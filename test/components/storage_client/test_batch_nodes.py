@@ -0,0 +1,152 @@
+import unittest
+
+import mock
+from rdflib.namespace import FOAF
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
+from rhobot.components.storage.enums import Commands, BatchResults
+from rhobot.components.storage.payload import BatchPayload
+from test.components.storage_client.mock_client import create_client, respond
+
+
+class BatchNodesTestCase(unittest.TestCase):
+
+    def _client(self, commands):
+        xmpp = mock.MagicMock()
+        disco_items = {'type': 'result',
+                       'disco_items': {'items': set(('storage@example.org', node, None) for node in commands)}}
+        xmpp.__getitem__.return_value.get_items.side_effect = lambda **kwargs: kwargs['callback'](disco_items)
+
+        client = create_client({'batch_size': 2}, xmpp=xmpp)
+        client._store_found('rhobot@conference.localhost/neo4j')
+
+        return client
+
+    @staticmethod
+    def _payloads(count):
+        payloads = []
+        for index in range(count):
+            payload = StoragePayload()
+            payload.add_type(FOAF.Person)
+            payload.add_property(FOAF.name, 'name%d' % index)
+            payloads.append(payload)
+
+        return payloads
+
+    def test_create_nodes(self):
+        client = self._client([Commands.CREATE_NODES.value])
+        payloads = self._payloads(3)
+
+        session = {}
+        client.create_nodes(payloads).then(lambda result: session.setdefault('result', result))
+
+        # The payloads are sent in batches of batch_size.
+        self.assertEqual(2, client._commands.send_command.call_count)
+
+        for call, offset in zip(client._commands.send_command.call_args_list, (0, 2)):
+            self.assertEqual(Commands.CREATE_NODES.value, call[1]['node'])
+
+            batch = BatchPayload(call[1]['payload'])
+
+            response = ResultCollectionPayload()
+            for index, payload in enumerate(batch.payloads):
+                self.assertEqual(payload.fingerprint(), payloads[offset + index].fingerprint())
+                response.append(ResultPayload(about='urn:rho:instance:%d' % (offset + index), types=[FOAF.Person],
+                                              flags={BatchResults.INDEX: str(index)}))
+
+            respond(client, response.populate_payload(), call)
+
+        self.assertEqual(['urn:rho:instance:0', 'urn:rho:instance:1', 'urn:rho:instance:2'],
+                         [collection.first().about for collection in session['result']])
+
+    def test_create_nodes_pipelined(self):
+        client = self._client([Commands.CREATE_NODE.value])
+
+        session = {}
+        client.create_nodes(self._payloads(3)).then(lambda result: session.setdefault('result', result))
+
+        self.assertEqual([Commands.CREATE_NODE.value] * 3,
+                         [call[1]['node'] for call in client._commands.send_command.call_args_list])
+
+        for index, call in enumerate(client._commands.send_command.call_args_list):
+            response = ResultCollectionPayload()
+            response.append(ResultPayload(about='urn:rho:instance:%d' % index, types=[FOAF.Person]))
+            respond(client, response.populate_payload(), call)
+
+        self.assertEqual(['urn:rho:instance:0', 'urn:rho:instance:1', 'urn:rho:instance:2'],
+                         [collection.first().about for collection in session['result']])
+
+    def _get_nodes(self, client):
+        payloads = []
+        for index in range(2):
+            payload = StoragePayload()
+            payload.about = 'urn:rho:instance:%d' % index
+            payloads.append(payload)
+
+        session = {}
+        client.get_nodes(payloads).then(lambda result: session.setdefault('result', result),
+                                         lambda error: session.setdefault('error', error))
+
+        call = client._commands.send_command.call_args
+        self.assertEqual(Commands.GET_NODES.value, call[1]['node'])
+
+        return session, BatchPayload(call[1]['payload']).payloads
+
+    @staticmethod
+    def _node(about, index):
+        node = StoragePayload()
+        node.about = about
+        node.add_type(FOAF.Person)
+        node.add_property(FOAF.name, 'Robert')
+        node.add_flag(BatchResults.INDEX, str(index))
+        return node
+
+    def test_get_nodes(self):
+        client = self._client([Commands.GET_NODES.value])
+        session, requested = self._get_nodes(client)
+
+        # The nodes are matched to the payloads by their batch index, not by their position in the response.
+        response = BatchPayload()
+        for index, payload in reversed(list(enumerate(requested))):
+            response.append(self._node(payload.about, index))
+
+        respond(client, response.populate_payload())
+
+        self.assertEqual(['urn:rho:instance:0', 'urn:rho:instance:1'], [node.about for node in session['result']])
+        self.assertEqual([str(FOAF.name)], session['result'][1].properties.keys())
+        self.assertEqual({}, session['result'][0].flags)
+
+    def test_get_nodes_missing(self):
+        client = self._client([Commands.GET_NODES.value])
+        session, requested = self._get_nodes(client)
+
+        response = BatchPayload()
+        response.append(self._node(requested[1].about, 1))
+
+        respond(client, response.populate_payload())
+
+        self.assertNotIn('result', session)
+        self.assertIn('urn:rho:instance:0', str(session['error']))
+
+    def test_supported_commands_refreshed(self):
+        client = self._client([Commands.CREATE_NODES.value])
+        get_items = client.xmpp['xep_0030'].get_items
+
+        # Failed requests are not remembered, the commands are requested again by the next batch.
+        get_items.side_effect = lambda **kwargs: kwargs['timeout_callback'](None)
+        client.create_nodes(self._payloads(1))
+        self.assertEqual(Commands.CREATE_NODE.value, client._commands.send_command.call_args[1]['node'])
+
+        disco_items = {'type': 'result',
+                       'disco_items': {'items': {('storage@example.org', Commands.CREATE_NODES.value, None)}}}
+        get_items.side_effect = lambda **kwargs: kwargs['callback'](disco_items)
+        client.create_nodes(self._payloads(1))
+        self.assertEqual(Commands.CREATE_NODES.value, client._commands.send_command.call_args[1]['node'])
+        self.assertEqual(2, get_items.call_count)
+
+        # Successful requests are remembered until the storage bot is found again.
+        client.create_nodes(self._payloads(1))
+        self.assertEqual(2, get_items.call_count)
+
+        client._store_found('rhobot@conference.localhost/neo4j')
+        client.create_nodes(self._payloads(1))
+        self.assertEqual(3, get_items.call_count)
@@ -0,0 +1,55 @@
+import unittest
+from rdflib.namespace import RDF, RDFS, FOAF
+from rhobot.components.storage import StoragePayload
+from rhobot.components.storage.payload import BatchPayload
+from rhobot.components.storage.enums import FindFlags
+from sleekxmpp.plugins.xep_0004 import Form, FormField
+from sleekxmpp.plugins.xep_0122 import FormValidation
+from sleekxmpp.xmlstream import register_stanza_plugin
+
+
+class TestBatchPayload(unittest.TestCase):
+
+    def setUp(self):
+        register_stanza_plugin(FormField, FormValidation)
+
+    def test_pack_unpack(self):
+        first = StoragePayload()
+        first.about = 'urn:rho:instance:first'
+        first.add_type(FOAF.Person)
+        first.add_property(FOAF.name, 'Robert')
+        first.add_reference(FOAF.knows, 'urn:rho:instance:second')
+
+        second = StoragePayload()
+        second.add_type(FOAF.Person, FOAF.Agent)
+        second.add_property(RDFS.seeAlso, ['urn:rho.value', 'urn:rho.other_value'])
+        second.add_flag(FindFlags.CREATE_IF_MISSING, True)
+
+        batch = BatchPayload()
+        batch.append(first, second)
+
+        self.assertEqual(len(batch), 2)
+
+        form = batch.populate_payload()
+
+        self.assertEqual(len(form.get_reported()), 6)
+        self.assertEqual(len(form.get_items()), 2)
+
+        unpacked = BatchPayload(form)
+
+        self.assertEqual(len(unpacked), 2)
+        self.assertEqual(unpacked.payloads[0].fingerprint(), first.fingerprint())
+        self.assertEqual(unpacked.payloads[1].fingerprint(), second.fingerprint())
+        self.assertEqual(unpacked.payloads[0].references[str(FOAF.knows)], ['urn:rho:instance:second'])
+        self.assertTrue(FindFlags.CREATE_IF_MISSING.fetch_from(unpacked.payloads[1].flags))
+
+    def test_unpack_single_type(self):
+        form = Form()
+        form.add_reported(var=str(RDF.about), ftype='text-single')
+        form.add_reported(var=str(RDF.type), ftype='text-single')
+        form.add_item({str(RDF.about): 'urn:rho:instance:first', str(RDF.type): str(FOAF.Person)})
+
+        unpacked = BatchPayload(form)
+
+        self.assertEqual(unpacked.payloads[0].about, 'urn:rho:instance:first')
+        self.assertEqual(unpacked.payloads[0].types, [str(FOAF.Person)])
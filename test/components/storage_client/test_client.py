@@ -28,4 +28,3 @@ class ClientTestCase(unittest.TestCase):
         client._store_left(storage_client)
 
         self.assertFalse(client.has_store())
-
@@ -0,0 +1,181 @@
+import unittest
+
+import mock
+from rdflib.namespace import FOAF
+from rhobot.components.scheduler import Promise
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload
+from rhobot.components.storage.command_queue import CommandQueue
+from rhobot.components.storage.enums import Commands
+from test.components.storage_client.mock_client import create_client, respond
+
+
+class CommandQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = mock.MagicMock()
+        self.scheduler.queue_microtask.side_effect = lambda callback, *args: callback(*args)
+        self.sent = []
+
+    def _submit(self, queue, priority, name):
+        promise = Promise(self.scheduler)
+        queue.submit(priority, promise, lambda: self.sent.append((name, promise)))
+        return promise
+
+    def test_window(self):
+        queue = CommandQueue(2)
+
+        first = self._submit(queue, 0, 'first')
+        self._submit(queue, 0, 'second')
+        self._submit(queue, 0, 'third')
+
+        self.assertEqual(['first', 'second'], [name for name, _ in self.sent])
+        self.assertEqual(3, len(queue))
+        self.assertEqual({'window': 2, 'in_flight': 2, 'pending': 1, 'pending_by_priority': {0: 1}},
+                         queue.statistics())
+
+        first.resolved('done')
+
+        self.assertEqual(['first', 'second', 'third'], [name for name, _ in self.sent])
+        self.assertEqual(2, len(queue))
+        self.assertEqual(0, queue.statistics()['pending'])
+
+    def test_priority(self):
+        queue = CommandQueue(1)
+
+        first = self._submit(queue, 1, 'write01')
+        self._submit(queue, 1, 'write02')
+        self._submit(queue, 0, 'read01')
+        self._submit(queue, 0, 'read02')
+
+        self.assertEqual({0: 2, 1: 1}, queue.statistics()['pending_by_priority'])
+
+        # Rejected commands release their slot as well.
+        first.rejected(RuntimeError('Failed'))
+        for _ in range(3):
+            self.sent[-1][1].resolved('done')
+
+        self.assertEqual(['write01', 'read01', 'read02', 'write02'], [name for name, _ in self.sent])
+        self.assertEqual(0, len(queue))
+
+    def test_unlimited(self):
+        queue = CommandQueue(0)
+
+        for index in range(20):
+            self._submit(queue, 0, index)
+
+        self.assertEqual(20, len(self.sent))
+        self.assertEqual(20, queue.statistics()['in_flight'])
+
+    def test_send_error(self):
+        queue = CommandQueue(1)
+
+        error = RuntimeError('Failed')
+
+        def send():
+            raise error
+
+        promise = Promise(self.scheduler)
+        rejected = mock.MagicMock()
+        queue.submit(0, promise, send).then(None, rejected)
+
+        rejected.assert_called_once_with(error)
+        self.assertEqual(0, len(queue))
+
+        self._submit(queue, 0, 'next')
+
+        self.assertEqual(['next'], [name for name, _ in self.sent])
+
+    def test_fail(self):
+        queue = CommandQueue(1)
+
+        rejected = mock.MagicMock()
+        first = self._submit(queue, 0, 'first')
+        first.then(None, rejected)
+        self._submit(queue, 1, 'second').then(None, rejected)
+
+        error = RuntimeError('Failed')
+        queue.fail(error)
+
+        self.assertEqual([mock.call(error), mock.call(error)], rejected.call_args_list)
+        self.assertEqual(0, len(queue))
+
+        # Completing a command that was failed does not release a slot.
+        first.resolved('done')
+        self._submit(queue, 0, 'third')
+        self._submit(queue, 0, 'fourth')
+
+        self.assertEqual(['first', 'third'], [name for name, _ in self.sent])
+
+
+class CommandWindowTestCase(unittest.TestCase):
+
+    @staticmethod
+    def _payload(name):
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person)
+        payload.add_property(FOAF.name, name)
+        return payload
+
+    def test_command_window(self):
+        client = create_client({'command_window': 1})
+        client._store_found('rhobot@conference.localhost/neo4j')
+
+        client.create_node(self._payload('first'))
+        client.create_node(self._payload('second'))
+        client.find_nodes(self._payload('third'))
+
+        self.assertEqual(1, client._commands.send_command.call_count)
+        self.assertEqual({'window': 1, 'in_flight': 1, 'pending': 2, 'pending_by_priority': {0: 1, 1: 1}},
+                         client.get_queue_statistics())
+
+        # The find is sent before the create that is waiting in the backlog.
+        respond(client, ResultCollectionPayload().populate_payload())
+        respond(client, ResultCollectionPayload().populate_payload())
+
+        self.assertEqual([Commands.CREATE_NODE.value, Commands.FIND_NODE.value, Commands.CREATE_NODE.value],
+                         [call[1]['node'] for call in client._commands.send_command.call_args_list])
+
+    def test_store_restart(self):
+        client = create_client({'command_window': 2})
+        client._store_found('rhobot@conference.localhost/neo4j')
+
+        rejected = mock.MagicMock()
+        client.find_nodes(self._payload('first')).then(None, rejected)
+        client.find_nodes(self._payload('second')).then(None, rejected)
+        client.find_nodes(self._payload('third')).then(None, rejected)
+
+        self.assertEqual({'window': 2, 'in_flight': 2, 'pending': 1, 'pending_by_priority': {0: 1}},
+                         client.get_queue_statistics())
+
+        # The responses of the commands that were sent to the storage bot that left are never received.
+        client._store_left('rhobot@conference.localhost/neo4j')
+
+        self.assertEqual(3, rejected.call_count)
+        self.assertEqual(0, client.get_queue_statistics()['in_flight'])
+        self.assertEqual(0, client.get_queue_statistics()['pending'])
+
+        client._store_found('rhobot@conference.localhost/neo4j')
+        client.find_nodes(self._payload('fourth'))
+
+        self.assertEqual(3, client._commands.send_command.call_count)
+
+        # Late responses from the storage bot that left do not release the slots of the new commands.
+        respond(client, ResultCollectionPayload().populate_payload(), client._commands.send_command.call_args_list[0])
+
+        self.assertEqual(1, client.get_queue_statistics()['in_flight'])
+
+    def test_command_timeout(self):
+        client = create_client({'command_window': 1})
+        client._store_found('rhobot@conference.localhost/neo4j')
+
+        rejected = mock.MagicMock()
+        client.find_nodes(self._payload('first')).then(None, rejected)
+        client.find_nodes(self._payload('second'))
+
+        call = client._commands.send_command.call_args
+        self.assertEqual(client.command_timeout, call[1]['timeout'])
+
+        call[1]['timeout_callback'](None)
+
+        self.assertEqual(1, rejected.call_count)
+        self.assertEqual(2, client._commands.send_command.call_count)
@@ -0,0 +1,71 @@
+"""
+Unit tests for the payload decoders.
+"""
+import unittest
+from rdflib.namespace import RDFS, FOAF
+from rhobot.namespace import RHO, GRAPH
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
+from rhobot.components.storage.enums import FindFlags, FindResults, CypherFlags
+from rhobot.components.storage.payload import get_decoder, DECODER_STANZA, DECODER_ELEMENT
+from rhobot.components.storage.payload import ElementStoragePayload, ElementResultCollectionPayload
+from sleekxmpp.plugins.xep_0004 import FormField
+from sleekxmpp.plugins.xep_0122 import FormValidation
+from sleekxmpp.xmlstream import register_stanza_plugin
+
+
+def _flag_values(flags):
+    return dict((key.var, (key.field_type, value)) for key, value in flags.iteritems())
+
+
+class TestDecoder(unittest.TestCase):
+
+    def setUp(self):
+        register_stanza_plugin(FormField, FormValidation)
+
+    def test_get_decoder(self):
+        self.assertEqual(get_decoder(DECODER_STANZA), (StoragePayload, ResultCollectionPayload))
+        self.assertEqual(get_decoder(DECODER_ELEMENT), (ElementStoragePayload, ElementResultCollectionPayload))
+        self.assertRaises(ValueError, get_decoder, 'unknown')
+
+    def test_storage_payload(self):
+        payload = StoragePayload()
+        payload.about = 'urn:rho:identified_by:asdf'
+        payload.add_type(FOAF.Person, RHO.Owner)
+        payload.add_property(RDFS.seeAlso, ['urn:rho.value', 'urn:rho.other_value'])
+        payload.add_reference(FOAF.mbox, 'mailto:email@example.com')
+        payload.add_flag(FindFlags.CREATE_IF_MISSING, True)
+        payload.add_flag(CypherFlags.TRANSLATION_KEY, CypherFlags.TRANSLATION_KEY.default)
+
+        expected = StoragePayload(payload.populate_payload())
+        decoded = ElementStoragePayload(payload.populate_payload())
+
+        self.assertEqual(decoded.about, expected.about)
+        self.assertEqual(decoded.types, expected.types)
+        self.assertEqual(decoded.properties, expected.properties)
+        self.assertEqual(decoded.references, expected.references)
+        self.assertEqual(_flag_values(decoded.flags), _flag_values(expected.flags))
+        self.assertEqual(decoded.fingerprint(), expected.fingerprint())
+
+        self.assertTrue(FindFlags.CREATE_IF_MISSING.fetch_from(decoded.flags))
+
+    def test_result_collection(self):
+        payload = ResultCollectionPayload()
+        payload.append(ResultPayload(about='urn.instance.owner01', types=[str(FOAF.Person), str(RHO.Owner)],
+                                     flags={FindResults.CREATED: True}, columns={GRAPH.degree: 5}))
+        payload.append(ResultPayload(about='urn.instance.owner02', types=[str(FOAF.Person)],
+                                     flags={FindResults.CREATED: False}, columns={GRAPH.degree: [1, 2]}))
+
+        expected = ResultCollectionPayload(payload.populate_payload())
+        decoded = ElementResultCollectionPayload(payload.populate_payload())
+
+        self.assertEqual(len(decoded), len(expected))
+
+        for decoded_result, expected_result in zip(decoded.results, expected.results):
+            self.assertEqual(decoded_result.about, expected_result.about)
+            self.assertEqual(decoded_result.types, expected_result.types)
+            self.assertEqual(_flag_values(decoded_result.flags), _flag_values(expected_result.flags))
+            self.assertEqual(decoded_result.columns, expected_result.columns)
+
+        self.assertTrue(FindResults.CREATED.fetch_from(decoded.first().flags))
+        self.assertFalse(FindResults.CREATED.fetch_from(decoded.results[1].flags))
+        self.assertEqual(decoded.results[1].get_column(GRAPH.degree), ['1', '2'])
@@ -0,0 +1,104 @@
+"""
+Unit tests for the payload encoders.
+"""
+import unittest
+from rdflib.namespace import RDF, RDFS, FOAF
+from rhobot.namespace import RHO, GRAPH
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
+from rhobot.components.storage.enums import FindFlags, FindResults, CypherFlags
+from rhobot.components.storage.payload import get_encoder, encode_storage_payload, encode_result_collection, \
+    ENCODER_STANZA, ENCODER_ELEMENT
+from sleekxmpp.plugins.xep_0004 import Form, FormField
+from sleekxmpp.plugins.xep_0122 import FormValidation
+from sleekxmpp.xmlstream import register_stanza_plugin, tostring
+
+
+class TestEncoder(unittest.TestCase):
+
+    def setUp(self):
+        register_stanza_plugin(FormField, FormValidation)
+
+    def _storage_payload(self):
+        payload = StoragePayload()
+        payload.about = 'urn:rho:identified_by:asdf'
+        payload.add_type(FOAF.Person, RHO.Owner)
+        payload.add_property(RDFS.seeAlso, ['urn:rho.value', 'urn:rho.other_value'])
+        payload.add_property(FOAF.name, 'Multiple\nLines')
+        payload.add_reference(FOAF.mbox, 'mailto:email@example.com')
+        payload.add_reference(FOAF.knows, ['urn:rho.first', 'urn:rho.second'])
+        payload.add_flag(FindFlags.CREATE_IF_MISSING, True)
+        payload.add_flag(CypherFlags.TRANSLATION_KEY, CypherFlags.TRANSLATION_KEY.default)
+
+        return payload
+
+    def _result_collection(self):
+        payload = ResultCollectionPayload()
+        payload.append(ResultPayload(about='urn.instance.owner01', types=[str(FOAF.Person), str(RHO.Owner)],
+                                     flags={FindResults.CREATED: True}, columns={str(GRAPH.degree): 5}))
+        payload.append(ResultPayload(about='urn.instance.owner02', types=[str(FOAF.Person)],
+                                     flags={FindResults.CREATED: False}, columns={str(GRAPH.degree): [1, 2]}))
+
+        return payload
+
+    def test_get_encoder(self):
+        self.assertIsNotNone(get_encoder(ENCODER_STANZA))
+        self.assertIsNotNone(get_encoder(ENCODER_ELEMENT))
+        self.assertRaises(ValueError, get_encoder, 'unknown')
+
+    def test_storage_payload(self):
+        payload = self._storage_payload()
+
+        expected = payload.populate_payload()
+        encoded = encode_storage_payload(payload)
+
+        self.assertEqual(tostring(encoded.xml), tostring(expected.xml))
+
+        # The fields of the form must be available without serializing it.
+        decoded = StoragePayload(encoded)
+        self.assertEqual(decoded.fingerprint(), StoragePayload(expected).fingerprint())
+        self.assertEqual(decoded.references[str(FOAF.mbox)], ['mailto:email@example.com'])
+        self.assertEqual(encoded.get_fields()[str(RDF.about)].get_value(), payload.about)
+
+    def test_storage_payload_container(self):
+        payload = self._storage_payload()
+
+        expected = Form()
+        expected['type'] = 'submit'
+        encoded = Form()
+        encoded['type'] = 'submit'
+
+        payload.populate_payload(expected)
+        encode_storage_payload(payload, encoded)
+
+        self.assertEqual(tostring(encoded.xml), tostring(expected.xml))
+
+    def test_result_collection(self):
+        expected = self._result_collection().populate_payload()
+        encoded = encode_result_collection(self._result_collection())
+
+        self.assertEqual(tostring(encoded.xml), tostring(expected.xml))
+
+        decoded = ResultCollectionPayload(encoded)
+        self.assertEqual(len(decoded), 2)
+        self.assertEqual(decoded.results[1].get_column(str(GRAPH.degree)), ['1', '2'])
+        self.assertFalse(FindResults.CREATED.fetch_from(decoded.results[1].flags))
+
+    def test_result_collection_repopulated(self):
+        payload = self._result_collection()
+
+        expected = tostring(payload.populate_payload().xml)
+
+        # Encoding the collection a second time replaces the contents of the container.
+        encode_result_collection(payload)
+        self.assertEqual(tostring(encode_result_collection(payload).xml), expected)
+
+        self.assertEqual(tostring(encode_result_collection(ResultCollectionPayload()).xml),
+                         tostring(ResultCollectionPayload().populate_payload().xml))
+
+    def test_element_encoder(self):
+        encode = get_encoder(ENCODER_ELEMENT)
+
+        self.assertEqual(tostring(encode(self._storage_payload()).xml),
+                         tostring(self._storage_payload().populate_payload().xml))
+        self.assertEqual(tostring(encode(self._result_collection()).xml),
+                         tostring(self._result_collection().populate_payload().xml))
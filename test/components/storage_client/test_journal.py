@@ -0,0 +1,186 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from rdflib.namespace import FOAF, RDFS
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
+from rhobot.components.storage.enums import Commands, FindFlags, UpdateFlags
+from rhobot.components.storage.journal import Journal, payload_to_record, record_to_payload
+from test.components.storage_client.mock_client import create_client, respond
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'journal')
+        self.schedule_sync = mock.MagicMock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_payload_record(self):
+        payload = StoragePayload()
+        payload.about = 'urn:rho:instance:owner'
+        payload.add_type(FOAF.Person)
+        payload.add_property(RDFS.seeAlso, ['urn:rho.value', 'urn:rho.other_value'])
+        payload.add_reference(FOAF.knows, 'urn:rho:instance:other')
+        payload.add_flag(FindFlags.CREATE_IF_MISSING, True)
+
+        journal = Journal(self.path, self.schedule_sync)
+        journal.append('create_node', payload_to_record(payload))
+        journal.close()
+
+        identifier, command, record = Journal(self.path, self.schedule_sync).first()
+        restored = record_to_payload(record)
+
+        self.assertEqual(command, 'create_node')
+        self.assertEqual(restored.fingerprint(), payload.fingerprint())
+        self.assertTrue(FindFlags.CREATE_IF_MISSING.fetch_from(restored.flags))
+        self.assertFalse(UpdateFlags.REPLACE_DEFINED.fetch_from(restored.flags))
+
+    def test_complete(self):
+        journal = Journal(self.path, self.schedule_sync)
+        first = journal.append('create_node', payload_to_record(StoragePayload()))
+        second = journal.append('update_node', payload_to_record(StoragePayload()))
+
+        journal.complete(first)
+
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(Journal(self.path, self.schedule_sync).first()[0], second)
+
+        # Completing all of the commands empties the journal file.
+        journal.complete(second)
+
+        self.assertEqual(len(journal), 0)
+        self.assertEqual(os.path.getsize(self.path), 0)
+        self.assertIsNone(Journal(self.path, self.schedule_sync).first())
+
+    def test_incomplete_record(self):
+        journal = Journal(self.path, self.schedule_sync)
+        identifier = journal.append('create_node', payload_to_record(StoragePayload()))
+        journal.close()
+
+        with open(self.path, 'a') as journal_file:
+            journal_file.write('{"id":"abc","comm')
+
+        journal = Journal(self.path, self.schedule_sync)
+
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(journal.first()[0], identifier)
+
+    def test_incomplete_record_appended(self):
+        journal = Journal(self.path, self.schedule_sync)
+        first = journal.append('create_node', payload_to_record(StoragePayload()))
+        journal.close()
+
+        with open(self.path, 'a') as journal_file:
+            journal_file.write('{"id":"abc","comm')
+
+        # The record that is written after the torn record is read after the next restart.
+        journal = Journal(self.path, self.schedule_sync)
+        second = journal.append('update_node', payload_to_record(StoragePayload()))
+        journal.close()
+
+        journal = Journal(self.path, self.schedule_sync)
+
+        self.assertEqual(len(journal), 2)
+        self.assertEqual(journal.first()[0], first)
+        journal.complete(first)
+        self.assertEqual(journal.first()[:2], (second, 'update_node'))
+
+    def test_sync_batching(self):
+        journal = Journal(self.path, self.schedule_sync, sync_count=3, sync_interval=2.0)
+
+        with mock.patch('os.fsync') as fsync:
+            journal.append('create_node', payload_to_record(StoragePayload()))
+            journal.append('create_node', payload_to_record(StoragePayload()))
+
+            self.assertEqual(fsync.call_count, 0)
+            self.schedule_sync.assert_called_once_with(journal.sync, 2.0)
+
+            journal.append('create_node', payload_to_record(StoragePayload()))
+
+            self.assertEqual(fsync.call_count, 1)
+
+            # The scheduled sync has nothing left to write.
+            journal.sync()
+
+            self.assertEqual(fsync.call_count, 1)
+
+
+class JournalClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _client(self):
+        return create_client({'journal': self.path})
+
+    @staticmethod
+    def _payload(about):
+        payload = StoragePayload()
+        payload.about = about
+        payload.add_type(FOAF.Person)
+        return payload
+
+    @staticmethod
+    def _respond(client, about):
+        response = ResultCollectionPayload()
+        response.append(ResultPayload(about=about, types=[FOAF.Person]))
+        respond(client, response.populate_payload())
+
+    def test_journal(self):
+        client = self._client()
+
+        created = mock.MagicMock()
+        client.create_node(self._payload('urn:rho:instance:first')).then(created)
+        client.update_node(self._payload('urn:rho:instance:second'))
+
+        self.assertEqual(0, client._commands.send_command.call_count)
+
+        # The commands survive a restart of the bot, and are replayed in order when a store is found.
+        client.plugin_end()
+        client = self._client()
+        client._store_found('rhobot@conference.localhost/neo4j')
+
+        self.assertEqual(1, client._commands.send_command.call_count)
+        self.assertEqual(Commands.CREATE_NODE.value, client._commands.send_command.call_args[1]['node'])
+
+        # Writes that are made while the journal is replayed are stored after the journaled commands.
+        client.create_node(self._payload('urn:rho:instance:third'))
+
+        self.assertEqual(1, client._commands.send_command.call_count)
+
+        self._respond(client, 'urn:rho:instance:first')
+
+        self.assertEqual(2, client._commands.send_command.call_count)
+        self.assertEqual(Commands.UPDATE_NODE.value, client._commands.send_command.call_args[1]['node'])
+
+        self._respond(client, 'urn:rho:instance:second')
+        self._respond(client, 'urn:rho:instance:third')
+
+        self.assertEqual(3, client._commands.send_command.call_count)
+        self.assertEqual(0, len(client._journal))
+
+        # The promise of a command that was journaled by this client is resolved when it has been replayed.
+        client = self._client()
+        fourth_created = mock.MagicMock()
+        client.create_node(self._payload('urn:rho:instance:fourth')).then(fourth_created)
+        client._store_found('rhobot@conference.localhost/neo4j')
+        self._respond(client, 'urn:rho:instance:fourth')
+
+        self.assertEqual('urn:rho:instance:fourth', fourth_created.call_args[0][0].first().about)
+        self.assertEqual(0, created.call_count)
+
+        # Once the journal is empty the commands are sent directly.
+        client.create_node(self._payload('urn:rho:instance:fifth'))
+
+        self.assertEqual(2, client._commands.send_command.call_count)
+        client.plugin_end()
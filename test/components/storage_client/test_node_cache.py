@@ -0,0 +1,171 @@
+import unittest
+
+import mock
+from rdflib.namespace import FOAF
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload
+from rhobot.components.storage.enums import Commands
+from rhobot.components.storage.node_cache import NodeCache
+from test.components.storage_client.mock_client import create_client, respond
+
+
+class NodeCacheTestCase(unittest.TestCase):
+
+    def _payload(self, about):
+        payload = StoragePayload()
+        payload.about = about
+        payload.add_type(FOAF.Person)
+        payload.add_property(FOAF.name, 'Robert')
+        return payload
+
+    def test_get_put(self):
+        cache = NodeCache(30.0, 10)
+
+        self.assertIsNone(cache.get('urn:rho:instance:01'))
+
+        cache.put(self._payload('urn:rho:instance:01'), cache.version)
+
+        cached = cache.get('urn:rho:instance:01')
+        self.assertEqual(cached.fingerprint(), self._payload('urn:rho:instance:01').fingerprint())
+
+        # The consumers receive a copy of the cached node.
+        cached.add_property(FOAF.name, 'Bob')
+        self.assertEqual(['Robert'], cache.get('urn:rho:instance:01').properties[FOAF.name])
+
+        # Nodes that were not found are not cached.
+        cache.put(StoragePayload(), cache.version)
+
+        self.assertEqual({'size': 1, 'hits': 2, 'misses': 1}, cache.statistics())
+
+    def test_least_recently_used(self):
+        cache = NodeCache(30.0, 2)
+
+        cache.put(self._payload('urn:rho:instance:01'), cache.version)
+        cache.put(self._payload('urn:rho:instance:02'), cache.version)
+        cache.get('urn:rho:instance:01')
+        cache.put(self._payload('urn:rho:instance:03'), cache.version)
+
+        self.assertIsNotNone(cache.get('urn:rho:instance:01'))
+        self.assertIsNone(cache.get('urn:rho:instance:02'))
+        self.assertIsNotNone(cache.get('urn:rho:instance:03'))
+
+    def test_expired(self):
+        cache = NodeCache(30.0, 10)
+
+        with mock.patch('time.time', return_value=100.0):
+            cache.put(self._payload('urn:rho:instance:01'), cache.version)
+
+        with mock.patch('time.time', return_value=131.0):
+            self.assertIsNone(cache.get('urn:rho:instance:01'))
+
+    def test_invalidate(self):
+        cache = NodeCache(30.0, 10)
+
+        cache.put(self._payload('urn:rho:instance:01'), cache.version)
+        version = cache.version
+
+        cache.invalidate('urn:rho:instance:01')
+
+        self.assertIsNone(cache.get('urn:rho:instance:01'))
+
+        # Nodes requested before the invalidation are not cached.
+        cache.put(self._payload('urn:rho:instance:01'), version)
+
+        self.assertIsNone(cache.get('urn:rho:instance:01'))
+
+        # Invalidations of other nodes do not prevent a node from being cached.
+        version = cache.version
+        cache.invalidate('urn:rho:instance:02')
+        cache.put(self._payload('urn:rho:instance:01'), version)
+
+        self.assertIsNotNone(cache.get('urn:rho:instance:01'))
+
+    def test_forgotten_invalidations(self):
+        cache = NodeCache(30.0, 2)
+
+        version = cache.version
+        cache.invalidate('urn:rho:instance:01')
+        cache.invalidate('urn:rho:instance:02')
+        cache.invalidate('urn:rho:instance:03')
+
+        # The invalidation of the first node has been forgotten, so it could have been invalidated after the request.
+        cache.put(self._payload('urn:rho:instance:01'), version)
+        cache.put(self._payload('urn:rho:instance:04'), version)
+
+        self.assertIsNone(cache.get('urn:rho:instance:01'))
+        self.assertIsNone(cache.get('urn:rho:instance:04'))
+
+        cache.put(self._payload('urn:rho:instance:01'), cache.version)
+
+        self.assertIsNotNone(cache.get('urn:rho:instance:01'))
+
+    def test_disabled(self):
+        cache = NodeCache(0, 10)
+
+        cache.put(self._payload('urn:rho:instance:01'), cache.version)
+
+        self.assertIsNone(cache.get('urn:rho:instance:01'))
+        self.assertEqual(0, len(cache))
+
+
+class NodeCacheClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = create_client({'node_cache_ttl': 30.0})
+        self.client._store_found('rhobot@conference.localhost/neo4j')
+
+        self.node = StoragePayload()
+        self.node.about = 'urn:rho:instance:owner'
+        self.node.add_type(FOAF.Person)
+        self.node.add_property(FOAF.name, 'Robert')
+
+    def _get_node(self):
+        payload = StoragePayload()
+        payload.about = 'urn:rho:instance:owner'
+
+        session = {}
+        self.client.get_node(payload).then(lambda result: session.setdefault('result', result))
+        return session
+
+    def test_disabled_by_default(self):
+        self.client = create_client()
+        self.client._store_found('rhobot@conference.localhost/neo4j')
+
+        self._get_node()
+        respond(self.client, self.node.populate_payload())
+
+        session = self._get_node()
+        respond(self.client, self.node.populate_payload())
+
+        self.assertEqual(2, self.client._commands.send_command.call_count)
+        self.assertEqual(session['result'].about, 'urn:rho:instance:owner')
+
+    def test_node_cache(self):
+        self._get_node()
+        respond(self.client, self.node.populate_payload())
+
+        session = self._get_node()
+
+        self.assertEqual(1, self.client._commands.send_command.call_count)
+        self.assertEqual(session['result'].about, 'urn:rho:instance:owner')
+        self.assertEqual({'size': 1, 'hits': 1, 'misses': 1}, self.client.get_cache_statistics())
+
+        # Updates made through the client invalidate the node.
+        update = StoragePayload()
+        update.about = 'urn:rho:instance:owner'
+        update.add_property(FOAF.name, 'Bob')
+        self.client.update_node(update)
+        respond(self.client, ResultCollectionPayload().populate_payload())
+
+        self._get_node()
+        respond(self.client, self.node.populate_payload())
+
+        self.assertEqual([Commands.GET_NODE.value, Commands.UPDATE_NODE.value, Commands.GET_NODE.value],
+                         [call[1]['node'] for call in self.client._commands.send_command.call_args_list])
+
+        # Modifications received by the rdf publisher invalidate the node.
+        self.client._node_modified('urn:rho:instance:owner')
+
+        self._get_node()
+
+        self.assertEqual(4, self.client._commands.send_command.call_count)
+        self.assertEqual({'size': 0, 'hits': 1, 'misses': 3}, self.client.get_cache_statistics())
@@ -2,6 +2,7 @@
 Unit tests for the result payload.
 """
 import unittest
+import pickle
 from rdflib.namespace import RDF, RDFS, FOAF
 from rhobot.namespace import RHO, GRAPH
 from sleekxmpp.plugins.xep_0004.stanza.form import Form
@@ -31,7 +32,7 @@ class TestResultPayload(unittest.TestCase):
 
         result_collection_payload = ResultCollectionPayload(form)
 
-        self.assertEqual(len(form.get_items()), len(result_collection_payload._results))
+        self.assertEqual(len(form.get_items()), len(result_collection_payload))
 
         item = result_collection_payload.results[0]
 
@@ -135,3 +136,71 @@ class TestResultPayload(unittest.TestCase):
 
         column_value = result_payload.get_column(GRAPH.degree)
         self.assertEqual(int(column_value[0]), degree)
+
+    def test_pickle(self):
+        types = [str(FOAF.Person), str(RHO.Owner)]
+        urn = 'urn.instance.owner'
+        degree = 5
+
+        payload = ResultCollectionPayload()
+        item = ResultPayload(about=urn, types=types, flags={FindResults.CREATED: True})
+        item.add_column(GRAPH.degree, degree)
+        payload.append(item)
+
+        second_payload = pickle.loads(pickle.dumps(payload, pickle.HIGHEST_PROTOCOL))
+
+        self.assertEqual(len(second_payload.results), 1)
+
+        result_payload = second_payload.results[0]
+
+        self.assertEqual(result_payload.about, urn)
+        self.assertEqual(result_payload.types, types)
+        self.assertTrue(FindResults.CREATED.fetch_from(result_payload.flags))
+        self.assertEqual(int(result_payload.get_column(GRAPH.degree)[0]), degree)
+
+        # The container is rebuilt so that the payload can be transmitted again.
+        third_payload = ResultCollectionPayload(second_payload.populate_payload())
+
+        self.assertEqual(third_payload.results[0].about, urn)
+
+    def test_merge(self):
+        urn = 'urn.instance.owner'
+
+        payload = ResultCollectionPayload()
+        payload.merge(ResultPayload(about=urn, types=[str(FOAF.Person)], columns={GRAPH.degree: 5}))
+        payload.merge(ResultPayload(about=urn, types=[str(FOAF.Person), str(RHO.Owner)],
+                                    flags={FindResults.CREATED: True}, columns={GRAPH.degree: [5, 6]}))
+        payload.merge(ResultPayload(about='urn.instance.other', types=[str(FOAF.Person)]))
+
+        self.assertEqual(len(payload.results), 2)
+
+        result_payload = payload.get(urn)
+
+        self.assertIs(result_payload, payload.results[0])
+        self.assertEqual(result_payload.types, [str(FOAF.Person), str(RHO.Owner)])
+        self.assertTrue(FindResults.CREATED.fetch_from(result_payload.flags))
+        self.assertEqual(result_payload.get_column(GRAPH.degree), ['5', '6'])
+        self.assertIsNone(payload.get('urn.instance.missing'))
+
+    def test_lazy_parsing(self):
+        types = [str(FOAF.Person), str(RHO.Owner)]
+
+        payload = ResultCollectionPayload()
+        for index in range(3):
+            payload.append(ResultPayload(about='urn.instance.owner%02d' % index, types=types))
+
+        second_payload = ResultCollectionPayload(payload.populate_payload())
+
+        self.assertEqual(len(second_payload), 3)
+        self.assertEqual(second_payload.first().about, 'urn.instance.owner00')
+        self.assertEqual(second_payload.first().types, types)
+
+        # Only the first item has been parsed.
+        self.assertEqual(len(second_payload._results), 1)
+        self.assertEqual(len(second_payload), 3)
+
+        self.assertEqual([result.about for result in second_payload.results],
+                         ['urn.instance.owner00', 'urn.instance.owner01', 'urn.instance.owner02'])
+        self.assertEqual(second_payload[-1].about, 'urn.instance.owner02')
+
+        self.assertIsNone(ResultCollectionPayload(Form()).first())
@@ -0,0 +1,48 @@
+import unittest
+import mock
+
+from rdflib.namespace import FOAF
+from rhobot.components.storage import StoragePayload, ResultCollectionPayload, ResultPayload
+from test.components.storage_client.mock_client import create_client, respond
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = create_client()
+        self.client._store_found('rhobot@conference.localhost/neo4j')
+
+    @staticmethod
+    def _payload():
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person)
+        payload.add_property(FOAF.name, 'Robert')
+        return payload
+
+    def test_single_flight(self):
+        first_promise = self.client.find_nodes(self._payload())
+        second_promise = self.client.find_nodes(self._payload())
+
+        self.assertEqual(1, self.client._commands.send_command.call_count)
+
+        first_callback = mock.MagicMock()
+        second_callback = mock.MagicMock()
+        first_promise.then(first_callback)
+        second_promise.then(second_callback)
+
+        response = ResultCollectionPayload()
+        response.append(ResultPayload(about='http://www.example.org/instance/01', types=[FOAF.Person]))
+        respond(self.client, response.populate_payload())
+
+        # Each of the callers receives its own copy of the result.
+        first_results = first_callback.call_args[0][0]
+        second_results = second_callback.call_args[0][0]
+        self.assertIsNot(first_results, second_results)
+        self.assertIsNot(first_results.first(), second_results.first())
+        self.assertEqual(first_results.first().about, second_results.first().about)
+
+        # Once the request has completed, the command is sent again.
+
+        self.client.find_nodes(self._payload())
+
+        self.assertEqual(2, self.client._commands.send_command.call_count)
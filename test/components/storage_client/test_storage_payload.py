@@ -1,4 +1,5 @@
 import unittest
+import pickle
 from rdflib.namespace import RDF, RDFS, FOAF
 from sleekxmpp.plugins.xep_0004.stanza.form import Form
 from rhobot.components.storage import StoragePayload
@@ -98,3 +99,49 @@ class TestStoragePayload(unittest.TestCase):
         self.assertEqual(second_content.get_fields()[str(RDFS.seeAlso)].get_value(), [see_also])
         self.assertEqual(second_content.get_fields()[str(FOAF.mbox)].get_value(), [mbox])
         self.assertEqual(second_content.get_fields()[FindFlags.CREATE_IF_MISSING.var].get_value(), create_if_missing)
+
+    def test_pickle(self):
+
+        payload = StoragePayload()
+
+        about = 'urn:rho:identified_by:asdf'
+        see_also = 'urn:rho.value'
+        mbox = 'mailto:email@example.com'
+
+        payload.about = about
+        payload.add_type(FOAF.Person)
+        payload.add_property(RDFS.seeAlso, see_also)
+        payload.add_reference(FOAF.mbox, mbox)
+        payload.add_flag(FindFlags.CREATE_IF_MISSING, True)
+
+        second_payload = pickle.loads(pickle.dumps(payload, pickle.HIGHEST_PROTOCOL))
+
+        self.assertEqual(second_payload.about, about)
+        self.assertEqual(second_payload.types, [str(FOAF.Person)])
+        self.assertEqual(second_payload.properties[RDFS.seeAlso], [see_also])
+        self.assertEqual(second_payload.references[FOAF.mbox], [mbox])
+        self.assertTrue(FindFlags.CREATE_IF_MISSING.fetch_from(second_payload.flags))
+
+    def test_fingerprint(self):
+
+        payload = StoragePayload()
+        payload.add_type(FOAF.Person, FOAF.Agent)
+        payload.add_property(RDFS.seeAlso, 'urn:rho.value')
+        payload.add_reference(FOAF.mbox, 'mailto:email@example.com')
+        payload.add_flag(FindFlags.CREATE_IF_MISSING, True)
+
+        same_payload = StoragePayload()
+        same_payload.add_flag(FindFlags.CREATE_IF_MISSING, True)
+        same_payload.add_reference(FOAF.mbox, 'mailto:email@example.com')
+        same_payload.add_property(RDFS.seeAlso, 'urn:rho.value')
+        same_payload.add_type(FOAF.Agent, FOAF.Person)
+
+        self.assertEqual(payload.fingerprint(), same_payload.fingerprint())
+        self.assertEqual(hash(payload.fingerprint()), hash(same_payload.fingerprint()))
+
+        # Round tripping through the form keeps the fingerprint.
+        unpacked_payload = StoragePayload(payload.populate_payload())
+        self.assertEqual(payload.fingerprint(), unpacked_payload.fingerprint())
+
+        same_payload.add_property(RDFS.seeAlso, 'urn:rho.other_value')
+        self.assertNotEqual(payload.fingerprint(), same_payload.fingerprint())